@@ -38,6 +38,15 @@ python manage.py runserver 8002
 cd /c/Dev/CITTEsp-back/scheduling
 python manage.py runserver 8003
 
+# Worker del outbox de Scheduling (formularios de invitación) - Terminal 5
+cd /c/Dev/CITTEsp-back/scheduling
+python manage.py process_outbox
+
+# Planificador de estados de eventos (en curso / realizado) - Terminal 6
+# (exportar EVENT_STATUS_SCHEDULER_ENABLED=True en Scheduling al usarlo)
+cd /c/Dev/CITTEsp-back/scheduling
+python manage.py run_status_scheduler
+
 # ============================================================================
 # TESTING
 # ============================================================================
@@ -147,4 +147,9 @@ SCHEDULING_SERVICE_URL = 'http://localhost:8003/api'
 SCHEDULING_PUBLIC_PATHS = [
     'future-activity',
     'scheduled-events',
+    'availability',
+    # Feeds iCalendar: los clientes de calendario no envían el token
+    'calendar',
+    # Stream SSE de la agenda: EventSource no puede enviar el header Authorization
+    'stream',
 ]
@@ -1,8 +1,11 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from rest_framework.test import APIClient
 from rest_framework import status
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
+import threading
 
 
 class AuthenticationTestCase(TestCase):
@@ -112,3 +115,116 @@ class AuthenticationTestCase(TestCase):
         
         response = self.client.post(self.register_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class BackendHandler(BaseHTTPRequestHandler):
+    """Servicio de prueba: responde según la ruta pedida."""
+
+    PDF = b'%PDF-1.4 ' + b'x' * 200000
+    # Libera el segundo mensaje del stream SSE
+    stream_released = threading.Event()
+
+    def do_GET(self):
+        if self.path.startswith('/download/'):
+            self.send_response(206)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Range', f'bytes 0-{len(self.PDF) - 1}/{len(self.PDF) + 10}')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', '"abc"')
+            self.send_header('Content-Length', str(len(self.PDF)))
+            self.end_headers()
+            self.wfile.write(self.PDF)
+        elif self.path.startswith('/presigned/'):
+            self.send_response(302)
+            self.send_header('Location', 'https://bucket.s3.amazonaws.com/memoria.pdf?X-Amz-Signature=x')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path.startswith('/accel/'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('X-Accel-Redirect', '/protected-media/memorias/a.pdf')
+            self.send_header('Content-Disposition', 'attachment; filename="memoria_1.pdf"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path.startswith('/stream/'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.end_headers()
+            self.wfile.write(b'id: a-1\nevent: updated\ndata: {}\n\n')
+            self.wfile.flush()
+            self.stream_released.wait(5)
+            self.wfile.write(b'id: a-2\nevent: deleted\ndata: {}\n\n')
+        else:
+            body = json.dumps({'ok': True}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ProxyStreamingTestCase(TestCase):
+    """Reenvío de descargas por el proxy del servicio de repositorio"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), BackendHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        backend_url = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.settings_override = override_settings(REPOSITORY_SERVICE_URL=backend_url, SCHEDULING_SERVICE_URL=backend_url)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lector', password='x'))
+
+    def test_download_is_streamed(self):
+        response = self.client.get('/api/memos/download/1/', HTTP_RANGE='bytes=0-')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), BackendHandler.PDF)
+        self.assertEqual(response['Content-Length'], str(len(BackendHandler.PDF)))
+        for header in ('Content-Range', 'Accept-Ranges', 'ETag'):
+            self.assertIn(header, response)
+
+    def test_redirect_is_not_followed(self):
+        response = self.client.get('/api/memos/presigned/1/')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('https://bucket.s3.amazonaws.com/'))
+
+    def test_internal_redirect_is_passed_through(self):
+        response = self.client.get('/api/memos/accel/1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/memorias/a.pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_event_stream_is_relayed_per_message(self):
+        # Ruta pública: EventSource no envía el token
+        response = APIClient().get('/api/event/stream/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        chunks = iter(response.streaming_content)
+        # El primer mensaje llega mientras el servicio sigue con la conexión abierta
+        self.assertEqual(next(chunks), b'id: a-1\nevent: updated\ndata: {}\n\n')
+        BackendHandler.stream_released.set()
+        self.assertEqual(b''.join(chunks), b'id: a-2\nevent: deleted\ndata: {}\n\n')
+
+    def test_json_response(self):
+        response = self.client.get('/api/memos/filter/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'ok': True})
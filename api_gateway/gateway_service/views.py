@@ -4,7 +4,9 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.response import Response
-from django.http import HttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.exceptions import NotAcceptable
+from django.http import StreamingHttpResponse
 import requests
 from django.conf import settings
 from .serializers import UserLoginSerializer, UserRegisterSerializer, UserSerializer
@@ -133,9 +135,52 @@ class LogoutView(APIView):
 # HELPER FUNCTION FOR PROXY
 # ============================================================================
 
+# Tamaño de los bloques reenviados al cliente en las descargas
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Headers de las respuestas binarias que se copian al cliente: nombre del archivo,
+# validadores de caché (para los 304 del servicio), rangos (206) y la delegación
+# de la transferencia al servidor web frontal (X-Accel-Redirect / X-Sendfile,
+# X-Accel-Buffering en el stream SSE de scheduling)
+PASSTHROUGH_HEADERS = (
+    'Content-Disposition', 'ETag', 'Last-Modified', 'Cache-Control',
+    'Content-Range', 'Accept-Ranges', 'Location', 'X-Accel-Redirect', 'X-Sendfile',
+    'X-Accel-Buffering',
+)
+
+
+def _iter_backend_response(response):
+    """Reenvía el cuerpo por bloques y libera la conexión con el servicio al terminar."""
+    try:
+        yield from response.iter_content(STREAM_CHUNK_SIZE)
+    finally:
+        response.close()
+
+
+def _iter_event_stream(response):
+    """
+    Reenvía un stream SSE con lo que llegue en cada lectura: `iter_content` esperaría
+    a completar el bloque (o el cierre de la conexión) antes de entregar los mensajes.
+    """
+    try:
+        while chunk := response.raw.read1(STREAM_CHUNK_SIZE, decode_content=True):
+            yield chunk
+    finally:
+        response.close()
+
+
 def forward_request_to_backend(request, base_url, path):
     """
     Proxy Universal: Maneja JSON, Multipart (Archivos) y Descargas Binarias.
+
+    Las respuestas binarias se reenvían por bloques a medida que llegan (sin
+    cargarlas en memoria), y las redirecciones y respuestas con X-Accel-Redirect /
+    X-Sendfile se entregan tal cual: la descarga la hace el cliente desde S3 o el
+    servidor web frontal, no este proceso.
+
+    Los streams SSE (`text/event-stream`) se reenvían mensaje a mensaje, sin esperar
+    a llenar un bloque. La conexión queda abierta mientras el cliente escuche (bajo
+    WSGI ocupa un worker); el timeout de lectura de 30 s supera el latido del stream.
     """
     # ------------------------------------------------------------------
     # 1. Construcción y Limpieza de URL (Tu fix anterior)
@@ -204,7 +249,11 @@ def forward_request_to_backend(request, base_url, path):
             'url': url,
             'headers': headers,
             'params': request.query_params,
-            'timeout': 30  # Aumentamos timeout para subidas de archivos
+            # Con `stream` el timeout aplica a cada lectura, no a la descarga completa
+            'timeout': 30,  # Aumentamos timeout para subidas de archivos
+            # Las redirecciones (p. ej. URLs prefirmadas de S3) las sigue el cliente
+            'allow_redirects': False,
+            'stream': True,
         }
 
         # Inyectar payload según el tipo
@@ -229,19 +278,31 @@ def forward_request_to_backend(request, base_url, path):
                 return Response(response.json(), status=response.status_code)
             except ValueError:
                 return Response(response.content, status=response.status_code)
-
-        # CASO DESCARGA (PDF, Imagen, Zip): Devolvemos el binario crudo
-        # Usamos HttpResponse de Django en lugar de Response de DRF para streams/binarios
-        django_response = HttpResponse(
-            response.content, 
-            status=response.status_code, 
-            content_type=content_type_resp
+            finally:
+                response.close()
+
+        # CASO DESCARGA (PDF, Imagen, Zip, CSV): Devolvemos el binario crudo por bloques.
+        # Usamos StreamingHttpResponse de Django en lugar de Response de DRF para streams/binarios.
+        # El Content-Type se copia tal cual: en las respuestas multipart/byteranges
+        # el boundary distingue mayúsculas y minúsculas.
+        # En SSE cada mensaje se reenvía en cuanto llega
+        if content_type_resp.startswith('text/event-stream'):
+            body = _iter_event_stream(response)
+        else:
+            body = _iter_backend_response(response)
+        django_response = StreamingHttpResponse(
+            body,
+            status=response.status_code,
+            content_type=response.headers.get('Content-Type')
         )
-        
-        # Preservar header importante para descargas (nombre del archivo)
-        if 'Content-Disposition' in response.headers:
-            django_response['Content-Disposition'] = response.headers['Content-Disposition']
-            
+
+        for header in PASSTHROUGH_HEADERS:
+            if header in response.headers:
+                django_response[header] = response.headers[header]
+        # `requests` descomprime el cuerpo: el largo sólo es válido sin Content-Encoding
+        if 'Content-Length' in response.headers and 'Content-Encoding' not in response.headers:
+            django_response['Content-Length'] = response.headers['Content-Length']
+
         return django_response
 
     except requests.exceptions.ConnectionError:
@@ -318,6 +379,19 @@ class RepositoryProxyView(APIView):
 # PROXY VIEWS - SCHEDULING SERVICE
 # ============================================================================
 
+class ProxyContentNegotiation(DefaultContentNegotiation):
+    """
+    No rechaza (406) los `Accept` que el gateway no sabe renderizar, como el
+    `text/calendar` de los clientes de calendario: el cuerpo lo genera el servicio.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
 class SchedulingProxyView(APIView):
     """
     Proxy para los endpoints del servicio de eventos (scheduling).
@@ -327,6 +401,7 @@ class SchedulingProxyView(APIView):
     `SCHEDULING_PUBLIC_PATHS`) con rutas públicas que no requieren autenticación.
     """
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = ProxyContentNegotiation
 
     def dispatch(self, request, *args, **kwargs):
         # Guardamos la ruta proxy para que get_permissions pueda decidir
@@ -338,10 +413,13 @@ class SchedulingProxyView(APIView):
 
     def get_permissions(self):
         # Rutas públicas configurables desde settings. Por defecto:
-        # 'future-activity' y 'scheduled-events'
+        # 'future-activity', 'scheduled-events', 'availability', 'calendar' y 'stream'
         public_paths = getattr(settings, 'SCHEDULING_PUBLIC_PATHS', [
             'future-activity',
             'scheduled-events',
+            'availability',
+            'calendar',
+            'stream',
         ])
 
         # Normalizamos la ruta y comprobamos si comienza con alguna pública
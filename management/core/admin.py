@@ -5,7 +5,9 @@ from core.models import (
 	RejectReason,
 	Event, 
 	EventDetail,
-	EventSpace
+	EventSpace,
+	EventRecurrence,
+	EventOccurrenceException
 )
 
 # Register your models here.
@@ -16,3 +18,5 @@ admin.site.register(RejectReason)
 admin.site.register(Event)
 admin.site.register(EventDetail)
 admin.site.register(EventSpace)
+admin.site.register(EventRecurrence)
+admin.site.register(EventOccurrenceException)
@@ -0,0 +1,156 @@
+"""
+Detección de choques de horario entre eventos que comparten un espacio.
+
+Se usa dentro de la transacción que crea o modifica el evento:
+
+1. `lock_workspaces` bloquea (`SELECT ... FOR UPDATE`) las filas de los
+   espacios involucrados, siempre en el mismo orden para no generar deadlocks.
+   Dos solicitudes concurrentes sobre el mismo espacio quedan serializadas, de
+   modo que la segunda ve el evento que la primera acaba de guardar.
+2. `find_conflicts` busca eventos activos que se cruzan con el intervalo en esos
+   espacios: un rango sobre (término, inicio) con el índice
+   `evento_termino_inicio_idx` y un `EXISTS` sobre `espacio_evento_ws_ev_idx`.
+   Las series recurrentes salen de la misma consulta y se expanden sólo dentro
+   del intervalo (ver `core/recurrence.py`).
+3. `check_series_conflicts` hace lo mismo para todas las ocurrencias de una
+   serie nueva hasta su término (o hasta `SERIES_HORIZON` si no termina), con
+   una sola búsqueda y un recorrido ordenado de ambas listas.
+4. `check_event_change` aplica lo anterior a un evento existente cuyo horario o
+   estado cambia (edición, reactivación de un evento cancelado o rechazado).
+
+No se usa una restricción de exclusión de PostgreSQL: el intervalo está en
+`eventos` y el espacio en `espacios_evento`, y sólo los estados activos ocupan
+el espacio; la restricción obligaría a duplicar inicio, término y estado en
+`espacios_evento` y a mantenerlos sincronizados.
+"""
+
+from datetime import timedelta
+
+from .models import ACTIVE_STATUSES, Event, EventRecurrence, EventSpace, Workspace
+from .recurrence import expand, expand_event, load_exceptions, occurrence_event, window_filter
+from .serializers.common import FlexibleDateTimeField
+
+
+# Hasta dónde se revisan los choques de una serie que no termina
+SERIES_HORIZON = timedelta(days=365)
+
+
+class EventConflict(Exception):
+    """El intervalo se cruza con eventos activos en alguno de los espacios."""
+
+    def __init__(self, events):
+        self.events = list(events)
+        super().__init__(f"El horario se cruza con {len(self.events)} evento(s) existente(s).")
+
+
+def lock_workspaces(workspace_ids):
+    """Bloquea las filas de los espacios hasta el fin de la transacción. Retorna sus ids."""
+    return list(
+        Workspace.objects
+        .select_for_update()
+        .filter(id_workspace__in=workspace_ids)
+        .order_by('id_workspace')
+        .values_list('id_workspace', flat=True)
+    )
+
+
+def _busy_events(workspace_ids, start, end, exclude=None):
+    """
+    Eventos activos en los espacios que se cruzan con [start, end): los simples
+    tal cual y las series como una copia por ocurrencia. Ordenados por (inicio, id).
+    """
+    events = (
+        Event.objects.active().in_workspaces(workspace_ids)
+        .filter(window_filter(start, end))
+        .select_related('recurrence')
+    )
+    if exclude is not None:
+        events = events.exclude(pk=exclude)
+    events = list(events)
+
+    series = load_exceptions(events)
+    busy = [event for event in events if getattr(event, 'recurrence', None) is None]
+    for event in series:
+        busy.extend(occurrence_event(event, occurrence) for occurrence in expand_event(event, start, end))
+    busy.sort(key=lambda event: (event.start_datetime, event.id_event))
+    return busy
+
+
+def find_conflicts(workspace_ids, start, end, exclude=None):
+    """Eventos (u ocurrencias) activos que ocupan alguno de los espacios y se cruzan con [start, end)."""
+    return _busy_events(workspace_ids, start, end, exclude=exclude)
+
+
+def check_conflicts(workspace_ids, start, end, exclude=None):
+    """
+    Bloquea los espacios y lanza `EventConflict` si el intervalo choca con otro
+    evento. Debe llamarse dentro de `transaction.atomic()`.
+    """
+    lock_workspaces(workspace_ids)
+    conflicts = list(find_conflicts(workspace_ids, start, end, exclude=exclude))
+    if conflicts:
+        raise EventConflict(conflicts)
+
+
+def check_series_conflicts(workspace_ids, start, end, recurrence, exclude=None):
+    """
+    Como `check_conflicts`, para todas las ocurrencias de una serie que parte en
+    [start, end) con la regla `recurrence` (aún sin guardar).
+    """
+    lock_workspaces(workspace_ids)
+    occurrences = expand(None, start, end, recurrence, {}, start, start + SERIES_HORIZON)
+    if not occurrences:
+        return
+    busy = _busy_events(workspace_ids, occurrences[0].start, occurrences[-1].end, exclude=exclude)
+
+    # Ambas listas están ordenadas por inicio: un recorrido con dos índices
+    conflicting = set()
+    first = 0
+    for occurrence in occurrences:
+        while first < len(busy) and busy[first].end_datetime <= occurrence.start:
+            first += 1
+        index = first
+        while index < len(busy) and busy[index].start_datetime < occurrence.end:
+            if busy[index].end_datetime > occurrence.start:
+                conflicting.add(index)
+            index += 1
+    if conflicting:
+        raise EventConflict(busy[index] for index in sorted(conflicting))
+
+
+def check_event_change(event, start, end, status):
+    """
+    Revisa los choques de `event` (aún con los valores guardados) si pasará a
+    ocupar [start, end) con el estado `status`: sólo si el nuevo estado es activo
+    y cambia el horario o el evento vuelve a un estado activo. Las series se
+    revisan en todas sus ocurrencias. Debe llamarse dentro de `transaction.atomic()`.
+    """
+    if status not in ACTIVE_STATUSES:
+        return
+    if event.status in ACTIVE_STATUSES and (start, end) == (event.start_datetime, event.end_datetime):
+        return
+    workspace_ids = list(EventSpace.objects.filter(event=event).values_list('workspace_id', flat=True))
+    recurrence = EventRecurrence.objects.filter(event=event).first()
+    if recurrence is not None:
+        check_series_conflicts(workspace_ids, start, end, recurrence, exclude=event.pk)
+    else:
+        check_conflicts(workspace_ids, start, end, exclude=event.pk)
+
+
+def conflict_payload(conflict):
+    """Cuerpo de la respuesta 409 con los eventos en conflicto."""
+    field = FlexibleDateTimeField()
+    conflicts = []
+    for event in conflict.events:
+        item = {
+            "id_event": event.id_event,
+            "title": event.title,
+            "start_datetime": field.to_representation(event.start_datetime),
+            "end_datetime": field.to_representation(event.end_datetime),
+            "status": event.status,
+        }
+        if getattr(event, 'original_start', None) is not None:
+            # Ocurrencia de una serie
+            item["original_start"] = field.to_representation(event.original_start)
+        conflicts.append(item)
+    return {"error": str(conflict), "conflicts": conflicts}
@@ -1,11 +1,15 @@
-from .event import Event, EventDetail, EventSpace, RejectReason, StatusEvent
+from .event import (
+    ACTIVE_STATUSES, Event, EventDetail, EventOccurrenceException, EventQuerySet, EventRecurrence, EventSpace,
+    Frequency, RejectReason, StatusEvent,
+)
 from .workspace import Workspace, WorkspaceResource, Table
 from django.contrib.auth.models import User
 
 
 __all__ = [
-    'Event', 'EventDetail',
-    'EventSpace', 'RejectReason', 'StatusEvent',
+    'ACTIVE_STATUSES', 'Event', 'EventDetail', 'EventOccurrenceException',
+    'EventQuerySet', 'EventRecurrence', 'EventSpace', 'Frequency',
+    'RejectReason', 'StatusEvent',
     'Workspace', 'WorkspaceResource',
     'Table', 'User'
 ]
\ No newline at end of file
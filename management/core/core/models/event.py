@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from .__base__ import BaseModel
 from .workspace import Workspace
 
@@ -11,6 +12,40 @@ class StatusEvent(models.IntegerChoices):
     COMPLETED = 4, 'Realizado'
     REJECT = 5, 'Rechazado'
 
+# Estados que ocupan un espacio (los cancelados, realizados y rechazados no)
+ACTIVE_STATUSES = (StatusEvent.AGENDED, StatusEvent.CONFIRMED, StatusEvent.IN_COURSE)
+
+
+class EventQuerySet(models.QuerySet):
+
+    def overlapping(self, start, end):
+        """
+        Eventos cuyo intervalo [inicio, término) se cruza con [start, end).
+        Ambos predicados son rangos simples sobre columnas indexadas.
+        """
+        return self.filter(start_datetime__lt=end, end_datetime__gt=start)
+
+    def in_workspaces(self, workspace_ids):
+        """
+        Eventos que ocupan al menos uno de los espacios indicados, como semi-join
+        (`EXISTS`) para no duplicar filas ni necesitar `distinct()`.
+        """
+        return self.filter(
+            models.Exists(EventSpace.objects.filter(event=models.OuterRef('pk'), workspace_id__in=workspace_ids))
+        )
+
+    def active(self):
+        return self.filter(status__in=ACTIVE_STATUSES)
+
+    def single(self):
+        """Eventos sin recurrencia (una sola ocurrencia, la de la fila)."""
+        return self.filter(recurrence__isnull=True)
+
+    def series(self):
+        """Eventos con recurrencia: su fila describe la primera ocurrencia de la serie."""
+        return self.filter(recurrence__isnull=False)
+
+
 class Event(BaseModel, models.Model):
     id_event = models.AutoField(primary_key=True, db_column='id_evento')
     title = models.CharField(max_length=200, db_column='titulo', verbose_name='Título')
@@ -21,10 +56,22 @@ class Event(BaseModel, models.Model):
     form_edit_link = models.URLField(blank=True, null=True, db_column='enlace_form_edicion')
     status = models.IntegerField(choices=StatusEvent.choices, default=StatusEvent.AGENDED, db_column='estado', verbose_name='Estado del evento')
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         db_table = 'eventos'
         verbose_name = 'Evento'
         verbose_name_plural = 'Eventos'
+        indexes = [
+            # Ventanas de tiempo (`overlapping`): rango sobre término y filtro por inicio
+            models.Index(fields=['end_datetime', 'start_datetime'], name='evento_termino_inicio_idx'),
+            # Orden y paginación por cursor (inicio, id)
+            models.Index(fields=['start_datetime', 'id_event'], name='evento_inicio_id_idx'),
+            # Eventos vigentes por estado (con el planificador de estados activo)
+            models.Index(fields=['status', 'start_datetime'], name='evento_estado_inicio_idx'),
+            # Cambios recientes (poller del stream de eventos)
+            models.Index(fields=['updated_at'], name='evento_actualizado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.start_datetime} - {self.end_datetime})"
@@ -53,10 +100,103 @@ class EventSpace(BaseModel, models.Model):
         db_table = 'espacios_evento'
         verbose_name = 'Espacio de evento'
         verbose_name_plural = 'Espacios de eventos'
+        indexes = [
+            # Filtro `in_workspaces` (EXISTS por espacio y evento)
+            models.Index(fields=['workspace', 'event'], name='espacio_evento_ws_ev_idx'),
+        ]
 
     def __str__(self):
         return f"Event {self.event.id_event} in Workspace {self.workspace.id_workspace}"
     
+class Frequency(models.TextChoices):
+    DAILY = 'DAILY', 'Diaria'
+    WEEKLY = 'WEEKLY', 'Semanal'
+    MONTHLY = 'MONTHLY', 'Mensual'
+
+
+def _touch_event(event_id):
+    # Las versiones (ETag de feeds, stream, índices) se basan en `updated_at` del evento
+    Event.objects.filter(pk=event_id).update(updated_at=timezone.now())
+
+
+class EventRecurrence(BaseModel, models.Model):
+    """
+    Regla de repetición (subconjunto de RRULE, ver `core/recurrence.py`) de un
+    evento. El evento describe la primera ocurrencia; las demás se calculan al
+    consultar, sólo dentro de la ventana pedida.
+    """
+    id_recurrence = models.AutoField(primary_key=True, db_column='id_recurrencia')
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='recurrence', db_column='evento')
+    frequency = models.CharField(max_length=10, choices=Frequency.choices, db_column='frecuencia', verbose_name='Frecuencia')
+    interval = models.PositiveSmallIntegerField(default=1, db_column='intervalo', verbose_name='Intervalo')
+    weekdays = models.CharField(max_length=20, blank=True, db_column='dias_semana', verbose_name='Días de la semana')
+    until = models.DateTimeField(null=True, blank=True, db_column='hasta', verbose_name='Hasta')
+    count = models.PositiveIntegerField(null=True, blank=True, db_column='repeticiones', verbose_name='Repeticiones')
+    # Término de la última ocurrencia (None si la serie no termina); lo calcula `save`
+    last_end = models.DateTimeField(null=True, blank=True, editable=False, db_column='termino_serie')
+
+    class Meta:
+        db_table = 'recurrencias_evento'
+        verbose_name = 'Recurrencia de evento'
+        verbose_name_plural = 'Recurrencias de eventos'
+
+    def __str__(self):
+        from ..recurrence import format_rrule
+        return format_rrule(self)
+
+    def save(self, *args, **kwargs):
+        from ..recurrence import series_last_end
+        self.last_end = series_last_end(self)
+        super().save(*args, **kwargs)
+        _touch_event(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _touch_event(self.event_id)
+        return result
+
+
+class EventOccurrenceException(BaseModel, models.Model):
+    """
+    Cambio de una ocurrencia de una serie, identificada por su inicio original:
+    cancelada o con otro horario.
+    """
+    id_exception = models.AutoField(primary_key=True, db_column='id_excepcion')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrence_exceptions', db_column='evento')
+    original_start = models.DateTimeField(db_column='inicio_original', verbose_name='Inicio original')
+    cancelled = models.BooleanField(default=False, db_column='cancelada', verbose_name='¿Cancelada?')
+    start_datetime = models.DateTimeField(null=True, blank=True, db_column='inicio')
+    end_datetime = models.DateTimeField(null=True, blank=True, db_column='termino')
+
+    class Meta:
+        db_table = 'excepciones_ocurrencia'
+        verbose_name = 'Excepción de ocurrencia'
+        verbose_name_plural = 'Excepciones de ocurrencias'
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'original_start'], name='excepcion_evento_inicio_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Ocurrencia {self.original_start} de {self.event_id}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._refresh_series()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._refresh_series()
+        return result
+
+    def _refresh_series(self):
+        # Una ocurrencia movida puede extender el término de la serie
+        recurrence = EventRecurrence.objects.filter(event_id=self.event_id).select_related('event').first()
+        if recurrence is not None:
+            recurrence.save(update_fields=['last_end', 'updated_at'])
+        else:
+            _touch_event(self.event_id)
+
+
 class RejectReason(BaseModel, models.Model):
     id_reason = models.AutoField(primary_key=True, db_column='id_motivo')
     event = models.OneToOneField(Event, on_delete=models.CASCADE, db_column='agenda')
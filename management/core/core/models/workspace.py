@@ -3,6 +3,7 @@ from django.conf import settings
 import os
 from django.utils.deconstruct import deconstructible
 from .__base__ import BaseModel
+from ..thumbnails import delete_thumbnails, schedule_thumbnails
 
 class Zona(models.TextChoices):
     NO = 'NO', 'Noroeste'
@@ -74,6 +75,8 @@ class Table(BaseModel, models.Model):
     movable = models.BooleanField(db_column='es_movil', verbose_name='¿Es móvil?')
     description = models.TextField(db_column='descripcion', verbose_name='Descripción')
     image = models.ImageField(upload_to=TableImagePath(), null=True, blank=True, db_column='imagen')
+    # Claves de las miniaturas ya generadas para `image` (ver core.thumbnails)
+    image_sizes = models.JSONField(default=list, blank=True, editable=False, db_column='imagen_tamanos')
     
     class Meta:
         db_table = 'mesas'
@@ -81,9 +84,15 @@ class Table(BaseModel, models.Model):
         verbose_name_plural = 'Mesas'
     
     def save(self, *args, **kwargs):
+        # Imagen recién subida (aún no escrita en el storage)
+        new_image = bool(self.image) and not self.image._committed
+        if new_image or not self.image:
+            self.image_sizes = []
+
         try:
             old = Table.objects.get(pk=self.pk)
             if old.image and self.image != old.image:
+                delete_thumbnails(old.image.storage, old.image.name)
                 old.image.delete(save=False)
         except Table.DoesNotExist:
             pass
@@ -108,5 +117,13 @@ class Table(BaseModel, models.Model):
 
             super().save(update_fields=["image"])
 
+        # Generar miniaturas de la imagen nueva fuera del ciclo de la solicitud
+        if new_image and self.image:
+            pk, name = self.pk, self.image.name
+            schedule_thumbnails(
+                self.image.storage, name,
+                on_done=lambda sizes: Table.objects.filter(pk=pk, image=name).update(image_sizes=sizes),
+            )
+
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -0,0 +1,357 @@
+"""
+Eventos recurrentes: reglas de repetición y expansión de ocurrencias.
+
+Una serie se guarda como una sola fila de `Event` (la primera ocurrencia), su
+`EventRecurrence` y las excepciones de ocurrencias puntuales; el tamaño de las
+tablas depende del número de series, no del de ocurrencias.
+
+Las reglas son un subconjunto de RRULE (RFC 5545, sección 3.3.10):
+
+    FREQ=DAILY|WEEKLY|MONTHLY [;INTERVAL=n] [;BYDAY=MO,WE,...] [;UNTIL=...|;COUNT=n]
+
+`BYDAY` sólo se acepta con `FREQ=WEEKLY`. `UNTIL` es un límite inclusivo sobre el
+inicio de las ocurrencias.
+
+Las ocurrencias se calculan al consultar y sólo dentro de la ventana pedida: con
+frecuencia diaria y semanal se salta directamente al primer periodo de la
+ventana (el número de ocurrencia se calcula aritméticamente, por lo que
+`COUNT` sigue siendo exacto). La repetición se hace sobre la hora local
+(`TIME_ZONE`), de modo que una serie de las 10:00 sigue a las 10:00 después de
+un cambio de horario.
+"""
+
+import calendar
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Max, Prefetch, Q, prefetch_related_objects
+from django.utils import timezone
+
+from .models import EventOccurrenceException, Frequency
+
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Meses seguidos sin ocurrencias tras los que una serie mensual se da por agotada
+# (p. ej. el día 31 cada 12 meses a partir de un mes de 30 días)
+MAX_EMPTY_MONTHS = 48
+
+Occurrence = namedtuple('Occurrence', 'event_id original_start start end modified')
+
+
+class RecurrenceError(ValueError):
+    """Regla de repetición inválida o fuera del subconjunto soportado."""
+
+
+# -- reglas --------------------------------------------------------------------
+
+def _parse_until(value):
+    for fmt in ('%Y%m%dT%H%M%SZ', '%Y%m%dT%H%M%S', '%Y%m%d'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == '%Y%m%d':
+            # Una fecha incluye todas las ocurrencias de ese día
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        if fmt.endswith('Z'):
+            return parsed.replace(tzinfo=dt_timezone.utc)
+        return timezone.make_aware(parsed)
+    raise RecurrenceError(f"UNTIL inválido: {value}")
+
+
+def _positive(name, value):
+    if not value.isdigit() or int(value) < 1:
+        raise RecurrenceError(f"{name} debe ser un entero positivo.")
+    return int(value)
+
+
+def parse_rrule(text):
+    """
+    Interpreta una regla (con o sin el prefijo `RRULE:`). Retorna un dict con
+    `frequency`, `interval`, `weekdays`, `until` y `count`, listo para crear un
+    `EventRecurrence`.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise RecurrenceError("La regla de repetición está vacía.")
+    text = text.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+
+    parts = {}
+    for part in text.split(';'):
+        name, sep, value = part.partition('=')
+        name = name.strip().upper()
+        if not sep or not name or not value.strip():
+            raise RecurrenceError(f"Parte inválida en la regla: {part!r}")
+        if name in parts:
+            raise RecurrenceError(f"{name} está repetido.")
+        parts[name] = value.strip().upper()
+
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'UNTIL', 'COUNT'}
+    if unsupported:
+        raise RecurrenceError(f"Partes no soportadas: {', '.join(sorted(unsupported))}")
+    frequency = parts.get('FREQ')
+    if frequency not in Frequency.values:
+        raise RecurrenceError(f"FREQ debe ser uno de: {', '.join(Frequency.values)}")
+
+    weekdays = ''
+    if 'BYDAY' in parts:
+        if frequency != Frequency.WEEKLY:
+            raise RecurrenceError("BYDAY sólo se admite con FREQ=WEEKLY.")
+        days = parts['BYDAY'].split(',')
+        if any(day not in WEEKDAYS for day in days):
+            raise RecurrenceError(f"BYDAY inválido: {parts['BYDAY']}")
+        weekdays = ','.join(sorted(set(days), key=WEEKDAYS.index))
+
+    if 'UNTIL' in parts and 'COUNT' in parts:
+        raise RecurrenceError("UNTIL y COUNT no pueden usarse juntos.")
+
+    return {
+        'frequency': frequency,
+        'interval': _positive('INTERVAL', parts['INTERVAL']) if 'INTERVAL' in parts else 1,
+        'weekdays': weekdays,
+        'until': _parse_until(parts['UNTIL']) if 'UNTIL' in parts else None,
+        'count': _positive('COUNT', parts['COUNT']) if 'COUNT' in parts else None,
+    }
+
+
+def format_rrule(recurrence):
+    """Regla RRULE (sin prefijo) de un `EventRecurrence`."""
+    parts = [f"FREQ={recurrence.frequency}"]
+    if recurrence.interval and recurrence.interval != 1:
+        parts.append(f"INTERVAL={recurrence.interval}")
+    if recurrence.weekdays:
+        parts.append(f"BYDAY={recurrence.weekdays}")
+    if recurrence.until is not None:
+        parts.append(f"UNTIL={recurrence.until.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')}")
+    if recurrence.count:
+        parts.append(f"COUNT={recurrence.count}")
+    return ';'.join(parts)
+
+
+# -- expansión -------------------------------------------------------------------
+
+def _local(value):
+    return timezone.localtime(value).replace(tzinfo=None)
+
+
+def _naive_starts(recurrence, base, after):
+    """
+    Inicios (hora local, sin zona) de la serie que parte en `base`, en orden y
+    junto a su número de ocurrencia, desde el primero >= `after` (o desde el
+    primero si `after` es None).
+    """
+    interval = recurrence.interval or 1
+
+    if recurrence.frequency == Frequency.DAILY:
+        step = timedelta(days=interval)
+        index = 0
+        if after is not None and after > base:
+            index = -((base - after) // step)  # techo de (after - base) / step
+        while True:
+            yield index, base + index * step
+            index += 1
+
+    elif recurrence.frequency == Frequency.WEEKLY:
+        days = sorted({WEEKDAYS.index(day) for day in recurrence.weekdays.split(',') if day}) or [base.weekday()]
+        week_start = base - timedelta(days=base.weekday())
+        # Días de la primera semana anteriores al inicio: no son ocurrencias
+        skipped = sum(1 for day in days if day < base.weekday())
+        period = 0
+        if after is not None and after > week_start:
+            period = (after - week_start) // timedelta(weeks=interval)
+        while True:
+            for position, day in enumerate(days):
+                index = period * len(days) + position - skipped
+                if index >= 0:
+                    yield index, week_start + timedelta(weeks=period * interval, days=day)
+            period += 1
+
+    else:
+        index = 0
+        empty = 0
+        month_offset = 0
+        while empty <= MAX_EMPTY_MONTHS:
+            year, month = divmod(base.month - 1 + month_offset, 12)
+            year += base.year
+            month += 1
+            month_offset += interval
+            if base.day > calendar.monthrange(year, month)[1]:
+                # El mes no tiene ese día: no hay ocurrencia (como en RFC 5545)
+                empty += 1
+                continue
+            empty = 0
+            yield index, base.replace(year=year, month=month)
+            index += 1
+
+
+def iter_starts(recurrence, dtstart, after=None):
+    """
+    Inicios originales (con zona) de las ocurrencias de la serie que parte en
+    `dtstart`, en orden, desde el primero >= `after`. Respeta COUNT y UNTIL.
+    """
+    base = _local(dtstart)
+    local_after = _local(after) if after is not None else None
+    for index, naive in _naive_starts(recurrence, base, local_after):
+        if recurrence.count and index >= recurrence.count:
+            return
+        start = timezone.make_aware(naive)
+        if recurrence.until is not None and start > recurrence.until:
+            return
+        if local_after is not None and naive < local_after:
+            continue
+        yield start
+
+
+def is_occurrence(recurrence, dtstart, original_start):
+    """Si `original_start` es el inicio de una ocurrencia de la serie."""
+    return next(iter_starts(recurrence, dtstart, after=original_start), None) == original_start
+
+
+def series_last_end(recurrence):
+    """
+    Término de la última ocurrencia de la serie (considerando las ocurrencias
+    movidas), o None si la serie no termina.
+    """
+    if not recurrence.count and recurrence.until is None:
+        return None
+    event = recurrence.event
+    duration = event.end_datetime - event.start_datetime
+    last_start = None
+    for last_start in iter_starts(recurrence, event.start_datetime):
+        pass
+    ends = [last_start + duration if last_start is not None else event.end_datetime]
+    if event.pk is not None:
+        moved = EventOccurrenceException.objects.filter(event=event).aggregate(end=Max('end_datetime'))['end']
+        if moved is not None:
+            ends.append(moved)
+    return max(ends)
+
+
+def expand(event_id, dtstart, dtend, recurrence, exceptions, window_start, window_end):
+    """
+    Ocurrencias de la serie que se cruzan con [window_start, window_end),
+    ordenadas por (inicio, id). `exceptions` es {inicio original: excepción}.
+    Las canceladas se omiten; las modificadas usan su nuevo horario.
+    """
+    duration = dtend - dtstart
+    occurrences = []
+    seen = set()
+    # Una ocurrencia que empieza antes de `window_start - duration` no llega a la ventana
+    for original in iter_starts(recurrence, dtstart, after=window_start - duration):
+        if original >= window_end:
+            break
+        exception = exceptions.get(original)
+        if exception is None:
+            if original + duration > window_start:
+                occurrences.append(Occurrence(event_id, original, original, original + duration, False))
+            continue
+        seen.add(original)
+        if not exception.cancelled:
+            start = exception.start_datetime or original
+            end = exception.end_datetime or start + duration
+            if start < window_end and end > window_start:
+                occurrences.append(Occurrence(event_id, original, start, end, True))
+
+    # Ocurrencias movidas hacia la ventana desde fuera de ella
+    for original, exception in exceptions.items():
+        if original in seen or exception.cancelled or exception.start_datetime is None:
+            continue
+        start = exception.start_datetime
+        end = exception.end_datetime or start + duration
+        if start < window_end and end > window_start:
+            occurrences.append(Occurrence(event_id, original, start, end, True))
+
+    occurrences.sort(key=lambda occurrence: (occurrence.start, occurrence.event_id))
+    return occurrences
+
+
+def series_filter(start, end, prefix=''):
+    """Condición para las series que pueden tener ocurrencias en [start, end)."""
+    return (
+        Q(**{f'{prefix}recurrence__isnull': False, f'{prefix}start_datetime__lt': end})
+        & (Q(**{f'{prefix}recurrence__last_end__isnull': True}) | Q(**{f'{prefix}recurrence__last_end__gt': start}))
+    )
+
+
+def window_filter(start, end, prefix=''):
+    """
+    Condición para eventos simples que se cruzan con [start, end) o series que
+    pueden tener ocurrencias en ese rango. `prefix` permite usarla desde otro
+    modelo (p. ej. 'event__' desde `EventSpace`).
+    """
+    single = Q(**{
+        f'{prefix}recurrence__isnull': True,
+        f'{prefix}start_datetime__lt': end,
+        f'{prefix}end_datetime__gt': start,
+    })
+    return single | series_filter(start, end, prefix)
+
+
+def series_in_window(events, start, end):
+    """
+    Series de `events` que pueden tener ocurrencias en [start, end), con su regla
+    y sus excepciones cargadas.
+    """
+    return (
+        events
+        .filter(series_filter(start, end))
+        .select_related('recurrence')
+        .prefetch_related(Prefetch('occurrence_exceptions', queryset=EventOccurrenceException.objects.all()))
+    )
+
+
+def load_exceptions(events):
+    """
+    Carga las excepciones de las series entre `events` (con `recurrence` en
+    `select_related`) en una consulta, sólo si hay alguna serie.
+    """
+    series = [event for event in events if getattr(event, 'recurrence', None) is not None]
+    if series:
+        prefetch_related_objects(series, 'occurrence_exceptions')
+    return series
+
+
+def expand_event(event, window_start, window_end):
+    """Ocurrencias de una serie (de `series_in_window`) que se cruzan con la ventana."""
+    exceptions = {exception.original_start: exception for exception in event.occurrence_exceptions.all()}
+    return expand(
+        event.pk, event.start_datetime, event.end_datetime, event.recurrence, exceptions, window_start, window_end,
+    )
+
+
+def next_occurrence(event, after):
+    """
+    Ocurrencia de una serie (de `series_in_window` o con `load_exceptions`) en
+    curso en `after` o, si no hay, la siguiente; None si la serie ya terminó.
+    """
+    duration = event.end_datetime - event.start_datetime
+    exceptions = {exception.original_start: exception for exception in event.occurrence_exceptions.all()}
+    candidates = []
+    # La primera ocurrencia sin excepción que termina después de `after`
+    for original in iter_starts(event.recurrence, event.start_datetime, after=after - duration):
+        if original not in exceptions and original + duration > after:
+            candidates.append(Occurrence(event.pk, original, original, original + duration, False))
+            break
+    # Las modificadas pueden haberse movido antes o después de ella
+    for original, exception in exceptions.items():
+        if exception.cancelled:
+            continue
+        start = exception.start_datetime or original
+        end = exception.end_datetime or start + duration
+        if end > after:
+            candidates.append(Occurrence(event.pk, original, start, end, True))
+    return min(candidates, key=lambda occurrence: occurrence.start, default=None)
+
+
+def occurrence_event(event, occurrence):
+    """
+    Copia del evento de la serie con el horario de la ocurrencia, para
+    serializarla como un evento más. `original_start` identifica la ocurrencia.
+    """
+    copy = event.__class__.__new__(event.__class__)
+    copy.__dict__.update(event.__dict__)
+    copy.start_datetime = occurrence.start
+    copy.end_datetime = occurrence.end
+    copy.original_start = occurrence.original_start
+    return copy
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from ..models.workspace import Workspace, WorkspaceResource, Table
+from ..thumbnails import thumbnail_urls
 
 
 class WorkspaceResourceSerializer(serializers.ModelSerializer):
@@ -16,9 +17,14 @@ class WorkspaceSerializer(serializers.ModelSerializer):
         db_table = 'espacios'
 
 class TableSerializer(serializers.ModelSerializer):
+    image_thumbnails = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = Table
-        fields = '__all__'
+        exclude = ['image_sizes']
+
+    def get_image_thumbnails(self, obj):
+        return thumbnail_urls(obj.image, obj.image_sizes, self.context.get('request'))
     
     def get_image_url(self, obj):
         request = self.context.get('request')
@@ -1,3 +1,61 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Event, EventSpace, StatusEvent, Workspace
+
+
+class EventConflictTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('coordinador', password='x')
+        cls.sala = Workspace.objects.create(name='Sala', space_type='Sala', description='', max_occupancy=10, zone_space='NO')
+        cls.day = (timezone.localtime() + timedelta(days=2)).date()
+        cls.existing = cls._event(10, 12)
+
+    @classmethod
+    def _at(cls, hour):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour)))
+
+    @classmethod
+    def _event(cls, h1, h2, status=StatusEvent.CONFIRMED):
+        event = Event.objects.create(title='Evento', start_datetime=cls._at(h1), end_datetime=cls._at(h2),
+                                     created_by=cls.user, status=status)
+        EventSpace.objects.create(event=event, workspace=cls.sala)
+        return event
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_update_checks_conflicts(self):
+        event = self._event(13, 14)
+        url = reverse('event-manage-detail', args=[event.pk])
+        response = self.client.put(url, {'start_datetime': f'{self.day.isoformat()}T11:00:00'}, format='json')
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual([c['id_event'] for c in response.json()['conflicts']], [self.existing.pk])
+        event.refresh_from_db()
+        self.assertEqual(event.start_datetime, self._at(13))
+
+        response = self.client.put(url, {'start_datetime': f'{self.day.isoformat()}T12:00:00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_reactivation_checks_conflicts(self):
+        event = self._event(11, 13, status=StatusEvent.CANCELL)
+        url = reverse('event-manage-update-status', args=[event.pk])
+        response = self.client.post(url, {'status': StatusEvent.CONFIRMED}, format='json')
+        self.assertEqual(response.status_code, 409, response.content)
+        event.refresh_from_db()
+        self.assertEqual(event.status, StatusEvent.CANCELL)
 
-# Create your tests here.
+        # Cancelar o rechazar nunca genera choques
+        other = self._event(12, 13, status=StatusEvent.AGENDED)
+        self.assertEqual(
+            self.client.post(reverse('event-manage-update-status', args=[other.pk]),
+                             {'status': StatusEvent.REJECT, 'reason': 'Duplicado'}, format='json').status_code,
+            200,
+        )
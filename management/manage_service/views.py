@@ -2,10 +2,14 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
-from core.models import Workspace, WorkspaceResource, Event, EventDetail, RejectReason, EventSpace
-from core.models.event import StatusEvent
+from core.conflicts import (
+    EventConflict, check_conflicts, check_event_change, check_series_conflicts, conflict_payload,
+)
+from core.models import Workspace, WorkspaceResource, Event, EventDetail, RejectReason, EventSpace, EventRecurrence
+from core.models.event import ACTIVE_STATUSES, StatusEvent
 from core.serializers import (
     WorkspaceSerializer,
     WorkspaceResourceSerializer,
@@ -191,8 +195,14 @@ class EventsManagementViewSet(viewsets.ViewSet):
         event = get_object_or_404(Event, pk=pk)
         new_status = request.data.get("status", None)
         if new_status is not None and new_status in dict(StatusEvent.choices).keys():
-            event.status = new_status
-            event.save()
+            try:
+                with transaction.atomic():
+                    # Reactivar un evento cancelado o rechazado no puede generar choques
+                    check_event_change(event, event.start_datetime, event.end_datetime, new_status)
+                    event.status = new_status
+                    event.save()
+            except EventConflict as conflict:
+                return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
             
             if new_status == StatusEvent.REJECT or new_status == StatusEvent.CANCELL:
                 reason_text = request.data.get("reason", "")
@@ -206,35 +216,79 @@ class EventsManagementViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['post'])
     def edit_duration(self, request, pk=None):
         event = get_object_or_404(Event, pk=pk)
-        new_start = request.data.get("start_datetime", None)
-        new_end = request.data.get("end_datetime", None)
-        
-        if new_start:
-            event.start_datetime = new_start
-        if new_end:
-            event.end_datetime = new_end
-        
-        event.save()
+        data = {
+            field: request.data.get(field)
+            for field in ('start_datetime', 'end_datetime')
+            if request.data.get(field)
+        }
+        serializer = EventSerializer(event, data=data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        start = serializer.validated_data.get('start_datetime', event.start_datetime)
+        end = serializer.validated_data.get('end_datetime', event.end_datetime)
+        if end <= start:
+            return Response({"error": "La fecha de término debe ser posterior a la de inicio."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # En una serie recurrente el cambio se aplica a todas sus ocurrencias
+        recurrence = EventRecurrence.objects.filter(event=event).first()
+
+        try:
+            with transaction.atomic():
+                # Bloquea los espacios del evento y rechaza el cambio si choca con otro activo
+                if event.status in ACTIVE_STATUSES:
+                    workspace_ids = list(EventSpace.objects.filter(event=event).values_list('workspace_id', flat=True))
+                    if recurrence is not None:
+                        check_series_conflicts(workspace_ids, start, end, recurrence, exclude=event.pk)
+                    else:
+                        check_conflicts(workspace_ids, start, end, exclude=event.pk)
+                event.start_datetime = start
+                event.end_datetime = end
+                event.save(update_fields=['start_datetime', 'end_datetime', 'updated_at'])
+                if recurrence is not None:
+                    recurrence.event = event
+                    recurrence.save(update_fields=['last_end', 'updated_at'])
+        except EventConflict as conflict:
+            return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
+
         return Response({"message": "Duración del evento actualizada correctamente."})
     
     # Actualizar un campo o todos los campos de Evento y/o los detalles del evento
     def update(self, request, pk=None):
         event = get_object_or_404(Event, pk=pk)
         event_serializer = EventSerializer(event, data=request.data, partial=True)
-        
-        if event_serializer.is_valid():
-            event_serializer.save()
-            
-            detail_data = request.data.get("detail", None)
-            if detail_data:
-                event_detail = get_object_or_404(EventDetail, event=event)
-                event_detail_serializer = EventDetailSerializer(event_detail, data=detail_data, partial=True)
-                if event_detail_serializer.is_valid():
+        if not event_serializer.is_valid():
+            return Response(event_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        event_serializer.validated_data.pop('create_invitation', None)
+
+        event_detail_serializer = None
+        detail_data = request.data.get("detail", None)
+        if detail_data:
+            event_detail = get_object_or_404(EventDetail, event=event)
+            event_detail_serializer = EventDetailSerializer(event_detail, data=detail_data, partial=True)
+            if not event_detail_serializer.is_valid():
+                return Response(event_detail_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        start = event_serializer.validated_data.get('start_datetime', event.start_datetime)
+        end = event_serializer.validated_data.get('end_datetime', event.end_datetime)
+        if end <= start:
+            return Response({"error": "La fecha de término debe ser posterior a la de inicio."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        moved = (start, end) != (event.start_datetime, event.end_datetime)
+
+        try:
+            with transaction.atomic():
+                # Un cambio de horario o una reactivación no puede generar choques
+                check_event_change(event, start, end, event_serializer.validated_data.get('status', event.status))
+                event = event_serializer.save()
+                recurrence = EventRecurrence.objects.filter(event=event).first()
+                if moved and recurrence is not None:
+                    recurrence.event = event
+                    recurrence.save(update_fields=['last_end', 'updated_at'])
+                if event_detail_serializer is not None:
                     event_detail_serializer.save()
-                else:
-                    return Response(event_detail_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            return Response(event_serializer.data)
-        
-        return Response(event_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
\ No newline at end of file
+        except EventConflict as conflict:
+            return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
+
+        return Response(event_serializer.data)
@@ -105,4 +105,12 @@ STATIC_URL = 'static/'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Miniaturas de imágenes subidas (ver core/thumbnails.py)
+THUMBNAIL_SIZES = {
+    'sm': (320, 320),
+    'md': (640, 640),
+}
+THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'WEBP')
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
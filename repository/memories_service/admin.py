@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Memoria, MemoriaDetalle
+from .models import ArchivoBlob, Memoria, MemoriaDetalle
 
 
 admin.site.register(Memoria)
 admin.site.register(MemoriaDetalle)
+admin.site.register(ArchivoBlob)
@@ -1,21 +1,60 @@
+import io
 import os
-from django.http import FileResponse
+import json
+import hashlib
+from django.conf import settings
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.text import slugify
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Memoria, MemoriaDetalle
-from django.forms.models import model_to_dict
-from .serializers import MemoriaSerializer
-from django.db.models import Q
-from datetime import datetime
-from django.core.exceptions import ValidationError
-from .filter_config import get_valid_fields, get_career_choices, get_escuela_choices, get_detalle_valid_fields
-from .models import validar_rut
+from .models import Memoria
+from .serializers import MemoriaSerializer, MemoriaDetalleSerializer
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from django.core.cache import cache
+from .filter_config import get_career_choices, get_escuela_choices, get_filter_schema
+from .cache import (
+    cache_is_shared, cached_memoria_payload, catalog_cache_key, catalog_cache_timeout, get_memoria_etag,
+    memoria_version, set_memoria_etag,
+)
+from .delivery import deliver_file, file_etag, iter_zip_stream
+from .export import EXPORT_FORMATS, iter_export
+from .importer import ManifestError, import_memorias, manifest_format, open_source, read_manifest
+
+
+def _compute_etag(data):
+    """ETag fuerte a partir de la representación JSON de la respuesta."""
+    digest = hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def _etag_matches(request, etag):
+    """Indica si `If-None-Match` de la solicitud incluye el ETag dado."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def _not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
 
 
 class DownloadMemoryView(APIView):
     """
     Endpoint para descargar archivos PDF de memorias.
+
+    Soporta solicitudes condicionales (`ETag` / `Last-Modified` basados en
+    `updated_at` y el tamaño del archivo) y rangos de bytes, de modo que los
+    visores de PDF puedan reanudar o leer páginas de forma parcial. El archivo se
+    lee a través del storage configurado (local o S3), y su transferencia puede
+    delegarse al servidor web o a S3 (ver `delivery.get_delivery_backend`).
     """
 
     def get(self, request, pk):
@@ -27,83 +66,99 @@ class DownloadMemoryView(APIView):
         if not memory.loc_disco:
             return Response({"error": "No hay archivo disponible para esta memoria."}, status=status.HTTP_404_NOT_FOUND)
 
-        file_path = memory.loc_disco.path
-        if not os.path.exists(file_path):
+        storage = memory.loc_disco.storage
+        name = memory.loc_disco.name
+        try:
+            size = storage.size(name)
+        except Exception:
+            # FileNotFoundError en disco local, ClientError en S3
             return Response({"error": "El archivo no se encuentra en el servidor."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Devuelve el archivo PDF como descarga
-        response = FileResponse(open(file_path, 'rb'), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-        return response
-    
+        # Devuelve el archivo PDF como descarga. Según `MEMORIAS_DELIVERY_BACKEND`
+        # los bytes los envía Django, el servidor web frontal o S3 directamente.
+        return deliver_file(
+            request,
+            storage,
+            name,
+            size,
+            content_type='application/pdf',
+            filename=f"memoria_{memory.id_memo}{os.path.splitext(name)[1] or '.pdf'}",
+            etag=file_etag(memory, size),
+            last_modified=memory.updated_at,
+        )
+
+
 class MemoryDetailView(APIView):
     """
     Endpoint que devuelve los datos de una memoria específica y sus detalles relacionados.
     (Se excluye el campo `loc_disco` ya que se obtiene desde el endpoint de descarga).
+
+    La memoria y sus `detalles` se cargan con un único prefetch y la respuesta lleva
+    un `ETag`. La respuesta serializada se guarda en la caché de lectura de
+    memorias (`cache.cached_memoria_payload`), bajo la versión (`updated_at`) de la
+    memoria.
+
+    Si el cliente envía `If-None-Match` con el ETag vigente se responde 304:
+    - con una caché de Django compartida (ver `CACHES`), sin consultar la base de
+      datos: las señales de cualquier proceso borran el ETag guardado;
+    - con una caché local de cada proceso, tras leer sólo `updated_at` de la
+      memoria, ya que las escrituras de otros procesos no la alcanzan.
     """
     def get(self, request, pk):
+        shared = cache_is_shared()
+        if shared:
+            etag = get_memoria_etag(pk)
+            if etag and _etag_matches(request, etag):
+                return _not_modified(etag)
+
+        version = memoria_version(pk)
+        if version is None:
+            return Response({"error": "La memoria solicitada no existe."}, status=status.HTTP_404_NOT_FOUND)
+        if not shared:
+            etag = get_memoria_etag(pk, version)
+            if etag and _etag_matches(request, etag):
+                return _not_modified(etag)
+
         try:
-            memory = Memoria.objects.get(pk=pk)
+            payload = cached_memoria_payload(
+                'detail', pk, lambda: self.build_payload(request, pk),
+                variant=request.build_absolute_uri('/'), version=version,
+            )
         except Memoria.DoesNotExist:
             return Response({"error": "La memoria solicitada no existe."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Usar el serializer de DRF para representar la instancia principal.
-        # Evitamos incluir `loc_disco` (archivo PDF) en la respuesta y
-        # añadimos una URL pública para la imagen si existe.
-        try:
-            serializer = MemoriaSerializer(memory, context={'request': request})
-            memory_data = serializer.data
-        except Exception:
-            # Fallback si el serializer falla por alguna razón
-            try:
-                memory_data = model_to_dict(memory, exclude=['loc_disco', 'imagen_display'])
-            except Exception:
-                memory_data = {"id": memory.pk}
+        etag = payload['etag']
+        set_memoria_etag(pk, etag, version)
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+
+        response = Response(payload['data'], status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        # Permitir que el cliente guarde la respuesta, pero revalidando siempre
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def build_payload(self, request, pk):
+        """Serializa la memoria y sus detalles; lanza `Memoria.DoesNotExist` si no existe."""
+        memory = Memoria.objects.prefetch_related('detalles').get(pk=pk)
+
+        memory_data = dict(MemoriaSerializer(memory, context={'request': request}).data)
+        detalles = list(MemoriaDetalleSerializer(memory.detalles.all(), many=True).data)
 
-        # Recolectar relaciones "detalles" (one-to-many y many-to-many)
         details = {}
-        for field in memory._meta.get_fields():
-            if not (field.one_to_many or field.many_to_many):
-                continue
-
-            # Intentar obtener el manager relacionado por accessor_name (reverse) o por name (direct M2M)
-            accessors = []
-            try:
-                accessors.append(field.get_accessor_name())
-            except Exception:
-                pass
-            accessors.append(field.name)
-
-            for acc in accessors:
-                if not acc:
-                    continue
-                related_attr = getattr(memory, acc, None)
-                if related_attr is None:
-                    continue
-                # Si es un manager/queryset
-                if hasattr(related_attr, "all"):
-                    try:
-                        qs = related_attr.all()
-                        details_list = []
-                        for obj in qs:
-                            try:
-                                details_list.append(model_to_dict(obj))
-                            except Exception:
-                                details_list.append({"id": getattr(obj, "pk", None)})
-                        if details_list:
-                            details[acc] = details_list
-                    except Exception:
-                        continue
-
-        return Response({"memory": memory_data, "details": details}, status=status.HTTP_200_OK)
+        if detalles:
+            details['detalles'] = detalles
+
+        data = {"memory": memory_data, "details": details}
+        return {"data": data, "etag": _compute_etag(data)}
 
 
 class FilterMemoriesView(APIView):
     """
     Endpoint para filtrar memorias por cualquier campo con validación de datos.
     
-    Las configuraciones (campos válidos y choices) se obtienen dinámicamente del modelo,
-    por lo que cualquier cambio en el modelo se reflejará automáticamente.
+    Las configuraciones (campos válidos y choices) se obtienen del modelo y se compilan
+    una sola vez al iniciar la app (ver `filter_config.get_filter_schema`).
     
     Soporta filtros por:
     - id_memo: entero
@@ -117,6 +172,8 @@ class FilterMemoriesView(APIView):
     - fecha_inicio: fecha (YYYY-MM-DD) o año (YYYY)
     - fecha_termino: fecha (YYYY-MM-DD) o año (YYYY)
     - fecha_subida: fecha (YYYY-MM-DD) o año (YYYY)
+    - fecha_inicio_year, fecha_termino_year, fecha_subida_year: año (YYYY)
+    - rut_estudiante, nombre_estudiante, apellido_estudiante, ...: campos de `MemoriaDetalle`
     
     Ejemplo de uso:
     POST /api/memos/filter/
@@ -130,82 +187,18 @@ class FilterMemoriesView(APIView):
     }
     """
     
-    def __init__(self, *args, **kwargs):
-        """Inicializa el endpoint obteniendo las configuraciones del modelo."""
-        super().__init__(*args, **kwargs)
-        self.valid_fields = get_valid_fields()
-        self.career_choices = get_career_choices()
-        self.escuela_choices = get_escuela_choices()
-        self.detalle_fields = get_detalle_valid_fields()
-    
-    def validate_field_value(self, field_name, value, is_detalle=False):
+    @property
+    def schema(self):
+        """Esquema de filtrado compilado una sola vez al iniciar la app."""
+        return get_filter_schema()
+
+    def validate_field_value(self, field_name, value):
         """
         Valida que el valor sea apropiado para el campo.
         Retorna (es_válido, mensaje_error, valor_procesado)
         """
-        # Determinar el tipo según si el campo es de detalle o del modelo principal
-        field_type = None
-        if is_detalle:
-            field_type = self.detalle_fields.get(field_name)
-        else:
-            field_type = self.valid_fields.get(field_name)
+        return self.schema.validate(field_name, value)
 
-        if not field_type:
-            return False, f"Campo '{field_name}' no es válido para filtro.", None
-        
-        try:
-            if field_type == 'integer':
-                if not isinstance(value, int):
-                    return False, f"El campo '{field_name}' debe ser un entero.", None
-                return True, None, value
-            
-            elif field_type == 'string' or field_type == 'string_contains':
-                if not isinstance(value, str):
-                    return False, f"El campo '{field_name}' debe ser una cadena de texto.", None
-                if len(value) == 0:
-                    return False, f"El campo '{field_name}' no puede estar vacío.", None
-                return True, None, value
-            elif field_type == 'rut':
-                # Validar formato de RUT utilizando el validador central
-                try:
-                    validar_rut(value)
-                    return True, None, value
-                except ValidationError:
-                    return False, f"El RUT '{value}' no tiene un formato válido.", None
-            
-            elif field_type == 'choice':
-                # choice puede corresponder a 'carrera' o 'escuela'
-                if value not in self.career_choices and value not in self.escuela_choices:
-                    valid_choices = ', '.join(list(self.career_choices.keys()) + list(self.escuela_choices.keys()))
-                    return False, f"El valor '{value}' no es válido para el campo. Opciones válidas: {valid_choices}", None
-                return True, None, value
-            
-            elif field_type == 'date':
-                if not isinstance(value, str):
-                    return False, f"El campo '{field_name}' debe ser una cadena de fecha.", None
-                
-                # Intentar parsear como fecha completa (YYYY-MM-DD)
-                try:
-                    datetime.strptime(value, '%Y-%m-%d')
-                    return True, None, ('date', value)
-                except ValueError:
-                    pass
-                
-                # Intentar parsear como año (YYYY)
-                try:
-                    int(value)
-                    if len(value) == 4 and value.isdigit():
-                        return True, None, ('year', value)
-                except ValueError:
-                    pass
-                
-                return False, f"El campo '{field_name}' debe ser una fecha (YYYY-MM-DD) o año (YYYY).", None
-        
-        except Exception as e:
-            return False, f"Error al validar campo '{field_name}': {str(e)}", None
-    
-    
-    
     def build_query(self, filters):
         """
         Construye dos consultas Q separadas: una para `Memoria` y otra para `MemoriaDetalle`.
@@ -214,54 +207,16 @@ class FilterMemoriesView(APIView):
         - `memoria_query` es un Q aplicable sobre `Memoria` (sin filtrar por detalles).
         - `detalle_query` es un Q aplicable sobre `MemoriaDetalle`.
         """
-        memoria_q = None
-        detalle_q = None
-        errors = []
-
-        for field_name, value in filters.items():
-            base_field = field_name.replace('_year', '')
-            is_detalle = base_field in self.detalle_fields
-
-            # Validar el campo
-            is_valid, error_msg, processed_value = self.validate_field_value(base_field, value, is_detalle=is_detalle)
-            if not is_valid:
-                errors.append(error_msg)
-                continue
-
-            try:
-                if is_detalle:
-                    # Construir consulta para MemoriaDetalle (sin prefijo)
-                    field_type = self.detalle_fields.get(base_field)
-                    q_part = Q(**({f"{base_field}__exact": processed_value} if field_type == 'rut' else {f"{base_field}__icontains": processed_value}))
-                    if detalle_q is None:
-                        detalle_q = q_part
-                    else:
-                        detalle_q &= q_part
-                else:
-                    # Consulta sobre Memoria
-                    field_type = self.valid_fields.get(base_field)
-                    if field_type == 'integer':
-                        q_part = Q(**{f"{base_field}__exact": processed_value})
-                    elif field_type == 'string' or field_type == 'string_contains':
-                        q_part = Q(**{f"{base_field}__icontains": processed_value})
-                    elif field_type == 'choice':
-                        q_part = Q(**{f"{base_field}__exact": processed_value})
-                    elif field_type == 'date':
-                        if '_year' in field_name:
-                            q_part = Q(**{f"{base_field}__year": int(processed_value[1])})
-                        else:
-                            q_part = Q(**{f"{base_field}__exact": processed_value[1]})
-                    else:
-                        q_part = Q()
-
-                    if memoria_q is None:
-                        memoria_q = q_part
-                    else:
-                        memoria_q &= q_part
-            except Exception as e:
-                errors.append(f"Error al procesar filtro '{field_name}': {str(e)}")
-
-        return memoria_q, detalle_q, errors
+        return self.schema.build_query(filters)
+
+    def get_queryset(self, memoria_q, detalle_q):
+        """
+        Construye el queryset de `Memoria` a partir de las consultas de `build_query`.
+
+        Los filtros de detalle se aplican como una semi-join (`EXISTS`) en la misma
+        sentencia SQL, sin materializar listas de ids en Python.
+        """
+        return self.schema.get_queryset(memoria_q, detalle_q)
 
     def post(self, request):
         """
@@ -269,10 +224,9 @@ class FilterMemoriesView(APIView):
 
         Lógica:
         1. Construir queries separadas para `MemoriaDetalle` y `Memoria`.
-        2. Si hay filtros de detalle, consultar `MemoriaDetalle` y obtener ids de memorias.
-        3. Si no hay ids que coincidan, retornar 0 resultados.
-        4. Aplicar los filtros de Memoria y restringir por los ids obtenidos (si existen).
-        5. Devolver solo los datos de Memoria.
+        2. Aplicar los filtros de Memoria y, si hay filtros de detalle, un `EXISTS`
+           correlacionado sobre `MemoriaDetalle` en la misma consulta.
+        3. Devolver solo los datos de Memoria.
         """
         try:
             filters = request.data.get('filters', {})
@@ -287,24 +241,7 @@ class FilterMemoriesView(APIView):
             if errors:
                 return Response({"error": "Errores de validación en los filtros.", "details": errors}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Si hay filtros de detalle, buscar MemoriaDetalle primero
-            ids = None
-            if detalle_q is not None:
-                detalle_qs = MemoriaDetalle.objects.filter(detalle_q)
-                ids = list(detalle_qs.values_list('id_memo_id', flat=True).distinct())
-                if not ids:
-                    return Response({"count": 0, "results": []}, status=status.HTTP_200_OK)
-
-            # Construir query final para Memoria
-            if memoria_q is not None:
-                final_q = memoria_q
-            else:
-                final_q = Q()
-
-            if ids is not None:
-                final_q &= Q(id_memo__in=ids)
-
-            memories = Memoria.objects.filter(final_q).distinct()
+            memories = self.get_queryset(memoria_q, detalle_q)
 
             # Serializar resultados: solo datos de la Memoria (sin detalles)
             results = []
@@ -316,3 +253,243 @@ class FilterMemoriesView(APIView):
 
         except Exception as e:
             return Response({"error": f"Error interno del servidor: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class FacetMemoriesView(FilterMemoriesView):
+    """
+    Endpoint que devuelve conteos agrupados (facetas) del catálogo de memorias.
+
+    Cada faceta se calcula con una única consulta agrupada sobre las memorias que
+    cumplen los filtros activos (mismo formato que `FilterMemoriesView`). Las
+    opciones de `carrera` y `escuela` se obtienen del modelo e incluyen las que no
+    tienen resultados. La respuesta se guarda en caché hasta la siguiente escritura
+    sobre memorias o detalles (o, con una caché local por proceso, a lo sumo
+    `MEMORIAS_CACHE['CATALOG_TIMEOUT']` segundos; ver `cache.py`).
+
+    Ejemplo de uso:
+    GET /api/memos/facets/
+    POST /api/memos/facets/
+    {
+        "filters": {
+            "escuela": "IT",
+            "fecha_inicio_year": "2023"
+        }
+    }
+    """
+
+    CHOICE_FACETS = {
+        'carrera': get_career_choices,
+        'escuela': get_escuela_choices,
+    }
+    VALUE_FACETS = ('tipo_memoria', 'tipo_entidad')
+    YEAR_FACETS = ('fecha_inicio', 'fecha_termino')
+
+    def get(self, request):
+        return self.facets_response({})
+
+    def post(self, request):
+        filters = request.data.get('filters', {})
+        if not isinstance(filters, dict):
+            return Response({"error": "El campo 'filters' debe ser un objeto JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        return self.facets_response(filters)
+
+    def facets_response(self, filters):
+        try:
+            cache_key = catalog_cache_key('facets', filters)
+            data = cache.get(cache_key)
+            if data is None:
+                memoria_q, detalle_q, errors = self.build_query(filters)
+                if errors:
+                    return Response({"error": "Errores de validación en los filtros.", "details": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+                memories = self.get_queryset(memoria_q, detalle_q)
+
+                data = self.compute_facets(memories)
+                cache.set(cache_key, data, timeout=catalog_cache_timeout())
+
+            return Response(data, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response({"error": f"Error interno del servidor: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def compute_facets(self, memories):
+        """
+        Calcula todas las facetas sobre el queryset dado (una consulta por faceta).
+        """
+        # Sin orden para que el GROUP BY sólo agrupe por la faceta
+        base = memories.order_by()
+
+        facets = {}
+        for field, get_choices in self.CHOICE_FACETS.items():
+            counts = dict(base.values_list(field).annotate(total=Count('id_memo')))
+            facets[field] = [
+                {"value": value, "label": label, "count": counts.get(value, 0)}
+                for value, label in get_choices().items()
+            ]
+
+        for field in self.VALUE_FACETS:
+            rows = base.values_list(field).annotate(total=Count('id_memo')).order_by('-total', field)
+            facets[field] = [{"value": value, "count": total} for value, total in rows]
+
+        for field in self.YEAR_FACETS:
+            rows = (
+                base.annotate(anio=ExtractYear(field))
+                .values_list('anio')
+                .annotate(total=Count('id_memo'))
+                .order_by('anio')
+            )
+            facets[f"{field}_year"] = [{"value": year, "count": total} for year, total in rows if year is not None]
+
+        return {"count": base.count(), "facets": facets}
+
+
+class BundleDownloadView(FilterMemoriesView):
+    """
+    Endpoint para descargar varias memorias en un único ZIP generado al vuelo.
+
+    Acepta los mismos filtros que `FilterMemoriesView` o una lista de ids. Los PDF
+    se agregan al ZIP sin compresión y por bloques, por lo que la descarga comienza
+    de inmediato y el uso de memoria no depende del tamaño del paquete (el
+    api_gateway también reenvía la respuesta por bloques).
+
+    Ejemplo de uso:
+    POST /api/memos/download/bundle/
+    {"filters": {"carrera": "INGINFO", "fecha_termino_year": "2024"}}
+
+    POST /api/memos/download/bundle/
+    {"ids": [1, 2, 3]}
+    """
+
+    def post(self, request):
+        filters = request.data.get('filters')
+        ids = request.data.get('ids')
+
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return Response({"error": "El campo 'ids' debe ser una lista de enteros."}, status=status.HTTP_400_BAD_REQUEST)
+            memories = Memoria.objects.filter(id_memo__in=ids)
+        elif isinstance(filters, dict) and filters:
+            memories, errors = self.schema.filter_queryset(filters)
+            if errors:
+                return Response({"error": "Errores de validación en los filtros.", "details": errors}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return Response({"error": "Debe proporcionar 'filters' (objeto JSON) o 'ids'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        memories = memories.exclude(loc_disco='').only('id_memo', 'titulo', 'loc_disco').order_by('id_memo')
+
+        max_items = getattr(settings, 'MEMORIAS_BUNDLE_MAX_ITEMS', 500)
+        total = memories.count()
+        if total == 0:
+            return Response({"error": "No hay memorias con archivo para los criterios indicados."}, status=status.HTTP_404_NOT_FOUND)
+        if total > max_items:
+            return Response(
+                {"error": f"El paquete supera el máximo de {max_items} memorias ({total}). Acote los filtros."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(iter_zip_stream(self.bundle_entries(memories)), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="memorias.zip"'
+        return response
+
+    def bundle_entries(self, memories):
+        """Genera (arcname, storage, name) por memoria, sin materializar el queryset."""
+        for memory in memories.iterator(chunk_size=200):
+            ext = os.path.splitext(memory.loc_disco.name)[1] or '.pdf'
+            title = slugify(memory.titulo)[:60] or 'memoria'
+            yield f"memoria_{memory.id_memo}_{title}{ext}", memory.loc_disco.storage, memory.loc_disco.name
+
+
+class ImportMemoriesView(APIView):
+    """
+    Endpoint para importar memorias en bloque desde un manifiesto y un ZIP con los PDF.
+
+    Recibe multipart/form-data con:
+    - manifest: manifiesto .csv o .jsonl (formato en `importer.py`).
+    - archivos: ZIP con los PDF (e imágenes) referenciados por el manifiesto.
+    - partial (opcional): "true" para importar las filas válidas aunque otras fallen.
+    - dry_run (opcional): "true" para sólo validar.
+
+    Todas las filas se validan antes de escribir; la respuesta incluye los errores
+    por fila. Para importaciones muy grandes usar el comando `import_memorias`.
+
+    Ejemplo de uso:
+    POST /api/memos/import/
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        manifest = request.FILES.get('manifest')
+        archivos = request.FILES.get('archivos')
+        if manifest is None or archivos is None:
+            return Response({"error": "Debe enviar los archivos 'manifest' y 'archivos' (ZIP)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = manifest_format(manifest.name)
+        if fmt is None:
+            return Response({"error": "Formato de manifiesto no soportado (use .csv o .jsonl)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        partial = str(request.data.get('partial', '')).lower() in ('1', 'true')
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+
+        try:
+            text = io.StringIO(manifest.read().decode('utf-8-sig'), newline='')
+            entries = read_manifest(text, fmt)
+            source = open_source(archivos.file)
+        except (ManifestError, UnicodeDecodeError) as e:
+            return Response({"error": f"No se pudo leer la importación: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_memorias(entries, source, partial=partial, dry_run=dry_run)
+        finally:
+            source.close()
+
+        if dry_run:
+            return Response(report, status=status.HTTP_200_OK)
+        if not report['importado']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
+class ExportMemoriesView(FilterMemoriesView):
+    """
+    Endpoint para exportar el catálogo de memorias con los datos de sus estudiantes.
+
+    La respuesta se genera fila a fila (ver `export.py`): una sola consulta con
+    cursor del lado del servidor, sin cargar el catálogo completo en memoria. El
+    api_gateway la reenvía por bloques a medida que se genera.
+
+    Parámetros:
+    - formato: "csv" (por defecto) o "ndjson". En GET va en la query string.
+    - filters (sólo POST): mismos filtros que `FilterMemoriesView`.
+
+    Ejemplo de uso:
+    GET /api/memos/export/?formato=ndjson
+
+    POST /api/memos/export/
+    {"formato": "csv", "filters": {"carrera": "INGINFO", "fecha_termino_year": "2024"}}
+    """
+
+    def get(self, request):
+        return self.export(request.query_params.get('formato'), Memoria.objects.all())
+
+    def post(self, request):
+        filters = request.data.get('filters', {})
+        if not isinstance(filters, dict):
+            return Response({"error": "El campo 'filters' debe ser un objeto JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+        memories = Memoria.objects.all()
+        if filters:
+            memories, errors = self.schema.filter_queryset(filters)
+            if errors:
+                return Response({"error": "Errores de validación en los filtros.", "details": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return self.export(request.data.get('formato'), memories)
+
+    def export(self, fmt, memories):
+        fmt = (fmt or 'csv').lower()
+        if fmt not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"El campo 'formato' debe ser uno de: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = StreamingHttpResponse(iter_export(memories, fmt), content_type=EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="memorias.{fmt}"'
+        return response
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class MemoriesServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'memories_service'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        # Registrar las señales de invalidación de caché
+        from . import signals
+        # Índices de trigramas de los filtros por nombre (sólo PostgreSQL)
+        post_migrate.connect(signals.create_trigram_indexes, sender=self)
+        # Compilar el esquema de filtrado una sola vez por proceso
+        from .filter_config import compile_filter_schema
+        compile_filter_schema()
@@ -0,0 +1,260 @@
+"""
+Datos sintéticos y mediciones de rendimiento del servicio de memorias.
+
+- `generate_archive`: agrega memorias sintéticas (con detalles y PDF de prueba)
+  hasta llegar a un total dado, con distribuciones realistas de escuelas y
+  carreras. Las memorias generadas se marcan con `BENCH_ENTIDAD` para poder
+  eliminarlas sin tocar datos reales.
+- `run_benchmarks`: ejecuta los endpoints contra el stack completo de Django
+  (cliente de pruebas) y mide latencia, consultas SQL y memoria por solicitud.
+
+Se usan desde los comandos `generate_memorias` y `benchmark_memorias`. Con
+`repository.settings.bench` se ejecutan sobre SQLite o, si están definidas las
+variables `BENCH_DB_*`, sobre PostgreSQL.
+"""
+
+import datetime
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .blobs import blob_name, file_digest, write_blob
+from .cache import bump_catalog_version, get_payload_store
+from .models import ArchivoBlob, Memoria, MemoriaDetalle
+
+
+BENCH_ENTIDAD = 'Benchmark (datos sintéticos)'
+
+# Peso relativo de cada escuela y sus carreras (códigos de `CareerChoices`)
+ESCUELA_CARRERAS = {
+    'IT': (30, ['INGINFO', 'AP', 'INGRT']),
+    'AN': (22, ['IMD', 'CONTTRI', 'AUD', 'COMEX', 'INGLOG', 'INGCOMEX', 'INGGP', 'INGEMP', 'INGFIN', 'TLOG']),
+    'CON': (15, ['INGCON', 'INGPR', 'TCON']),
+    'IRN': (14, ['TELEC', 'IMP', 'INGELEC', 'INGAGRI', 'INGMA', 'INGAUTO', 'TAGRI', 'TVET', 'TAUTO', 'TMP']),
+    'SB': (12, ['PF', 'TLC', 'TENF', 'TQF', 'TODON']),
+    'TH': (7, ['TDES', 'TECOT', 'THOT']),
+}
+TIPOS_MEMORIA = (('Proyecto de título', 60), ('Práctica profesional', 25), ('Tesis', 10), ('Investigación aplicada', 5))
+TIPOS_ENTIDAD = (('Empresa', 55), ('Institución pública', 20), ('ONG', 10), ('Interna', 15))
+# Cantidad de estudiantes por memoria
+DETALLES_POR_MEMORIA = ((1, 45), (2, 35), (3, 15), (4, 5))
+
+NOMBRES = ('Ana', 'Benjamín', 'Camila', 'Diego', 'Fernanda', 'Ignacio', 'Javiera', 'Martín', 'Sofía', 'Tomás', 'Valentina', 'Vicente')
+APELLIDOS = ('González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda', 'Morales', 'Fuentes')
+PROFESORES = tuple(f"{nombre} {apellido}" for nombre in NOMBRES[:6] for apellido in APELLIDOS[:5])
+PALABRAS = ('sistema', 'gestión', 'plataforma', 'análisis', 'optimización', 'inventario', 'clientes', 'energía',
+            'logística', 'calidad', 'datos', 'seguridad', 'riego', 'turismo', 'salud', 'procesos')
+
+
+def _weighted(rng, options):
+    values, weights = zip(*options)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _rut(rng):
+    """RUT aleatorio con dígito verificador válido (formato 12345678-9)."""
+    number = rng.randint(15_000_000, 22_999_999)
+    total, factor = 0, 2
+    for digit in reversed(str(number)):
+        total += int(digit) * factor
+        factor = 2 if factor == 7 else factor + 1
+    check = 11 - total % 11
+    return f"{number}-{'0' if check == 11 else 'K' if check == 10 else check}"
+
+
+def _dummy_pdf(index):
+    """PDF mínimo válido de una página; `index` lo hace único."""
+    text = f"Memoria sintetica {index}"
+    stream = f"BT /F1 18 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+    return (
+        b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+        b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+        b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]/Contents 4 0 R"
+        b"/Resources<</Font<</F1 5 0 R>>>>>>endobj\n"
+        b"4 0 obj<</Length " + str(len(stream)).encode() + b">>stream\n" + stream + b"\nendstream endobj\n"
+        b"5 0 obj<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+    )
+
+
+def _write_pdf_pool(size):
+    """Escribe `size` PDF de prueba como blobs y retorna [(nombre, digest, tamaño)]."""
+    storage = Memoria._meta.get_field('loc_disco').storage
+    pool = []
+    for index in range(size):
+        content = ContentFile(_dummy_pdf(index), name=f"bench_{index}.pdf")
+        digest, length = file_digest(content)
+        name = blob_name('loc_disco', digest, content.name)
+        write_blob(storage, name, content)
+        pool.append((name, digest, length))
+    return pool
+
+
+def bench_queryset():
+    return Memoria.objects.filter(entidad_involucrada=BENCH_ENTIDAD)
+
+
+def generate_archive(total, seed=0, batch_size=1000, pdf_pool=50, stdout=None):
+    """
+    Agrega memorias sintéticas hasta que existan `total` memorias de benchmark.
+
+    Los PDF salen de un conjunto de `pdf_pool` archivos distintos; con el
+    almacenamiento por contenido cada uno se escribe una sola vez.
+    Retorna la cantidad de memorias creadas.
+    """
+    existing = bench_queryset().count()
+    missing = total - existing
+    if missing <= 0:
+        return 0
+
+    # Semilla por tramo: la misma secuencia de tamaños produce siempre los mismos datos
+    rng = random.Random(f"{seed}:{existing}")
+    pool = _write_pdf_pool(pdf_pool)
+    escuelas = [(escuela, weight) for escuela, (weight, _) in ESCUELA_CARRERAS.items()]
+    today = datetime.date.today()
+
+    created = 0
+    while created < missing:
+        count = min(batch_size, missing - created)
+        memorias = []
+        detalles = []
+        references = {}
+        for offset in range(count):
+            index = existing + created + offset
+            escuela = _weighted(rng, escuelas)
+            inicio = today - datetime.timedelta(days=rng.randint(30, 8 * 365))
+            pdf_name, digest, size = pool[index % len(pool)]
+            digest_refs = references.get(pdf_name, (digest, size, 0))
+            references[pdf_name] = (digest, size, digest_refs[2] + 1)
+
+            memorias.append(Memoria(
+                titulo=f"{' '.join(rng.sample(PALABRAS, 3)).capitalize()} #{index}",
+                profesor=rng.choice(PROFESORES),
+                descripcion=' '.join(rng.choices(PALABRAS, k=40)),
+                carrera=rng.choice(ESCUELA_CARRERAS[escuela][1]),
+                escuela=escuela,
+                loc_disco=pdf_name,
+                loc_disco_digest=digest,
+                entidad_involucrada=BENCH_ENTIDAD,
+                tipo_entidad=_weighted(rng, TIPOS_ENTIDAD),
+                tipo_memoria=_weighted(rng, TIPOS_MEMORIA),
+                fecha_inicio=inicio,
+                fecha_termino=inicio + datetime.timedelta(days=rng.randint(90, 300)),
+            ))
+            detalles.append([
+                dict(
+                    rut_estudiante=_rut(rng),
+                    nombre_estudiante=rng.choice(NOMBRES),
+                    apellido_estudiante=rng.choice(APELLIDOS),
+                    segundo_apellido_estudiante=rng.choice(APELLIDOS),
+                )
+                for _ in range(_weighted(rng, DETALLES_POR_MEMORIA))
+            ])
+
+        with transaction.atomic():
+            ArchivoBlob.objects.reference_many(references)
+            memorias = Memoria.objects.bulk_create(memorias)
+            MemoriaDetalle.objects.bulk_create(
+                [MemoriaDetalle(id_memo=memoria, **data) for memoria, rows in zip(memorias, detalles) for data in rows],
+                batch_size=batch_size,
+            )
+        created += count
+        if stdout is not None:
+            stdout.write(f"  {existing + created}/{total} memorias")
+
+    # `bulk_create` no emite señales: invalidar las respuestas agregadas del catálogo
+    bump_catalog_version()
+    return created
+
+
+def clear_archive():
+    """Elimina las memorias de benchmark (y libera sus blobs mediante las señales)."""
+    deleted, _ = bench_queryset().delete()
+    return deleted
+
+
+# ---------------------------------------------------------------------------
+# Mediciones
+# ---------------------------------------------------------------------------
+
+def default_scenarios(rng):
+    """
+    Escenarios por endpoint: (nombre, método, ruta, payload).
+    Las rutas con `{id}` reciben un id de memoria de benchmark al azar.
+    """
+    return [
+        ('filter:carrera', 'post', '/api/memos/filter/', {"filters": {"carrera": "INGINFO"}}),
+        ('filter:texto+año', 'post', '/api/memos/filter/', {"filters": {"titulo": "sistema", "fecha_inicio_year": str(datetime.date.today().year - 1)}}),
+        ('filter:estudiante', 'post', '/api/memos/filter/', {"filters": {"apellido_estudiante": rng.choice(APELLIDOS)}}),
+        ('detail', 'get', '/api/memos/{id}/', None),
+        ('list', 'get', '/api/memos/memories/', None),
+    ]
+
+
+def _clear_caches():
+    cache.clear()
+    get_payload_store().clear()
+
+
+def measure(client, method, path, payload, repeat, cold=True, ids=None, rng=None):
+    """
+    Ejecuta `repeat` solicitudes y retorna latencias (ms), consultas y memoria pico (KiB).
+    """
+    latencies, queries, peaks = [], [], []
+    for _ in range(repeat):
+        url = path.format(id=rng.choice(ids)) if ids and '{id}' in path else path
+        if cold:
+            _clear_caches()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            if method == 'post':
+                response = client.post(url, payload, content_type='application/json')
+            else:
+                response = client.get(url)
+            elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url} respondió {response.status_code}")
+        latencies.append(elapsed * 1000)
+        queries.append(len(ctx.captured_queries))
+        peaks.append(peak / 1024)
+
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "max_ms": round(latencies[-1], 2),
+        "queries": max(queries),
+        "peak_kib": round(max(peaks), 1),
+    }
+
+
+def run_benchmarks(sizes, repeat=10, seed=0, cold=True, endpoints=None, pdf_pool=50, stdout=None):
+    """
+    Para cada tamaño genera el archivo sintético (incrementalmente) y mide los
+    escenarios. Retorna una lista de filas {"size", "endpoint", ...métricas}.
+    """
+    client = Client()
+    rng = random.Random(seed)
+    results = []
+    for size in sorted(sizes):
+        if stdout is not None:
+            stdout.write(f"Generando {size} memorias...")
+        generate_archive(size, seed=seed, pdf_pool=pdf_pool, stdout=stdout)
+        ids = list(bench_queryset().values_list('id_memo', flat=True)[:1000])
+        for name, method, path, payload in default_scenarios(rng):
+            if endpoints and name.split(':')[0] not in endpoints:
+                continue
+            metrics = measure(client, method, path, payload, repeat, cold=cold, ids=ids, rng=rng)
+            results.append({"size": size, "endpoint": name, **metrics})
+            if stdout is not None:
+                stdout.write(f"  {name:<20} p50={metrics['p50_ms']}ms queries={metrics['queries']} pico={metrics['peak_kib']}KiB")
+    return results
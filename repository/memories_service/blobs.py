@@ -0,0 +1,71 @@
+"""
+Almacenamiento direccionado por contenido de los archivos de `Memoria`.
+
+`loc_disco` e `imagen_display` se guardan como blobs cuyo nombre se deriva del
+SHA-256 del contenido (`memorias/blobs/ab/abcd....pdf`). Cada blob tiene una
+fila `ArchivoBlob` con un contador de referencias: subir de nuevo un archivo ya
+existente no escribe nada en el storage, y el archivo se elimina sólo cuando
+ninguna memoria lo referencia.
+
+El hash se calcula mientras llega la subida (`uploads.py`); para archivos que no
+vienen de una solicitud (importaciones, tests) se calcula leyendo el archivo.
+
+Los archivos con nombres anteriores (`memoria_<id>.pdf`) no tienen fila de blob
+y se siguen eliminando directamente al reemplazarse.
+"""
+
+import hashlib
+import posixpath
+
+
+BLOB_PREFIXES = {
+    'loc_disco': 'memorias/blobs',
+    'imagen_display': 'memo_images/blobs',
+}
+
+
+def file_digest(content):
+    """
+    Retorna (digest, tamaño) de un archivo. Usa `content_digest` si la subida ya
+    lo calculó; si no, lee el archivo por bloques.
+    """
+    digest = getattr(content, 'content_digest', None)
+    if digest:
+        return digest, content.size
+
+    hasher = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(64 * 1024), b''):
+        hasher.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return hasher.hexdigest(), size
+
+
+def blob_name(field_name, digest, filename):
+    """Nombre del blob de `field_name` para el contenido `digest`."""
+    ext = posixpath.splitext(filename or '')[1].lower()
+    return f"{BLOB_PREFIXES[field_name]}/{digest[:2]}/{digest}{ext}"
+
+
+def is_blob_name(name):
+    return any(name.startswith(prefix + '/') for prefix in BLOB_PREFIXES.values())
+
+
+def write_blob(storage, name, content):
+    """
+    Escribe el blob si aún no existe en el storage. Retorna True si se escribió.
+    Al ser direccionado por contenido, un archivo existente ya tiene los mismos bytes.
+    """
+    if storage.exists(name):
+        return False
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    stored = storage.save(name, content)
+    if stored != name:
+        # El storage renombró por una escritura concurrente del mismo blob
+        storage.delete(stored)
+    return True
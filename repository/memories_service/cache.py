@@ -0,0 +1,242 @@
+"""
+Utilidades de caché para el servicio de memorias.
+
+Las respuestas agregadas del catálogo (por ejemplo, las facetas) se guardan en la
+caché de Django bajo una "versión de catálogo". Cada escritura sobre `Memoria` o
+`MemoriaDetalle` incrementa la versión (ver `signals.py`), por lo que las entradas
+anteriores dejan de ser alcanzables sin necesidad de borrarlas una por una.
+
+La versión sólo la ven todos los procesos si `CACHES['default']` es compartida
+(Redis, Memcached, base de datos). Con una caché local de cada proceso
+(LocMemCache, el valor por defecto) las escrituras de otros procesos no cambian
+la versión local, por lo que las respuestas agregadas expiran tras
+`MEMORIAS_CACHE['CATALOG_TIMEOUT']` segundos (ver `catalog_cache_timeout`).
+
+Las representaciones serializadas de cada memoria (detalle, `retrieve`, lista de
+detalles) se guardan en una caché de lectura (`cached_memoria_payload`) bajo una
+clave con `id_memo` y `updated_at` de la memoria, en un almacén intercambiable
+(`MEMORIAS_CACHE`): un LRU en memoria del proceso (por defecto) o un alias de
+caché de Django compartido entre procesos. La versión se lee de la base de datos
+en cada solicitud (una consulta por clave primaria), por lo que una escritura
+hecha por cualquier proceso deja inalcanzables los payloads anteriores en todos
+(el LRU los descarta a medida que se llena). Los cambios en los detalles
+actualizan `updated_at` de su memoria (`touch_memoria`).
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Memoria
+
+
+CATALOG_VERSION_KEY = 'memorias:catalog:version'
+DEFAULT_CATALOG_TIMEOUT = 60
+# Backends de caché propios de cada proceso
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+MEMORIA_ETAG_KEY = 'memorias:etag:{pk}'
+# Respaldo ante escrituras que no pasan por las señales
+MEMORIA_ETAG_TIMEOUT = 60 * 60
+
+
+def cache_is_shared(alias='default'):
+    """Indica si el alias de caché es visible para todos los procesos del servicio."""
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def catalog_cache_timeout():
+    """
+    Vigencia de las respuestas agregadas del catálogo: sin expiración si la caché
+    es compartida (la versión del catálogo basta), y acotada si es local.
+    """
+    if cache_is_shared():
+        return None
+    return getattr(settings, 'MEMORIAS_CACHE', {}).get('CATALOG_TIMEOUT', DEFAULT_CATALOG_TIMEOUT)
+
+
+def get_catalog_version():
+    """
+    Retorna la versión actual del catálogo, inicializándola si no existe.
+    """
+    cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+    return cache.get(CATALOG_VERSION_KEY, 1)
+
+
+def bump_catalog_version():
+    """
+    Incrementa la versión del catálogo, invalidando todas las respuestas agregadas.
+    """
+    cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # La clave expiró entre add() e incr(): se reinicia en una versión nueva
+        cache.set(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def catalog_cache_key(prefix, payload=None):
+    """
+    Construye una clave de caché ligada a la versión actual del catálogo.
+
+    `payload` (por ejemplo, los filtros de la solicitud) se serializa de forma
+    determinista para que filtros equivalentes compartan la misma entrada.
+    """
+    digest = hashlib.md5(
+        json.dumps(payload or {}, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return f"memorias:{prefix}:v{get_catalog_version()}:{digest}"
+
+
+def get_memoria_etag(pk, version=None):
+    """
+    Retorna el último ETag entregado para el detalle de la memoria `pk` (o None).
+    Con `version` (ver `memoria_version`) sólo se retorna si corresponde a esa versión.
+    """
+    entry = cache.get(MEMORIA_ETAG_KEY.format(pk=pk))
+    if entry is None:
+        return None
+    entry_version, etag = entry
+    if version is not None and entry_version != version:
+        return None
+    return etag
+
+
+def set_memoria_etag(pk, etag, version):
+    cache.set(MEMORIA_ETAG_KEY.format(pk=pk), (version, etag), timeout=MEMORIA_ETAG_TIMEOUT)
+
+
+def invalidate_memoria(pk):
+    """
+    Descarta la información cacheada de una memoria concreta.
+    """
+    cache.delete(MEMORIA_ETAG_KEY.format(pk=pk))
+
+
+def touch_memoria(pk):
+    """
+    Actualiza `updated_at` de la memoria `pk`, que versiona también sus detalles.
+    Debe llamarse en la misma transacción que modifica los detalles.
+    """
+    Memoria.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+def memoria_version(pk):
+    """Versión vigente (`updated_at`) de la memoria `pk`, o None si no existe."""
+    try:
+        updated_at = Memoria.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    except (TypeError, ValueError):
+        # `pk` no es un id válido
+        return None
+    return f"{updated_at.timestamp():.6f}" if updated_at is not None else None
+
+
+class LocalLRUCache:
+    """
+    Almacén en memoria del proceso, acotado a `max_entries` con desalojo LRU.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheStore:
+    """
+    Almacén sobre un alias de `CACHES` (por ejemplo Redis o Memcached), compartido
+    entre procesos. El límite de entradas lo define el propio backend.
+    """
+
+    def __init__(self, alias='default', timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, timeout=self.timeout)
+
+    def clear(self):
+        # Las entradas quedan inalcanzables al cambiar los punteros; no se borra el alias completo
+        pass
+
+
+_payload_store = None
+_payload_store_lock = threading.Lock()
+
+
+def get_payload_store():
+    """
+    Almacén de payloads según `settings.MEMORIAS_CACHE`:
+    {'BACKEND': 'local' | 'django', 'MAX_ENTRIES': 1024, 'ALIAS': 'default', 'TIMEOUT': None}
+    """
+    global _payload_store
+    with _payload_store_lock:
+        if _payload_store is None:
+            config = getattr(settings, 'MEMORIAS_CACHE', {})
+            if config.get('BACKEND', 'local') == 'django':
+                _payload_store = DjangoCacheStore(config.get('ALIAS', 'default'), config.get('TIMEOUT'))
+            else:
+                _payload_store = LocalLRUCache(config.get('MAX_ENTRIES', 1024))
+        return _payload_store
+
+
+@receiver(setting_changed)
+def _reset_payload_store(setting, **kwargs):
+    global _payload_store
+    if setting == 'MEMORIAS_CACHE':
+        _payload_store = None
+
+
+def cached_memoria_payload(kind, pk, build, variant='', version=None):
+    """
+    Caché de lectura para representaciones de la memoria `pk`.
+
+    - kind: tipo de representación ('detail', 'retrieve', 'detalles', ...).
+    - build: función sin argumentos que retorna el payload (puede lanzar Http404).
+    - variant: distingue payloads que dependen de la solicitud (por ejemplo, el
+      host usado en las URLs absolutas).
+    - version: `memoria_version(pk)` si el llamador ya la consultó.
+    """
+    if version is None:
+        version = memoria_version(pk)
+        if version is None:
+            # La memoria no existe: `build` responde con su propio error
+            return build()
+    key = f"memorias:payload:{kind}:{pk}:{version}:{variant}"
+    store = get_payload_store()
+    payload = store.get(key)
+    if payload is None:
+        payload = build()
+        store.set(key, payload)
+    return payload
@@ -0,0 +1,479 @@
+"""
+Entrega de archivos de memorias (PDF) al cliente.
+
+Este módulo implementa las respuestas HTTP para descargas con soporte de:
+- Solicitudes condicionales (`If-None-Match`, `If-Modified-Since`, `If-Range`).
+- Rangos de bytes simples y múltiples (`Range`, respuestas 206 y 416).
+- Paquetes ZIP de varias memorias generados al vuelo (`iter_zip_stream`).
+- Backends de entrega configurables (`MEMORIAS_DELIVERY_BACKEND`) que delegan la
+  transferencia al servidor web (X-Accel-Redirect / X-Sendfile) o a S3 (URL
+  prefirmada), dejando a Django sólo la autorización.
+
+Los archivos se leen a través del storage configurado (`default_storage`), por lo
+que funciona igual con `MEDIA_ROOT` local o con S3 (`settings/production.py`).
+"""
+
+import posixpath
+from abc import ABC, abstractmethod
+import time
+import uuid
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+
+CHUNK_SIZE = 64 * 1024
+# Límite de rangos por solicitud para evitar respuestas multipart abusivas
+MAX_RANGES = 16
+
+
+def file_etag(memory, size):
+    """
+    ETag del archivo de una memoria: el SHA-256 de su contenido (`blobs.py`) o,
+    para archivos anteriores sin hash, `updated_at` y el tamaño del archivo.
+    """
+    if memory.loc_disco_digest:
+        return quote_etag(memory.loc_disco_digest)
+    updated = int(memory.updated_at.timestamp() * 1000000) if memory.updated_at else 0
+    return quote_etag(f"{memory.pk}-{updated:x}-{size:x}")
+
+
+def parse_range_header(header, size):
+    """
+    Interpreta un header `Range: bytes=...`.
+
+    Retorna:
+    - None si el header no existe, no es de bytes o es sintácticamente inválido
+      (en cuyo caso se debe ignorar y enviar el archivo completo).
+    - Lista vacía si ningún rango es satisfacible (respuesta 416).
+    - Lista de tuplas (inicio, fin) inclusivas, ordenadas y sin solapamientos.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, sep, end_str = part.partition('-')
+        if not sep:
+            return None
+        start_str, end_str = start_str.strip(), end_str.strip()
+        try:
+            if start_str == '':
+                # Sufijo: los últimos N bytes
+                length = int(end_str)
+                if length < 0:
+                    return None
+                if length == 0 or size == 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        if start < 0 or end < start:
+            return None
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Unir rangos solapados o contiguos
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _iter_range(fileobj, start, end, chunk_size=CHUNK_SIZE):
+    fileobj.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = fileobj.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _iter_single_range(fileobj, start, end):
+    try:
+        yield from _iter_range(fileobj, start, end)
+    finally:
+        fileobj.close()
+
+
+def _iter_multipart(fileobj, parts, boundary):
+    try:
+        for header, (start, end) in parts:
+            yield header
+            yield from _iter_range(fileobj, start, end)
+        yield f"\r\n--{boundary}--\r\n".encode('ascii')
+    finally:
+        fileobj.close()
+
+
+def _not_modified(request, etag, last_modified):
+    """
+    Evalúa `If-None-Match` / `If-Modified-Since` (RFC 9110, sección 13.2.2).
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        # Comparación débil: se ignora el prefijo W/
+        candidates = {tag[2:] if tag.startswith('W/') else tag for tag in etags}
+        return '*' in etags or etag in candidates
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def _range_applies(request, etag, last_modified):
+    """
+    `If-Range`: el rango sólo se respeta si el validador coincide (comparación fuerte).
+    """
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and last_modified is not None and int(last_modified.timestamp()) == date
+
+
+def _validator_headers(etag, last_modified):
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return headers
+
+
+def _conditional_response(request, headers, etag, last_modified):
+    """Retorna una respuesta 304 si el cliente ya tiene la versión vigente."""
+    if request.method in ('GET', 'HEAD') and _not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+    return None
+
+
+def build_file_response(request, storage, name, size, content_type, filename, etag, last_modified=None):
+    """
+    Construye la respuesta de descarga de `name` (almacenado en `storage`).
+
+    Responde 304, 206 (uno o varios rangos), 416 o 200 según los headers de la
+    solicitud. El archivo se transmite por bloques, sin cargarlo en memoria.
+    """
+    headers = _validator_headers(etag, last_modified)
+    headers['Accept-Ranges'] = 'bytes'
+
+    not_modified = _conditional_response(request, headers, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    ranges = None
+    if request.method == 'GET' and _range_applies(request, etag, last_modified):
+        ranges = parse_range_header(request.headers.get('Range'), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    disposition = f'attachment; filename="{filename}"'
+    fileobj = storage.open(name, 'rb')
+
+    if not ranges:
+        response = FileResponse(fileobj, content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(_iter_single_range(fileobj, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        length = 0
+        for index, (start, end) in enumerate(ranges):
+            # Cada parte, salvo la primera, va precedida de un CRLF
+            part_header = (b'' if index == 0 else b'\r\n') + (
+                f"--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode('ascii')
+            parts.append((part_header, (start, end)))
+            length += len(part_header) + (end - start + 1)
+        length += len(f"\r\n--{boundary}--\r\n")
+        response = StreamingHttpResponse(
+            _iter_multipart(fileobj, parts, boundary),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response['Content-Length'] = str(length)
+
+    response['Content-Disposition'] = disposition
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Backends de entrega
+# ---------------------------------------------------------------------------
+
+class StreamDelivery:
+    """
+    Entrega el archivo desde el propio proceso de Django (por bloques y con rangos).
+    Es el respaldo de los demás backends (y el que usa 'auto' fuera de S3).
+    """
+    name = 'stream'
+
+    def supports(self, storage):
+        return True
+
+    def deliver(self, request, storage, name, size, content_type, filename, etag, last_modified=None):
+        return build_file_response(request, storage, name, size, content_type, filename, etag, last_modified)
+
+
+class OffloadedDelivery(StreamDelivery, ABC):
+    """
+    Base para backends que delegan la transferencia de bytes fuera de Django.
+    Las solicitudes condicionales se siguen resolviendo aquí (304 sin redirección).
+    """
+
+    def deliver(self, request, storage, name, size, content_type, filename, etag, last_modified=None):
+        headers = _validator_headers(etag, last_modified)
+        not_modified = _conditional_response(request, headers, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = self.offload(request, storage, name, content_type, filename)
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    @abstractmethod
+    def offload(self, request, storage, name, content_type, filename):
+        """Respuesta que delega la transferencia del archivo."""
+
+
+class _InternalRedirectDelivery(OffloadedDelivery):
+    """
+    Responde sólo con headers; el servidor web frontal envía el archivo local
+    (incluyendo el manejo de rangos).
+    """
+    header = None
+
+    def supports(self, storage):
+        # Sólo aplica a archivos en disco local (MEDIA_ROOT)
+        try:
+            storage.path('')
+        except NotImplementedError:
+            return False
+        return True
+
+    def offload(self, request, storage, name, content_type, filename):
+        response = HttpResponse(content_type=content_type)
+        response[self.header] = self.location(storage, name)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @abstractmethod
+    def location(self, storage, name):
+        """Valor del header que indica al servidor web qué archivo enviar."""
+
+
+class XAccelRedirectDelivery(_InternalRedirectDelivery):
+    """
+    nginx: `X-Accel-Redirect` hacia una location `internal` que apunta a MEDIA_ROOT.
+
+        location /protected-media/ {
+            internal;
+            alias /ruta/a/media/;
+        }
+    """
+    name = 'x-accel'
+    header = 'X-Accel-Redirect'
+
+    def location(self, storage, name):
+        prefix = getattr(settings, 'MEMORIAS_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        return quote(prefix.rstrip('/') + '/' + name.replace('\\', '/').lstrip('/'))
+
+
+class XSendfileDelivery(_InternalRedirectDelivery):
+    """
+    Apache (mod_xsendfile) / lighttpd: `X-Sendfile` con la ruta absoluta del archivo.
+    """
+    name = 'x-sendfile'
+    header = 'X-Sendfile'
+
+    def location(self, storage, name):
+        return storage.path(name)
+
+
+class PresignedURLDelivery(OffloadedDelivery):
+    """
+    S3: redirige (302) a una URL prefirmada de corta duración para el objeto.
+    """
+    name = 'presigned'
+
+    def supports(self, storage):
+        return hasattr(storage, 'bucket') and hasattr(storage, 'bucket_name')
+
+    def offload(self, request, storage, name, content_type, filename):
+        location = getattr(storage, 'location', '') or ''
+        key = posixpath.join(location, name) if location else name
+        url = storage.bucket.meta.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': storage.bucket_name,
+                'Key': key,
+                'ResponseContentType': content_type,
+                'ResponseContentDisposition': f'attachment; filename="{filename}"',
+            },
+            ExpiresIn=getattr(settings, 'MEMORIAS_PRESIGNED_URL_EXPIRE', 300),
+        )
+        response = HttpResponseRedirect(url)
+        # La URL expira: no debe quedar guardada en cachés intermedias
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+DELIVERY_BACKENDS = {
+    backend.name: backend
+    for backend in (StreamDelivery, XAccelRedirectDelivery, XSendfileDelivery, PresignedURLDelivery)
+}
+
+
+def get_delivery_backend(storage):
+    """
+    Selecciona el backend según `MEMORIAS_DELIVERY_BACKEND`.
+
+    - 'auto' (por defecto): URL prefirmada si el storage es S3, streaming en otro caso.
+    - 'stream', 'x-accel', 'x-sendfile', 'presigned': backend explícito. Si no es
+      compatible con el storage activo se usa el streaming como respaldo.
+
+    El api_gateway entrega las redirecciones y los headers X-Accel-Redirect /
+    X-Sendfile al cliente sin seguirlos, por lo que la transferencia no pasa por
+    ningún proceso de Python.
+    """
+    configured = getattr(settings, 'MEMORIAS_DELIVERY_BACKEND', 'auto')
+    if configured == 'auto':
+        candidates = [PresignedURLDelivery(), StreamDelivery()]
+    else:
+        backend_class = DELIVERY_BACKENDS.get(configured, StreamDelivery)
+        candidates = [backend_class(), StreamDelivery()]
+
+    for backend in candidates:
+        if backend.supports(storage):
+            return backend
+    return StreamDelivery()
+
+
+def deliver_file(request, storage, name, size, content_type, filename, etag, last_modified=None):
+    """
+    Entrega `name` usando el backend configurado.
+    """
+    backend = get_delivery_backend(storage)
+    return backend.deliver(request, storage, name, size, content_type, filename, etag, last_modified)
+
+
+# ---------------------------------------------------------------------------
+# Paquetes ZIP en streaming
+# ---------------------------------------------------------------------------
+
+class _ZipStreamBuffer:
+    """
+    Destino de escritura no posicionable para `zipfile`.
+
+    Al no tener `seek`, `zipfile` escribe cada entrada con "data descriptor" y no
+    necesita volver atrás; los bytes se acumulan aquí hasta que el generador los
+    entrega al cliente.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def iter_zip_stream(entries, chunk_size=CHUNK_SIZE):
+    """
+    Genera un ZIP al vuelo a partir de `entries`: iterable de (arcname, storage, name).
+
+    Las entradas se guardan sin compresión (ZIP_STORED), ya que los PDF vienen
+    comprimidos, y se leen por bloques: la memoria usada es constante y el
+    cliente recibe datos desde la primera entrada. Los archivos que no se
+    encuentran en el storage se listan en `FALTANTES.txt` al final del paquete.
+    """
+    buffer = _ZipStreamBuffer()
+    missing = []
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, storage, name in entries:
+            try:
+                size = storage.size(name)
+                source = storage.open(name, 'rb')
+            except Exception:
+                missing.append(arcname)
+                continue
+
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            try:
+                with archive.open(info, mode='w') as target:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield from buffer.drain()
+            finally:
+                source.close()
+            yield from buffer.drain()
+
+        if missing:
+            archive.writestr('FALTANTES.txt', '\n'.join(missing) + '\n')
+    yield from buffer.drain()
@@ -0,0 +1,81 @@
+"""
+Creación en bloque de detalles (`MemoriaDetalle`) de una memoria.
+
+Todos los detalles se validan primero y luego se insertan con un único
+`bulk_create`. El comportamiento ante errores se controla con el modo:
+
+- 'atomic': si algún detalle es inválido no se crea nada.
+- 'partial': se crean los detalles válidos y se informan los inválidos.
+
+El modo por defecto se define en `settings.MEMORIAS_DETALLES_MODE` y puede
+sobrescribirse por solicitud con el campo `detalles_mode`.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import bump_catalog_version, invalidate_memoria, touch_memoria
+from .models import MemoriaDetalle
+from .serializers import MemoriaDetalleInputSerializer
+
+
+DETALLES_MODES = ('atomic', 'partial')
+
+
+def resolve_detalles_mode(value=None):
+    """
+    Retorna el modo a usar, o None si `value` no es un modo válido.
+    """
+    if value in (None, ''):
+        value = getattr(settings, 'MEMORIAS_DETALLES_MODE', 'partial')
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value if value in DETALLES_MODES else None
+
+
+def validate_detalles(detalles_data):
+    """
+    Valida todos los detalles sin guardarlos.
+
+    Retorna (validos, errores):
+    - validos: lista de diccionarios con los datos validados.
+    - errores: lista de {"index": i, "errores": {...}} en el formato de la API.
+    """
+    validos = []
+    errores = []
+    for idx, detalle_data in enumerate(detalles_data):
+        if not isinstance(detalle_data, dict):
+            errores.append({
+                "index": idx,
+                "errores": {"detalle": "El detalle debe ser un objeto JSON."}
+            })
+            continue
+
+        serializer = MemoriaDetalleInputSerializer(data=detalle_data)
+        if serializer.is_valid():
+            validos.append(serializer.validated_data)
+        else:
+            errores.append({
+                "index": idx,
+                "errores": serializer.errors
+            })
+    return validos, errores
+
+
+def bulk_create_detalles(memoria, validos, batch_size=500):
+    """
+    Inserta los detalles validados de `memoria` con un único `bulk_create`.
+
+    `bulk_create` no emite `post_save`, por lo que la versión de la memoria se
+    actualiza aquí y sus cachés se invalidan al confirmar la transacción.
+    """
+    if not validos:
+        return []
+    detalles = MemoriaDetalle.objects.bulk_create(
+        [MemoriaDetalle(id_memo=memoria, **data) for data in validos],
+        batch_size=batch_size,
+    )
+    memoria_id = memoria.pk
+    touch_memoria(memoria_id)
+    transaction.on_commit(lambda: (bump_catalog_version(), invalidate_memoria(memoria_id)))
+    return detalles
@@ -0,0 +1,106 @@
+"""
+Exportación del catálogo de memorias en CSV o NDJSON, generada por filas.
+
+Las memorias y sus detalles se leen en una sola consulta (LEFT JOIN sobre
+`MemoriaDetalle`) ordenada por memoria, con `values_list()` e `iterator()`, que
+en PostgreSQL usa un cursor del lado del servidor. Así el uso de memoria no
+depende del tamaño del catálogo y no hay una consulta por memoria.
+
+- CSV: una fila por estudiante (detalle); las memorias sin detalles aparecen
+  una vez con las columnas del estudiante vacías.
+- NDJSON: un objeto JSON por memoria, con sus detalles en la lista `detalles`.
+"""
+
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+
+from .models import Memoria, MemoriaDetalle
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+# Los archivos se descargan desde su propio endpoint; no se exportan
+MEMORIA_EXPORT_FIELDS = tuple(
+    field.name for field in Memoria._meta.concrete_fields
+    if field.name not in ('loc_disco', 'imagen_display', 'imagen_display_sizes')
+)
+DETALLE_EXPORT_FIELDS = tuple(
+    field.name for field in MemoriaDetalle._meta.concrete_fields
+    if field.name != 'id_memo'
+)
+
+
+def _export_value(value):
+    """Formatea fechas igual que la API (hora local, sin sufijo de zona)."""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _iter_rows(memories):
+    """
+    Recorre (memoria, detalle) en una única consulta. `detalle` es None para
+    las memorias sin detalles.
+    """
+    rows = (
+        memories
+        .order_by('id_memo', 'detalles__id_detalle')
+        .values_list(*MEMORIA_EXPORT_FIELDS, *(f"detalles__{name}" for name in DETALLE_EXPORT_FIELDS))
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    split = len(MEMORIA_EXPORT_FIELDS)
+    for row in rows:
+        row = [_export_value(value) for value in row]
+        detalle = row[split:]
+        # El LEFT JOIN deja `id_detalle` en NULL cuando la memoria no tiene detalles
+        yield row[:split], (detalle if detalle[0] is not None else None)
+
+
+class _Echo:
+    """Buffer mínimo para `csv.writer`: retorna la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(memories):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(MEMORIA_EXPORT_FIELDS + DETALLE_EXPORT_FIELDS)
+    empty = [None] * len(DETALLE_EXPORT_FIELDS)
+    for memoria, detalle in _iter_rows(memories):
+        yield writer.writerow(memoria + (detalle or empty))
+
+
+def iter_ndjson(memories):
+    current = None
+    current_id = None
+    for memoria, detalle in _iter_rows(memories):
+        # Las filas llegan ordenadas por memoria: agrupar las consecutivas
+        if memoria[0] != current_id:
+            if current is not None:
+                yield json.dumps(current, ensure_ascii=False) + '\n'
+            current = dict(zip(MEMORIA_EXPORT_FIELDS, memoria))
+            current['detalles'] = []
+            current_id = memoria[0]
+        if detalle is not None:
+            current['detalles'].append(dict(zip(DETALLE_EXPORT_FIELDS, detalle)))
+    if current is not None:
+        yield json.dumps(current, ensure_ascii=False) + '\n'
+
+
+def iter_export(memories, fmt):
+    """Generador de la exportación en el formato indicado ('csv' o 'ndjson')."""
+    if fmt == 'csv':
+        return iter_csv(memories)
+    return iter_ndjson(memories)
@@ -6,7 +6,12 @@ del modelo Memoria, evitando duplicación de código y asegurando que los cambio
 en el modelo se reflejen automáticamente en el endpoint de filtrado.
 """
 
-from .models import Memoria
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Memoria, MemoriaDetalle, RUT_PATTERN
 
 
 def get_valid_fields():
@@ -108,3 +113,212 @@ def get_all_filter_config():
         'escuela_choices': get_escuela_choices(),
         'detalle_fields': get_detalle_valid_fields(),
     }
+
+
+# ---------------------------------------------------------------------------
+# Esquema de filtrado compilado
+# ---------------------------------------------------------------------------
+
+class FieldFilter:
+    """
+    Filtro compilado para una clave aceptada en `filters`.
+
+    Cada instancia conoce el campo del modelo, el tipo de validación y el lookup
+    que se usará al construir el Q, de modo que la validación y la construcción
+    de la consulta no tengan que volver a inspeccionar el modelo en cada solicitud.
+    """
+    __slots__ = ('key', 'field', 'field_type', 'is_detalle', 'lookup', 'year_only', 'choices', 'choices_error')
+
+    def __init__(self, key, field, field_type, is_detalle=False, lookup='exact', year_only=False, choices=None):
+        self.key = key
+        self.field = field
+        self.field_type = field_type
+        self.is_detalle = is_detalle
+        self.lookup = lookup
+        self.year_only = year_only
+        self.choices = frozenset(choices) if choices is not None else None
+        # El mensaje de error se arma una sola vez
+        self.choices_error = ', '.join(choices) if choices is not None else None
+
+    def validate(self, value):
+        """
+        Valida el valor recibido.
+        Retorna (es_válido, mensaje_error, valor_procesado)
+        """
+        name = self.field
+        if self.field_type == 'integer':
+            if not isinstance(value, int) or isinstance(value, bool):
+                return False, f"El campo '{name}' debe ser un entero.", None
+            return True, None, value
+
+        if self.field_type == 'string':
+            if not isinstance(value, str):
+                return False, f"El campo '{name}' debe ser una cadena de texto.", None
+            if len(value) == 0:
+                return False, f"El campo '{name}' no puede estar vacío.", None
+            return True, None, value
+
+        if self.field_type == 'rut':
+            if not isinstance(value, str) or not RUT_PATTERN.match(value):
+                return False, f"El RUT '{value}' no tiene un formato válido.", None
+            return True, None, value
+
+        if self.field_type == 'choice':
+            # Listas y objetos no son hashables: se rechazan antes de buscar en el frozenset
+            if not isinstance(value, str):
+                return False, f"El campo '{name}' debe ser una cadena de texto.", None
+            if value not in self.choices:
+                return False, f"El valor '{value}' no es válido para el campo. Opciones válidas: {self.choices_error}", None
+            return True, None, value
+
+        if self.field_type == 'date':
+            if not isinstance(value, str):
+                return False, f"El campo '{name}' debe ser una cadena de fecha.", None
+            if len(value) == 4 and value.isdigit():
+                return True, None, ('year', int(value))
+            if not self.year_only:
+                try:
+                    return True, None, ('date', datetime.strptime(value, '%Y-%m-%d').date())
+                except ValueError:
+                    pass
+            return False, f"El campo '{name}' debe ser una fecha (YYYY-MM-DD) o año (YYYY).", None
+
+        return False, f"Campo '{name}' no es válido para filtro.", None
+
+    def build_q(self, processed_value):
+        """Construye el Q correspondiente a un valor ya validado."""
+        if self.field_type == 'date':
+            kind, value = processed_value
+            if kind == 'year':
+                return Q(**{f"{self.field}__year": value})
+            return Q(**{f"{self.field}__{self.lookup}": value})
+        return Q(**{f"{self.field}__{self.lookup}": processed_value})
+
+
+class FilterSchema:
+    """
+    Esquema de filtrado compilado a partir de los modelos `Memoria` y `MemoriaDetalle`.
+
+    Se construye una sola vez (ver `MemoriesServiceConfig.ready`) y puede ser
+    reutilizado por cualquier endpoint que acepte el formato de `FilterMemoriesView`.
+    """
+
+    def __init__(self, filters):
+        self.filters = filters
+
+    def get(self, key):
+        return self.filters.get(key)
+
+    def validate(self, key, value):
+        field_filter = self.filters.get(key)
+        if field_filter is None:
+            return False, f"Campo '{key}' no es válido para filtro.", None
+        return field_filter.validate(value)
+
+    def build_query(self, filters):
+        """
+        Construye dos consultas Q separadas: una para `Memoria` y otra para `MemoriaDetalle`.
+
+        Retorna: (memoria_query, detalle_query, errors)
+        """
+        memoria_q = None
+        detalle_q = None
+        errors = []
+
+        for key, value in filters.items():
+            field_filter = self.filters.get(key)
+            if field_filter is None:
+                errors.append(f"Campo '{key}' no es válido para filtro.")
+                continue
+
+            is_valid, error_msg, processed_value = field_filter.validate(value)
+            if not is_valid:
+                errors.append(error_msg)
+                continue
+
+            q_part = field_filter.build_q(processed_value)
+            if field_filter.is_detalle:
+                detalle_q = q_part if detalle_q is None else detalle_q & q_part
+            else:
+                memoria_q = q_part if memoria_q is None else memoria_q & q_part
+
+        return memoria_q, detalle_q, errors
+
+    def get_queryset(self, memoria_q, detalle_q):
+        """
+        Construye el queryset de `Memoria` para las consultas de `build_query`.
+
+        Los filtros de `MemoriaDetalle` se aplican como un `EXISTS` correlacionado,
+        por lo que todo se resuelve en una única sentencia SQL y no se generan
+        filas duplicadas (no hace falta `DISTINCT`).
+        """
+        queryset = Memoria.objects.all()
+        if memoria_q is not None:
+            queryset = queryset.filter(memoria_q)
+        if detalle_q is not None:
+            detalles = MemoriaDetalle.objects.filter(detalle_q, id_memo=OuterRef('pk'))
+            queryset = queryset.filter(Exists(detalles))
+        return queryset
+
+    def filter_queryset(self, filters):
+        """
+        Valida los filtros y retorna (queryset, errors).
+        Si hay errores de validación el queryset es None.
+        """
+        memoria_q, detalle_q, errors = self.build_query(filters)
+        if errors:
+            return None, errors
+        return self.get_queryset(memoria_q, detalle_q), []
+
+
+def _memoria_field_filters():
+    choices = {
+        'carrera': list(get_career_choices().keys()),
+        'escuela': list(get_escuela_choices().keys()),
+    }
+    filters = {}
+    for name, field_type in get_valid_fields().items():
+        if field_type == 'integer' or field_type == 'choice':
+            filters[name] = FieldFilter(name, name, field_type, choices=choices.get(name))
+        elif field_type == 'string' or field_type == 'string_contains':
+            filters[name] = FieldFilter(name, name, 'string', lookup='icontains')
+        elif field_type == 'date':
+            # Los DateTimeField se comparan por su fecha
+            model_field = Memoria._meta.get_field(name)
+            lookup = 'date' if isinstance(model_field, models.DateTimeField) else 'exact'
+            filters[name] = FieldFilter(name, name, 'date', lookup=lookup)
+            filters[f"{name}_year"] = FieldFilter(f"{name}_year", name, 'date', lookup=lookup, year_only=True)
+    return filters
+
+
+def _detalle_field_filters():
+    filters = {}
+    for name, field_type in get_detalle_valid_fields().items():
+        if field_type == 'rut':
+            filters[name] = FieldFilter(name, name, 'rut', is_detalle=True, lookup='exact')
+        else:
+            filters[name] = FieldFilter(name, name, 'string', is_detalle=True, lookup='icontains')
+    return filters
+
+
+_filter_schema = None
+
+
+def compile_filter_schema():
+    """
+    Compila (o recompila) el esquema de filtrado y lo deja disponible a nivel de módulo.
+    """
+    global _filter_schema
+    filters = _memoria_field_filters()
+    filters.update(_detalle_field_filters())
+    _filter_schema = FilterSchema(filters)
+    return _filter_schema
+
+
+def get_filter_schema():
+    """
+    Retorna el esquema de filtrado compilado, construyéndolo si aún no existe.
+    """
+    if _filter_schema is None:
+        return compile_filter_schema()
+    return _filter_schema
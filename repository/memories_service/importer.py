@@ -0,0 +1,451 @@
+"""
+Importación masiva de memorias desde un manifiesto (CSV o JSONL) y sus PDF.
+
+El manifiesto describe una memoria por fila (JSONL) o por grupo de filas (CSV):
+
+- JSONL: un objeto por línea con los campos de `Memoria`, `archivo` (ruta del PDF),
+  `imagen` (opcional) y `detalles` (lista de objetos `MemoriaDetalle`).
+- CSV: columnas con los campos de `Memoria`, `archivo`, `imagen` y los campos de
+  `MemoriaDetalle`. Las filas que comparten `archivo` corresponden a la misma
+  memoria (una fila por estudiante); los campos de la memoria se toman de la
+  primera. También se acepta una columna `detalles` con una lista JSON.
+
+Los archivos se leen desde un directorio o un ZIP (`open_source`). Todo se valida
+antes de escribir; luego los archivos de cada lote se copian al storage en
+paralelo como blobs direccionados por contenido (`blobs.py`, un PDF repetido se
+escribe una sola vez) y las memorias y sus detalles se insertan con un
+`bulk_create` por lote.
+
+Modos:
+- atómico (por defecto): si alguna fila es inválida no se importa nada, y un
+  error al escribir revierte toda la importación.
+- parcial: se importan las filas válidas; cada lote se confirma por separado.
+"""
+
+import csv
+import json
+import logging
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.files import File
+from django.core.validators import get_available_image_extensions
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .detalles import validate_detalles
+from .blobs import blob_name, file_digest, write_blob
+from .models import ArchivoBlob, Memoria, MemoriaDetalle, record_imagen_display_sizes
+from .serializers import MemoriaImportSerializer
+from .thumbnails import schedule_thumbnails
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Columnas del manifiesto CSV que corresponden a un detalle (estudiante)
+DETALLE_FIELDS = tuple(
+    field.name for field in MemoriaDetalle._meta.concrete_fields
+    if field.name not in ('id_detalle', 'id_memo')
+)
+
+
+class ManifestError(ValueError):
+    """El manifiesto no se puede leer (formato desconocido o contenido ilegible)."""
+
+
+def manifest_format(filename):
+    """Formato del manifiesto según su extensión ('csv', 'jsonl' o None)."""
+    return MANIFEST_FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+# ---------------------------------------------------------------------------
+# Lectura del manifiesto
+# ---------------------------------------------------------------------------
+
+def read_manifest(text, fmt):
+    """
+    Lee el manifiesto y retorna una lista de entradas:
+    {"fila": n, "memoria": {...}, "detalles": [...], "archivo": str, "imagen": str}
+
+    `text` es un archivo de texto (abierto con `newline=''` en el caso de CSV).
+    `fila` es el número de línea (1 = primera línea del archivo). Las líneas con
+    JSON inválido se retornan con la clave "error" para informarlas por fila.
+    """
+    if fmt == 'csv':
+        return _read_csv(text)
+    if fmt == 'jsonl':
+        return _read_jsonl(text)
+    raise ManifestError("Formato de manifiesto no soportado (use .csv o .jsonl).")
+
+
+def _read_jsonl(text):
+    entries = []
+    for lineno, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            entries.append({"fila": lineno, "error": f"JSON inválido: {e}"})
+            continue
+        if not isinstance(row, dict):
+            entries.append({"fila": lineno, "error": "Cada línea debe ser un objeto JSON."})
+            continue
+        entries.append(_split_row(lineno, row, row.pop('detalles', None) or []))
+    return entries
+
+
+def _read_csv(text):
+    try:
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or 'archivo' not in reader.fieldnames:
+            raise ManifestError("El manifiesto CSV debe incluir la columna 'archivo'.")
+        entries = []
+        by_archivo = {}
+        for row in reader:
+            lineno = reader.line_num
+            row = {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+            if not row:
+                continue
+
+            detalle = {key: row.pop(key) for key in DETALLE_FIELDS if key in row}
+            detalles = []
+            if 'detalles' in row:
+                try:
+                    detalles = json.loads(row.pop('detalles'))
+                except ValueError as e:
+                    entries.append({"fila": lineno, "error": f"La columna 'detalles' no es JSON válido: {e}"})
+                    continue
+                if not isinstance(detalles, list):
+                    entries.append({"fila": lineno, "error": "La columna 'detalles' debe ser una lista JSON."})
+                    continue
+            if detalle:
+                detalles.append(detalle)
+
+            archivo = row.get('archivo')
+            if archivo and archivo in by_archivo:
+                # Otra fila (otro estudiante) de una memoria ya leída
+                by_archivo[archivo]["detalles"].extend(detalles)
+                continue
+
+            entry = _split_row(lineno, row, detalles)
+            if archivo:
+                by_archivo[archivo] = entry
+            entries.append(entry)
+        return entries
+    except csv.Error as e:
+        raise ManifestError(f"El manifiesto CSV no es válido: {e}")
+
+
+def _split_row(lineno, row, detalles):
+    return {
+        "fila": lineno,
+        "archivo": row.pop('archivo', None),
+        "imagen": row.pop('imagen', None),
+        "memoria": row,
+        "detalles": detalles,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Origen de los archivos
+# ---------------------------------------------------------------------------
+
+def _clean_name(name):
+    """Normaliza una ruta relativa del manifiesto; None si intenta salir del origen."""
+    if not isinstance(name, str) or not name.strip():
+        return None
+    name = posixpath.normpath(name.strip().replace('\\', '/'))
+    if name.startswith('/') or name == '..' or name.startswith('../'):
+        return None
+    return name
+
+
+class DirectorySource:
+    """Archivos de la importación en un directorio local."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def size(self, name):
+        return os.path.getsize(self._path(name))
+
+    def open(self, name):
+        return open(self._path(name), 'rb')
+
+    def close(self):
+        pass
+
+
+class ZipSource:
+    """Archivos de la importación dentro de un ZIP (ruta o archivo subido)."""
+
+    def __init__(self, fileobj):
+        self.zipfile = zipfile.ZipFile(fileobj)
+        self.members = {
+            posixpath.normpath(info.filename): info
+            for info in self.zipfile.infolist()
+            if not info.is_dir()
+        }
+
+    def exists(self, name):
+        return name in self.members
+
+    def size(self, name):
+        return self.members[name].file_size
+
+    def open(self, name):
+        # ZipFile permite lecturas concurrentes de miembros distintos
+        return self.zipfile.open(self.members[name])
+
+    def close(self):
+        self.zipfile.close()
+
+
+def open_source(path_or_file):
+    """
+    Retorna el origen de archivos para un directorio, la ruta de un ZIP o un ZIP
+    ya abierto (por ejemplo, un archivo subido).
+    """
+    if isinstance(path_or_file, (str, os.PathLike)):
+        if os.path.isdir(path_or_file):
+            return DirectorySource(path_or_file)
+        if not zipfile.is_zipfile(path_or_file):
+            raise ManifestError("Los archivos deben entregarse en un directorio o en un ZIP.")
+        return ZipSource(path_or_file)
+    if not zipfile.is_zipfile(path_or_file):
+        raise ManifestError("El archivo de PDFs debe ser un ZIP válido.")
+    path_or_file.seek(0)
+    return ZipSource(path_or_file)
+
+
+# ---------------------------------------------------------------------------
+# Validación
+# ---------------------------------------------------------------------------
+
+def validate_entries(entries, source):
+    """
+    Valida todas las entradas del manifiesto contra los serializers y el origen
+    de archivos, sin escribir nada.
+
+    Retorna (filas, errores):
+    - filas: entradas válidas con "memoria" y "detalles" ya validados.
+    - errores: lista de {"fila": n, "archivo": str, "errores": {...}}.
+    """
+    image_extensions = set(get_available_image_extensions())
+    filas = []
+    errores = []
+    vistos = set()
+
+    for entry in entries:
+        if "error" in entry:
+            errores.append({"fila": entry["fila"], "archivo": None, "errores": {"fila": entry["error"]}})
+            continue
+
+        errors = {}
+        serializer = MemoriaImportSerializer(data=entry["memoria"])
+        if not serializer.is_valid():
+            errors.update(serializer.errors)
+
+        detalles_validos, detalles_errores = validate_detalles(entry["detalles"])
+        if detalles_errores:
+            errors["detalles"] = detalles_errores
+
+        archivo = _clean_name(entry["archivo"])
+        if archivo is None:
+            errors["archivo"] = "Debe indicar la ruta relativa del PDF."
+        elif not archivo.lower().endswith('.pdf'):
+            errors["archivo"] = "Solo se permiten archivos en formato PDF."
+        elif archivo in vistos:
+            errors["archivo"] = "El archivo ya está asignado a otra fila del manifiesto."
+        elif not source.exists(archivo):
+            errors["archivo"] = f"No se encontró '{archivo}'."
+
+        imagen = None
+        if entry["imagen"]:
+            imagen = _clean_name(entry["imagen"])
+            extension = posixpath.splitext(imagen or '')[1][1:].lower()
+            if imagen is None or extension not in image_extensions:
+                errors["imagen"] = "La imagen debe ser una ruta relativa a un archivo de imagen."
+            elif not source.exists(imagen):
+                errors["imagen"] = f"No se encontró '{imagen}'."
+
+        if archivo:
+            vistos.add(archivo)
+
+        if errors:
+            errores.append({"fila": entry["fila"], "archivo": entry["archivo"], "errores": errors})
+            continue
+
+        filas.append({
+            "fila": entry["fila"],
+            "memoria": serializer.validated_data,
+            "detalles": detalles_validos,
+            "files": {'loc_disco': archivo, 'imagen_display': imagen},
+        })
+    return filas, errores
+
+
+# ---------------------------------------------------------------------------
+# Importación
+# ---------------------------------------------------------------------------
+
+def _store_files(files, source):
+    """
+    Copia los archivos de una memoria desde el origen al storage como blobs
+    (`blobs.py`). Se ejecuta en el pool de hilos: no toca la base de datos.
+    Retorna {campo: (nombre, digest, tamaño, escrito)}.
+    """
+    stored = {}
+    for field_name, src in files.items():
+        if not src:
+            continue
+        storage = Memoria._meta.get_field(field_name).storage
+        filename = posixpath.basename(src)
+        with source.open(src) as fh:
+            content = File(fh, name=filename)
+            # Evitar que File intente deducir el tamaño por la ruta del miembro
+            content.size = source.size(src)
+            digest, size = file_digest(content)
+            name = blob_name(field_name, digest, filename)
+            stored[field_name] = (name, digest, size, write_blob(storage, name, content))
+    return stored
+
+
+def _delete_written(written):
+    for storage, name in written:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception("No se pudo eliminar %s tras una importación fallida", name)
+
+
+def _import_batch(batch, source, executor, written):
+    """Inserta un lote: archivos en paralelo, referencias a blobs, memorias y detalles."""
+    futures = [executor.submit(_store_files, fila["files"], source) for fila in batch]
+    results = []
+    error = None
+    for future in futures:
+        try:
+            stored = future.result()
+        except Exception as e:
+            error = error or e
+            stored = {}
+        written.extend(
+            (Memoria._meta.get_field(field_name).storage, name)
+            for field_name, (name, _, _, is_new) in stored.items() if is_new
+        )
+        results.append(stored)
+    if error is not None:
+        raise error
+
+    # Tamaños de miniatura ya registrados para las imágenes que eran blobs existentes
+    reused_images = {
+        stored['imagen_display'][0] for stored in results
+        if 'imagen_display' in stored and not stored['imagen_display'][3]
+    }
+    image_sizes = {}
+    if reused_images:
+        for name, sizes in Memoria.objects.filter(imagen_display__in=reused_images).values_list(
+            'imagen_display', 'imagen_display_sizes',
+        ):
+            if sizes:
+                image_sizes[name] = sizes
+
+    memorias = []
+    references = {}
+    for fila, stored in zip(batch, results):
+        memoria = Memoria(**fila["memoria"])
+        for field_name, (name, digest, size, _) in stored.items():
+            setattr(memoria, field_name, name)
+            setattr(memoria, f"{field_name}_digest", digest)
+            count = references[name][2] if name in references else 0
+            references[name] = (digest, size, count + 1)
+        if 'imagen_display' in stored:
+            memoria.imagen_display_sizes = image_sizes.get(stored['imagen_display'][0], [])
+        memorias.append(memoria)
+
+    ArchivoBlob.objects.reference_many(references)
+    memorias = Memoria.objects.bulk_create(memorias)
+    MemoriaDetalle.objects.bulk_create([
+        MemoriaDetalle(id_memo=memoria, **detalle)
+        for memoria, fila in zip(memorias, batch)
+        for detalle in fila["detalles"]
+    ])
+
+    for stored in results:
+        image = stored.get('imagen_display')
+        if image and image[3]:
+            schedule_thumbnails(
+                Memoria._meta.get_field('imagen_display').storage, image[0],
+                on_done=lambda sizes, name=image[0]: record_imagen_display_sizes(name, sizes),
+            )
+    return memorias
+
+
+def import_memorias(entries, source, partial=False, batch_size=None, workers=None, dry_run=False):
+    """
+    Valida e importa las entradas de un manifiesto (ver `read_manifest`).
+
+    Retorna un reporte:
+    {"total": n, "creadas": k, "ids": [...], "errores": [...], "importado": bool}
+    """
+    batch_size = batch_size or getattr(settings, 'MEMORIAS_IMPORT_BATCH_SIZE', 200)
+    workers = workers or getattr(settings, 'MEMORIAS_IMPORT_WORKERS', 4)
+
+    filas, errores = validate_entries(entries, source)
+    report = {"total": len(entries), "creadas": 0, "ids": [], "errores": errores, "importado": False}
+    if dry_run or not filas or (errores and not partial):
+        return report
+
+    written = []
+    created = []
+    # En modo atómico todos los lotes comparten una transacción (cada lote es un savepoint)
+    outer = nullcontext() if partial else transaction.atomic()
+    try:
+        with outer, ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import') as executor:
+            for start in range(0, len(filas), batch_size):
+                batch = filas[start:start + batch_size]
+                batch_written = []
+                try:
+                    with transaction.atomic():
+                        memorias = _import_batch(batch, source, executor, batch_written)
+                except Exception as e:
+                    _delete_written(batch_written)
+                    if not partial:
+                        raise
+                    logger.exception("Error al importar el lote que comienza en la fila %s", batch[0]["fila"])
+                    errores.extend(
+                        {"fila": fila["fila"], "archivo": fila["files"]["loc_disco"], "errores": {"importacion": str(e)}}
+                        for fila in batch
+                    )
+                    continue
+                written.extend(batch_written)
+                created.extend(memoria.pk for memoria in memorias)
+    except Exception:
+        # Modo atómico: la transacción se revirtió, eliminar también los archivos ya copiados
+        _delete_written(written)
+        raise
+
+    if created:
+        # `bulk_create` no emite señales: invalidar las respuestas agregadas del catálogo
+        bump_catalog_version()
+    report.update(creadas=len(created), ids=created, importado=bool(created))
+    return report
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memories_service.benchmark import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia, consultas SQL y memoria de los endpoints de memorias con 1k/10k/100k "
+        "memorias sintéticas. Usar con --settings=repository.settings.bench "
+        "(SQLite, o PostgreSQL si se definen las variables BENCH_DB_*)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help="Tamaños del archivo, separados por coma.")
+        parser.add_argument('--repeat', type=int, default=10, help="Solicitudes por endpoint y tamaño.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--pdf-pool', type=int, default=50, help="Cantidad de PDF distintos a repartir.")
+        parser.add_argument('--endpoints', help="Limitar a algunos endpoints (filter,detail,list).")
+        parser.add_argument('--warm', action='store_true', help="No limpiar las cachés entre solicitudes.")
+        parser.add_argument('--json', dest='json_path', help="Guardar los resultados en un archivo JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes debe ser una lista de enteros separados por coma.")
+        endpoints = set(options['endpoints'].split(',')) if options['endpoints'] else None
+
+        results = run_benchmarks(
+            sizes,
+            repeat=max(1, options['repeat']),
+            seed=options['seed'],
+            cold=not options['warm'],
+            endpoints=endpoints,
+            pdf_pool=max(1, options['pdf_pool']),
+            stdout=self.stdout,
+        )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'memorias':>9}  {'endpoint':<20} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'consultas':>9} {'pico KiB':>10}")
+        for row in results:
+            self.stdout.write(
+                f"{row['size']:>9}  {row['endpoint']:<20} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                f"{row['max_ms']:>9} {row['queries']:>9} {row['peak_kib']:>10}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
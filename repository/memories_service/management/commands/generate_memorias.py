@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from memories_service.benchmark import clear_archive, generate_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera memorias sintéticas (con detalles y PDF de prueba) hasta alcanzar el total indicado. "
+        "Las memorias generadas se pueden eliminar con --clear."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('total', type=int, nargs='?', help="Total de memorias sintéticas a alcanzar.")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla para datos reproducibles.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Memorias por INSERT.")
+        parser.add_argument('--pdf-pool', type=int, default=50, help="Cantidad de PDF distintos a repartir.")
+        parser.add_argument('--clear', action='store_true', help="Eliminar las memorias sintéticas existentes.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear_archive()
+            self.stdout.write(f"Eliminados {deleted} registros sintéticos.")
+            if options['total'] is None:
+                return
+        if options['total'] is None or options['total'] < 0:
+            raise CommandError("Indique el total de memorias a generar.")
+
+        created = generate_archive(
+            options['total'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            pdf_pool=max(1, options['pdf_pool']),
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Creadas {created} memorias sintéticas."))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from memories_service.models import Memoria, record_imagen_display_sizes
+from memories_service.thumbnails import generate_thumbnails, missing_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas faltantes de las imágenes de memorias (p. ej. imágenes subidas "
+        "antes de THUMBNAIL_SIZES o cuya generación falló). Con --force las regenera todas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerar también las miniaturas existentes.")
+
+    def handle(self, *args, **options):
+        storage = Memoria._meta.get_field('imagen_display').storage
+        # Los tamaños registrados en la base bastan para saber qué falta: no se consulta el storage
+        images = (
+            Memoria.objects.exclude(imagen_display='')
+            .exclude(imagen_display__isnull=True)
+            .values_list('imagen_display', 'imagen_display_sizes')
+            .distinct()
+        )
+
+        pending = []
+        for name, sizes in images.iterator():
+            if (options['force'] or missing_thumbnails(sizes)) and name not in pending:
+                pending.append(name)
+
+        generated = failed = 0
+        for name in pending:
+            try:
+                sizes = generate_thumbnails(storage, name)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{name}: {e}")
+                continue
+            record_imagen_display_sizes(name, sizes)
+            generated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Miniaturas generadas para {generated} imagen(es) ({failed} con errores)."
+        ))
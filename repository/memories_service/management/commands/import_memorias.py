@@ -0,0 +1,68 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memories_service.importer import ManifestError, import_memorias, manifest_format, open_source, read_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa memorias desde un manifiesto CSV o JSONL y un directorio o ZIP con los PDF. "
+        "Ver memories_service/importer.py para el formato del manifiesto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Ruta del manifiesto (.csv, .jsonl o .ndjson).")
+        parser.add_argument(
+            '--archivos',
+            help="Directorio o ZIP con los archivos. Por defecto, el directorio del manifiesto.",
+        )
+        parser.add_argument('--partial', action='store_true', help="Importar las filas válidas aunque otras tengan errores.")
+        parser.add_argument('--dry-run', action='store_true', help="Sólo validar, sin escribir nada.")
+        parser.add_argument('--batch-size', type=int, help="Memorias por lote (MEMORIAS_IMPORT_BATCH_SIZE).")
+        parser.add_argument('--workers', type=int, help="Hilos para copiar archivos (MEMORIAS_IMPORT_WORKERS).")
+        parser.add_argument('--report', help="Ruta donde guardar el reporte completo en JSON.")
+
+    def handle(self, *args, **options):
+        manifest = options['manifest']
+        fmt = manifest_format(manifest)
+        if fmt is None:
+            raise CommandError("Formato de manifiesto no soportado (use .csv o .jsonl).")
+
+        try:
+            source = open_source(options['archivos'] or os.path.dirname(os.path.abspath(manifest)))
+        except (ManifestError, OSError) as e:
+            raise CommandError(str(e))
+
+        try:
+            with open(manifest, encoding='utf-8-sig', newline='') as text:
+                entries = read_manifest(text, fmt)
+            report = import_memorias(
+                entries,
+                source,
+                partial=options['partial'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+            )
+        except (ManifestError, OSError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        finally:
+            source.close()
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2, default=str)
+
+        for error in report['errores']:
+            self.stderr.write(f"Fila {error['fila']} ({error['archivo']}): {json.dumps(error['errores'], ensure_ascii=False, default=str)}")
+
+        if options['dry_run']:
+            self.stdout.write(f"Validación: {report['total'] - len(report['errores'])} de {report['total']} filas válidas.")
+            return
+        if not report['importado'] and report['errores']:
+            raise CommandError(f"No se importó nada: {len(report['errores'])} fila(s) con errores.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Importadas {report['creadas']} de {report['total']} memorias ({len(report['errores'])} con errores)."
+        ))
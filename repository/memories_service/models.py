@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
-import os
-from django.utils.deconstruct import deconstructible
-from django.core.files.storage import default_storage
+import re
+from django.utils import timezone
+from .blobs import blob_name, file_digest, is_blob_name, write_blob
+from .thumbnails import delete_thumbnails, schedule_thumbnails
 
 
 def validar_pdf(value):
@@ -12,48 +14,17 @@ def validar_pdf(value):
     if not value.name.lower().endswith('.pdf'):
         raise ValidationError('Solo se permiten archivos en formato PDF.')
 
+RUT_PATTERN = re.compile(r'^\d{1,2}\.\d{3}\.\d{3}-[0-9kK]$|^\d{7,8}-[0-9kK]$')
+
+
 def validar_rut(value):
     """
     Validador simple para RUT.
     
     """
-    import re
-    pattern = r'^\d{1,2}\.\d{3}\.\d{3}-[0-9kK]$|^\d{7,8}-[0-9kK]$'
-    if not re.match(pattern, value):
+    if not RUT_PATTERN.match(value):
         raise ValidationError('El RUT no tiene un formato válido.')
     
-@deconstructible
-class RenamePDFPath:
-    """
-    Clase para definir la ruta de subida personalizada para archivos PDF de Memoria.
-    Si el objeto aún no tiene ID (aún no se ha guardado), se asigna un nombre temporal.
-    """
-    def __call__(self, instance, filename):
-        
-        ext = filename.split('.')[-1] 
-        if instance.id_memo:
-            filename = f"memoria_{instance.id_memo}.{ext}"
-        else:
-            filename = f"memoria_temp.{ext}"
-        return os.path.join("memorias/", filename)
-
-@deconstructible
-class RenameImagePath:
-    """
-    Clase para definir la ruta de subida personalizada para imágenes de Memoria.
-    Si el objeto aún no tiene ID (aún no se ha guardado), se asigna un nombre temporal.
-    """
-
-    def __call__(self, instance, filename):
-        
-        ext = filename.split('.')[-1] 
-        if instance.id_memo:
-            filename = f"memoimg_{instance.id_memo}.{ext}"
-        else:
-            filename = f"memoimg_temp.{ext}"
-        return os.path.join("memo_images/", filename)
-    
-
 class EscuelaChoices(models.TextChoices):
     INFORMATICA_TELECOMUNICACIONES = 'IT', 'Escuela de Informática y Telecomunicaciones'
     TURISMO_HOSPITALIDAD = 'TH', 'Escuela de Turismo y Hospitalidad'
@@ -112,6 +83,101 @@ class CareerChoices(models.TextChoices):
 
     
 
+# Campos de archivo de `Memoria` gestionados en `Memoria.save`
+MEMORIA_FILE_FIELDS = ('loc_disco', 'imagen_display')
+
+
+class ArchivoBlobManager(models.Manager):
+
+    def acquire(self, storage, name, digest, size, content=None):
+        """
+        Suma una referencia al blob `name`, escribiendo `content` si el archivo no
+        existe en el storage. Retorna True si el blob es nuevo.
+        """
+        with transaction.atomic():
+            blob, created = self.select_for_update().get_or_create(
+                name=name,
+                defaults={'digest': digest, 'size': size, 'ref_count': 0},
+            )
+            written = False
+            if content is not None and (created or not storage.exists(name)):
+                written = write_blob(storage, name, content)
+            self.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return created or written
+
+    def reference_many(self, blobs):
+        """
+        Suma referencias a varios blobs ya escritos en el storage.
+        `blobs` es un dict {nombre: (digest, tamaño, cantidad)}.
+        """
+        with transaction.atomic():
+            existing = set(self.select_for_update().filter(name__in=list(blobs)).values_list('name', flat=True))
+            self.bulk_create([
+                ArchivoBlob(name=name, digest=digest, size=size, ref_count=count)
+                for name, (digest, size, count) in blobs.items()
+                if name not in existing
+            ])
+            for name in existing:
+                self.filter(name=name).update(ref_count=F('ref_count') + blobs[name][2])
+
+    def release(self, storage, name, thumbnails=False):
+        """
+        Quita una referencia al blob `name`. Cuando ya nadie lo usa, el archivo (y sus
+        miniaturas) se elimina después del commit, fuera de la transacción (ver `purge`).
+        Los nombres anteriores a los blobs se eliminan directo tras el commit.
+        """
+        with transaction.atomic():
+            blob = self.select_for_update().filter(name=name).first()
+            if blob is None:
+                if not is_blob_name(name):
+                    transaction.on_commit(lambda: _delete_files(storage, name, thumbnails))
+                return
+            if blob.ref_count > 1:
+                self.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            # La fila queda con 0 referencias hasta `purge`: si alguien sube el mismo
+            # contenido antes, la reutiliza y el archivo no se elimina
+            self.filter(pk=blob.pk).update(ref_count=0)
+        transaction.on_commit(lambda: self.purge(storage, name, thumbnails))
+
+    def purge(self, storage, name, thumbnails=False):
+        """Elimina el blob `name` (fila y archivo) si sigue sin referencias."""
+        with transaction.atomic():
+            blob = self.select_for_update().filter(name=name).first()
+            if blob is None or blob.ref_count > 0:
+                return
+            blob.delete()
+            # Se elimina con la fila bloqueada: quien suba el mismo contenido espera y lo reescribe
+            _delete_files(storage, name, thumbnails)
+
+
+def _delete_files(storage, name, thumbnails=False):
+    if thumbnails:
+        delete_thumbnails(storage, name)
+    storage.delete(name)
+
+
+class ArchivoBlob(models.Model):
+    """
+    Archivo almacenado por contenido (ver `blobs.py`), compartido entre memorias.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ArchivoBlobManager()
+
+    class Meta:
+        db_table = 'memorias_blobs'
+        verbose_name = 'Archivo'
+        verbose_name_plural = 'Archivos'
+
+    def __str__(self):
+        return self.name
+
+
 class Memoria(models.Model):
     id_memo = models.AutoField(primary_key=True)
     titulo = models.CharField(max_length=100)
@@ -126,15 +192,19 @@ class Memoria(models.Model):
         max_length=50,
         choices=EscuelaChoices.choices,
     )
+    # Sin `upload_to`: `save` guarda cada archivo como blob (`blobs.blob_name`)
     loc_disco = models.FileField(
-        upload_to=RenamePDFPath(),
         validators=[validar_pdf]
     )
     imagen_display = models.ImageField(
-        upload_to=RenameImagePath(),
         blank=True,
         null=True
     )
+    # SHA-256 del contenido de cada archivo (ver `blobs.py`)
+    loc_disco_digest = models.CharField(max_length=64, blank=True, default='', editable=False)
+    imagen_display_digest = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Claves de las miniaturas ya generadas para `imagen_display` (ver thumbnails.py)
+    imagen_display_sizes = models.JSONField(default=list, blank=True, editable=False)
     entidad_involucrada = models.CharField(max_length=100)
     tipo_entidad = models.CharField(max_length=50)
     tipo_memoria = models.CharField(max_length=50)
@@ -148,58 +218,118 @@ class Memoria(models.Model):
         verbose_name = 'Memoria'
         verbose_name_plural = 'Memorias'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar los archivos cargados para detectar reemplazos sin otra consulta
+        instance._stored_files = {
+            name: getattr(instance.__dict__[name], 'name', instance.__dict__[name]) or ''
+            for name in MEMORIA_FILE_FIELDS
+            if name in instance.__dict__
+        }
+        return instance
+
+    def _get_stored_files(self):
+        """Nombres de los archivos guardados actualmente en la base de datos."""
+        stored = getattr(self, '_stored_files', None)
+        if stored is not None and len(stored) == len(MEMORIA_FILE_FIELDS):
+            return stored
+        # Instancia construida a mano o con campos diferidos: consultar sólo los nombres
+        row = Memoria.objects.filter(pk=self.pk).values_list(*MEMORIA_FILE_FIELDS).first()
+        return dict(zip(MEMORIA_FILE_FIELDS, row)) if row else {}
+
     def save(self, *args, **kwargs):
         """
-        Al guardar, si el objeto ya existía y la imagen/archivo cambió, eliminar el anterior.
-        Después del primer guardado renombrar los archivos temporales generados por
-        `RenameImagePath` y `RenamePDFPath` para usar el id real (`id_memo`).
+        Guarda la memoria almacenando sus archivos por contenido (`blobs.py`).
+
+        Cada archivo subido se guarda como blob según su SHA-256: si el blob ya
+        existe sólo se suma una referencia y no se escribe nada en el storage; si el
+        contenido es el mismo que ya tenía la memoria, no se hace nada. Después del
+        guardado se libera la referencia de los archivos reemplazados.
+
+        Si se subió una imagen nueva se programan sus miniaturas (`thumbnails.py`); si
+        la imagen ya era un blob existente se copian los tamaños registrados por otra
+        memoria que la usa.
         """
+        update_fields = kwargs.get('update_fields')
+        # Blobs escritos por este guardado, para limpiarlos si la transacción se revierte
+        self._new_blob_files = []
+        new_image = None
+
         try:
-            old = Memoria.objects.get(pk=self.pk)
-            if old.imagen_display and self.imagen_display != old.imagen_display:
-                old.imagen_display.delete(save=False)
-            if old.loc_disco and self.loc_disco != old.loc_disco:
-                old.loc_disco.delete(save=False)
-        except Memoria.DoesNotExist:
-            # objeto nuevo
-            pass
-
-        super().save(*args, **kwargs)
-
-        # Renombrar imagen temporal si existe
-        if self.imagen_display and "memoimg_temp" in os.path.basename(self.imagen_display.name):
-            ext = self.imagen_display.name.split('.')[-1]
-            new_name = f"memoimg_{self.id_memo}.{ext}"
-            new_path = os.path.join("memo_images", new_name)
-
-            old_path = self.imagen_display.name
-            file = default_storage.open(old_path)
-            # guardar con nuevo nombre en storage
-            self.imagen_display.save(new_path, file, save=False)
-            file.close()
-            # borrar antiguo
-            default_storage.delete(old_path)
-
-            super().save(update_fields=["imagen_display"])
-
-        # Renombrar PDF temporal si existe
-        if self.loc_disco and "memoria_temp" in os.path.basename(self.loc_disco.name):
-            ext = self.loc_disco.name.split('.')[-1]
-            new_name = f"memoria_{self.id_memo}.{ext}"
-            new_path = os.path.join("memorias", new_name)
-
-            old_path = self.loc_disco.name
-            file = default_storage.open(old_path)
-            self.loc_disco.save(new_path, file, save=False)
-            file.close()
-            default_storage.delete(old_path)
-
-            super().save(update_fields=["loc_disco"])
+            with transaction.atomic():
+                adding = self._state.adding or self.pk is None
+                stored = {} if adding else self._get_stored_files()
+
+                for name in MEMORIA_FILE_FIELDS:
+                    fieldfile = getattr(self, name)
+                    if not fieldfile:
+                        setattr(self, f"{name}_digest", '')
+                        if name == 'imagen_display':
+                            self.imagen_display_sizes = []
+                        continue
+                    if fieldfile._committed:
+                        continue
+
+                    digest, size = file_digest(fieldfile.file)
+                    target = blob_name(name, digest, fieldfile.name)
+                    if target != stored.get(name):
+                        storage = fieldfile.storage
+                        if ArchivoBlob.objects.acquire(storage, target, digest, size, fieldfile.file):
+                            self._new_blob_files.append((storage, target))
+                            if name == 'imagen_display':
+                                new_image = target
+                        if name == 'imagen_display':
+                            self.imagen_display_sizes = [] if new_image else recorded_sizes(target)
+                    setattr(self, name, target)
+                    setattr(self, f"{name}_digest", digest)
+                    if update_fields is not None and name in update_fields:
+                        extra = [f"{name}_digest"] + (['imagen_display_sizes'] if name == 'imagen_display' else [])
+                        kwargs['update_fields'] = list(kwargs['update_fields']) + extra
+
+                super().save(*args, **kwargs)
+
+                # Liberar los archivos reemplazados (sólo después de guardar los nuevos)
+                for name in MEMORIA_FILE_FIELDS:
+                    old_name = stored.get(name)
+                    current = getattr(self, name)
+                    if old_name and old_name != (current.name or ''):
+                        ArchivoBlob.objects.release(current.storage, old_name, thumbnails=name == 'imagen_display')
+        except Exception:
+            for storage, target in self._new_blob_files:
+                storage.delete(target)
+            raise
+
+        self._stored_files = {name: getattr(self, name).name or '' for name in MEMORIA_FILE_FIELDS}
+
+        # Generar miniaturas de la imagen nueva fuera del ciclo de la solicitud
+        if new_image:
+            schedule_thumbnails(
+                self.imagen_display.storage, new_image,
+                on_done=lambda sizes: record_imagen_display_sizes(new_image, sizes),
+            )
 
     def __str__(self):
         return self.titulo
 
 
+def recorded_sizes(name):
+    """Tamaños de miniatura ya registrados para la imagen `name` por alguna memoria."""
+    for sizes in Memoria.objects.filter(imagen_display=name).values_list('imagen_display_sizes', flat=True):
+        if sizes:
+            return sizes
+    return []
+
+
+def record_imagen_display_sizes(name, sizes):
+    """
+    Registra los tamaños generados en las memorias que usan la imagen `name` (un blob
+    puede ser compartido) y actualiza su `updated_at`, para que sus representaciones
+    en caché incluyan las miniaturas en lugar de la imagen original.
+    """
+    Memoria.objects.filter(imagen_display=name).update(imagen_display_sizes=sizes, updated_at=timezone.now())
+
+
 class MemoriaDetalle(models.Model):
     id_detalle = models.AutoField(primary_key=True)
     id_memo = models.ForeignKey(
@@ -218,6 +348,12 @@ class MemoriaDetalle(models.Model):
         db_table = 'memorias_detalles'
         verbose_name = 'Detalle de Memoria'
         verbose_name_plural = 'Detalles de Memorias'
+        indexes = [
+            # Búsqueda exacta por RUT desde el endpoint de filtrado
+            models.Index(fields=['rut_estudiante'], name='memo_det_rut_idx'),
+            # Los filtros por nombre (`icontains`) usan índices de trigramas, que sólo
+            # existen en PostgreSQL (ver `signals.create_trigram_indexes`)
+        ]
 
     def __str__(self):
         return f"{self.id_memo.id_memo} - {self.rut_estudiante} {self.nombre_estudiante} {self.apellido_estudiante}".strip()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Memoria, MemoriaDetalle
+from .thumbnails import thumbnail_urls
 from django.core.exceptions import ValidationError
 from rest_framework.reverse import reverse
 from django.utils import timezone
@@ -28,12 +29,13 @@ class MemoriaSerializer(serializers.ModelSerializer):
     fecha_subida = FlexibleDateTimeField()
     imagen_display_name = serializers.SerializerMethodField(read_only=True)
     imagen_display_url = serializers.SerializerMethodField(read_only=True)
+    imagen_display_thumbnails = serializers.SerializerMethodField(read_only=True)
     created_at = FlexibleDateTimeField(read_only=True)
     updated_at = FlexibleDateTimeField(read_only=True)
     
     class Meta:
         model = Memoria
-        fields = '__all__'
+        exclude = ['imagen_display_sizes']
     
     def get_imagen_display_name(self, obj):
         if getattr(obj, 'imagen_display', None):
@@ -52,6 +54,11 @@ class MemoriaSerializer(serializers.ModelSerializer):
             return None
         return None
 
+    def get_imagen_display_thumbnails(self, obj):
+        # URLs de las miniaturas por tamaño configurado ({'sm': url, 'md': url}), según
+        # los tamaños registrados por el worker (sin consultar el storage)
+        return thumbnail_urls(obj.imagen_display, obj.imagen_display_sizes, self.context.get('request'))
+
     def to_representation(self, instance):
         """Personalizar la representación: eliminar el campo `loc_disco` bruto
         y dejar sólo metadatos/urls para archivos.
@@ -70,4 +77,26 @@ class MemoriaSerializer(serializers.ModelSerializer):
 class MemoriaDetalleSerializer(serializers.ModelSerializer):
     class Meta:
         model = MemoriaDetalle
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class MemoriaDetalleInputSerializer(MemoriaDetalleSerializer):
+    """
+    Valida los datos de un detalle antes de que exista la memoria asociada
+    (creación en bloque): no incluye `id_memo`.
+    """
+    class Meta(MemoriaDetalleSerializer.Meta):
+        fields = None
+        exclude = ['id_memo']
+
+
+class MemoriaImportSerializer(MemoriaSerializer):
+    """
+    Valida los campos de una memoria leída desde un manifiesto de importación.
+    Los archivos se validan aparte (vienen del directorio o ZIP de la importación)
+    y `fecha_subida` se asigna al insertar.
+    """
+    fecha_subida = None
+
+    class Meta(MemoriaSerializer.Meta):
+        fields = None
+        exclude = ['loc_disco', 'imagen_display', 'imagen_display_sizes', 'fecha_subida']
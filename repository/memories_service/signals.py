@@ -0,0 +1,67 @@
+"""
+Señales del servicio de memorias.
+
+Mantienen coherentes las cachés del catálogo cuando cambian memorias o detalles,
+liberan los archivos (blobs) de las memorias eliminadas y crean, tras `migrate`,
+los índices de trigramas de los filtros por nombre.
+"""
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version, invalidate_memoria, touch_memoria
+from .filter_config import get_detalle_valid_fields
+from .models import MEMORIA_FILE_FIELDS, ArchivoBlob, Memoria, MemoriaDetalle
+
+
+@receiver(post_save, sender=Memoria)
+@receiver(post_delete, sender=Memoria)
+@receiver(post_save, sender=MemoriaDetalle)
+@receiver(post_delete, sender=MemoriaDetalle)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """Invalida las respuestas agregadas del catálogo tras cualquier escritura."""
+    bump_catalog_version()
+    # El detalle de la memoria afectada también cambia
+    if sender is MemoriaDetalle:
+        # La versión de la memoria (`updated_at`) cubre sus detalles
+        touch_memoria(instance.id_memo_id)
+        invalidate_memoria(instance.id_memo_id)
+    else:
+        invalidate_memoria(instance.pk)
+
+
+@receiver(post_delete, sender=Memoria)
+def release_memoria_files(sender, instance, **kwargs):
+    """Quita las referencias a los archivos de la memoria eliminada."""
+    for name in MEMORIA_FILE_FIELDS:
+        fieldfile = getattr(instance, name)
+        if fieldfile:
+            ArchivoBlob.objects.release(fieldfile.storage, fieldfile.name, thumbnails=name == 'imagen_display')
+
+
+def create_trigram_indexes(using='default', **kwargs):
+    """
+    Crea índices GIN con `gin_trgm_ops` (extensión pg_trgm) sobre los campos de texto
+    de `MemoriaDetalle` que se filtran con `icontains`.
+
+    Django traduce `icontains` a `UPPER(campo::text) LIKE UPPER('%valor%')`, que un
+    btree no puede resolver; el índice se crea sobre esa misma expresión para que
+    PostgreSQL lo use. En otras bases de datos (SQLite en tests) no se hace nada.
+    Se conecta a `post_migrate` en `apps.py` y es idempotente.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    table = MemoriaDetalle._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, field_type in get_detalle_valid_fields().items():
+            if field_type != 'string':
+                continue
+            column = MemoriaDetalle._meta.get_field(name).column
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {connection.ops.quote_name(f'memo_det_{column}_trgm')} "
+                f"ON {connection.ops.quote_name(table)} "
+                f"USING gin ((UPPER({connection.ops.quote_name(column)}::text)) gin_trgm_ops)"
+            )
@@ -1,3 +1,788 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .cache import bump_catalog_version, catalog_cache_timeout, memoria_version
+from .importer import DirectorySource, ZipSource, import_memorias, read_manifest
+from .delivery import (
+    MAX_RANGES, OffloadedDelivery, PresignedURLDelivery, StreamDelivery, XAccelRedirectDelivery, get_delivery_backend,
+    parse_range_header,
+)
+from .models import ArchivoBlob, Memoria, MemoriaDetalle
+from .thumbnails import thumbnail_name
+
+
+def _memoria(content=b'contenido', **fields):
+    data = {
+        'titulo': 'Memoria', 'profesor': 'Profesor', 'descripcion': 'Descripción',
+        'carrera': 'INGINFO', 'escuela': 'IT', 'entidad_involucrada': 'Entidad',
+        'tipo_entidad': 'Empresa', 'tipo_memoria': 'Proyecto',
+        'fecha_inicio': datetime.date(2023, 3, 1), 'fecha_termino': datetime.date(2023, 12, 1),
+    }
+    data.update(fields)
+    memoria = Memoria(**data)
+    memoria.loc_disco = SimpleUploadedFile('memoria.pdf', b'%PDF-1.4 ' + content, content_type='application/pdf')
+    memoria.save()
+    return memoria
+
+
+class MediaTestCase(TestCase):
+    """Casos que escriben archivos: usan un MEDIA_ROOT temporal y una caché limpia."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+
+class FacetCacheTests(MediaTestCase):
+
+    def _counts(self, facet):
+        response = self.client.get(reverse('facet-memories'))
+        self.assertEqual(response.status_code, 200, response.content)
+        return {item['value']: item['count'] for item in response.json()['facets'][facet] if item['count']}
+
+    def test_counts_follow_catalog_version(self):
+        memoria = _memoria()
+        _memoria(carrera='AP')
+        self.assertEqual(self._counts('carrera'), {'INGINFO': 1, 'AP': 1})
+
+        # Escritura sin señales, como la de otro proceso: la respuesta sigue en caché
+        Memoria.objects.filter(pk=memoria.pk).update(carrera='AP')
+        self.assertEqual(self._counts('carrera'), {'INGINFO': 1, 'AP': 1})
+
+        # `import_memorias` / `generate_memorias` incrementan la versión al terminar
+        bump_catalog_version()
+        self.assertEqual(self._counts('carrera'), {'AP': 2})
+
+    def test_timeout_depends_on_shared_cache(self):
+        with override_settings(MEMORIAS_CACHE={'CATALOG_TIMEOUT': 30}):
+            self.assertEqual(catalog_cache_timeout(), 30)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertIsNone(catalog_cache_timeout())
+
+
+class MemoriaPayloadCacheTests(MediaTestCase):
+
+    def test_write_from_another_process_is_visible(self):
+        memoria = _memoria()
+        url = reverse('memoria-detail', args=[memoria.pk])
+        self.assertEqual(self.client.get(url).json()['titulo'], 'Memoria')
+
+        # Escritura sin señales (otro proceso): el payload anterior queda bajo otra versión
+        Memoria.objects.filter(pk=memoria.pk).update(titulo='Renombrada', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url).json()['titulo'], 'Renombrada')
+
+    def test_detalles_update_memoria_version(self):
+        memoria = _memoria()
+        url = reverse('memoria-get-detalles', args=[memoria.pk])
+        self.assertEqual(self.client.get(url).json()['total_detalles'], 0)
+        version = memoria_version(memoria.pk)
+
+        MemoriaDetalle.objects.create(
+            id_memo=memoria, rut_estudiante='12345678-5', nombre_estudiante='Ana', apellido_estudiante='Pérez',
+        )
+        self.assertNotEqual(memoria_version(memoria.pk), version)
+        self.assertEqual(self.client.get(url).json()['total_detalles'], 1)
+
+    def test_missing_memoria(self):
+        self.assertEqual(self.client.get(reverse('memoria-detail', args=[999])).status_code, 404)
+
+
+class MemoryDetailEtagTests(MediaTestCase):
+
+    def test_if_none_match(self):
+        memoria = _memoria()
+        url = reverse('memory-detail', args=[memoria.pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_write_from_another_process_changes_etag(self):
+        memoria = _memoria()
+        url = reverse('memory-detail', args=[memoria.pk])
+        etag = self.client.get(url)['ETag']
+
+        # Con la caché local el ETag guardado se valida contra `updated_at`
+        Memoria.objects.filter(pk=memoria.pk).update(titulo='Renombrada', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['memory']['titulo'], 'Renombrada')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_memoria(self):
+        self.assertEqual(self.client.get(reverse('memory-detail', args=[999])).status_code, 404)
+
+
+class FilterMemoriesTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.memoria = _memoria(b'uno', titulo='Con estudiantes')
+        for rut, nombre in (('12345678-5', 'Ana'), ('11111111-1', 'Anabel')):
+            MemoriaDetalle.objects.create(
+                id_memo=self.memoria, rut_estudiante=rut, nombre_estudiante=nombre, apellido_estudiante='Pérez',
+            )
+        self.other = _memoria(b'dos', titulo='Otra')
+        MemoriaDetalle.objects.create(
+            id_memo=self.other, rut_estudiante='22222222-2', nombre_estudiante='Luis', apellido_estudiante='Soto',
+        )
+
+    def _filter(self, filters):
+        response = self.client.post(reverse('filter-memories'), {'filters': filters}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['id_memo'] for result in response.json()['results']]
+
+    def test_matching_detalles_do_not_duplicate_memorias(self):
+        # Ambos detalles de la memoria coinciden con 'ana'
+        self.assertEqual(self._filter({'nombre_estudiante': 'ana'}), [self.memoria.pk])
+        self.assertEqual(self._filter({'apellido_estudiante': 'pérez', 'titulo': 'estudiantes'}), [self.memoria.pk])
+
+    def test_invalid_filters_return_400(self):
+        for filters in (
+            {'carrera': 'NOEXISTE'},
+            {'carrera': ['INGINFO']},
+            {'escuela': {'valor': 'IT'}},
+            {'id_memo': '1'},
+            {'campo_desconocido': 'x'},
+        ):
+            response = self.client.post(reverse('filter-memories'), {'filters': filters}, format='json')
+            self.assertEqual(response.status_code, 400, filters)
+            self.assertEqual(len(response.json()['details']), 1)
+
+    def test_detalle_filters_use_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._filter({'apellido_estudiante': 'soto'}), [self.other.pk])
+
+
+class DetallesTests(MediaTestCase):
+
+    VALIDO = {'rut_estudiante': '12345678-5', 'nombre_estudiante': 'Ana', 'apellido_estudiante': 'Pérez'}
+    INVALIDO = {'rut_estudiante': 'no-es-rut', 'nombre_estudiante': 'Luis', 'apellido_estudiante': 'Soto'}
+
+    def setUp(self):
+        super().setUp()
+        self.memoria = _memoria()
+
+    def _add(self, detalles, mode=None):
+        payload = {'detalles': detalles}
+        if mode is not None:
+            payload['detalles_mode'] = mode
+        return self.client.post(reverse('memoria-add-detalles', args=[self.memoria.pk]), payload, format='json')
+
+    def _create(self, detalles, mode):
+        payload = {
+            'titulo': 'Nueva', 'profesor': 'Profesor', 'descripcion': 'Descripción', 'carrera': 'INGINFO',
+            'escuela': 'IT', 'entidad_involucrada': 'Entidad', 'tipo_entidad': 'Empresa',
+            'tipo_memoria': 'Proyecto', 'fecha_inicio': '2023-03-01', 'fecha_termino': '2023-12-01',
+            'fecha_subida': '2023-12-02T10:00:00',
+            'loc_disco': SimpleUploadedFile('memoria.pdf', b'%PDF-1.4 nueva', content_type='application/pdf'),
+            'detalles': json.dumps(detalles), 'detalles_mode': mode,
+        }
+        return self.client.post(reverse('memoria-list'), payload, format='multipart')
+
+    def test_add_partial_creates_valid_rows_and_reports_errors(self):
+        response = self._add([self.VALIDO, self.INVALIDO, 'texto'], mode='partial')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual([d['nombre_estudiante'] for d in body['detalles_creados']], ['Ana'])
+        self.assertEqual([error['index'] for error in body['detalles_con_errores']], [1, 2])
+        self.assertIn('rut_estudiante', body['detalles_con_errores'][0]['errores'])
+        self.assertEqual(self.memoria.detalles.count(), 1)
+
+    def test_add_atomic_rejects_everything_on_error(self):
+        response = self._add([self.VALIDO, self.INVALIDO], mode='atomic')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['detalles_con_errores']], [1])
+        self.assertFalse(self.memoria.detalles.exists())
+
+    def test_add_partial_without_valid_rows_is_400(self):
+        self.assertEqual(self._add([self.INVALIDO], mode='partial').status_code, 400)
+        self.assertEqual(self._add([self.VALIDO], mode='otro').status_code, 400)
+        self.assertFalse(self.memoria.detalles.exists())
+
+    def test_add_inserts_in_bulk(self):
+        detalles = [dict(self.VALIDO, nombre_estudiante=f'Ana {i}') for i in range(10)]
+        # Memoria, un único INSERT, `updated_at` y el savepoint: no crece con la cantidad de detalles
+        with self.assertNumQueries(5):
+            response = self._add(detalles, mode='atomic')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.memoria.detalles.count(), 10)
+
+    def test_create_atomic_failure_creates_nothing(self):
+        response = self._create([self.VALIDO, self.INVALIDO], mode='atomic')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Memoria.objects.filter(titulo='Nueva').exists())
+
+    def test_create_partial_keeps_memoria_and_valid_rows(self):
+        response = self._create([self.VALIDO, self.INVALIDO], mode='partial')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual(len(body['detalles_creados']), 1)
+        self.assertEqual([error['index'] for error in body['detalles_con_errores']], [1])
+        self.assertEqual(Memoria.objects.get(titulo='Nueva').detalles.count(), 1)
+
+
+class ParseRangeHeaderTests(TestCase):
+
+    def test_single_and_open_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-9', 100), [(0, 9)])
+        self.assertEqual(parse_range_header('bytes=90-', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=50-500', 100), [(50, 99)])
+
+    def test_suffix_ranges(self):
+        self.assertEqual(parse_range_header('bytes=-10', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=-500', 100), [(0, 99)])
+        self.assertEqual(parse_range_header('bytes=-0', 100), [])
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        self.assertEqual(parse_range_header('bytes=50-59, 0-9, 5-14, 15-19', 100), [(0, 19), (50, 59)])
+        self.assertEqual(parse_range_header('bytes=0-9,-5', 100), [(0, 9), (95, 99)])
+
+    def test_range_limit(self):
+        header = 'bytes=' + ','.join(f'{i * 2}-{i * 2}' for i in range(MAX_RANGES))
+        self.assertEqual(len(parse_range_header(header, 100)), MAX_RANGES)
+        header = 'bytes=' + ','.join(f'{i * 2}-{i * 2}' for i in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_range_header(header, 100))
+
+    def test_unsatisfiable_and_invalid(self):
+        self.assertEqual(parse_range_header('bytes=100-', 100), [])
+        self.assertIsNone(parse_range_header('bytes=9-0', 100))
+        self.assertIsNone(parse_range_header('bytes=a-b', 100))
+        self.assertIsNone(parse_range_header('items=0-9', 100))
+        self.assertIsNone(parse_range_header('', 100))
+
+
+@override_settings(MEMORIAS_DELIVERY_BACKEND='stream')
+class DownloadMemoryTests(MediaTestCase):
+    CONTENT = b'%PDF-1.4 0123456789abcdefghij'
+
+    def setUp(self):
+        super().setUp()
+        self.memoria = _memoria(b'0123456789abcdefghij')
+        self.url = reverse('download-memory', args=[self.memoria.pk])
+
+    def _body(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self._body(response), self.CONTENT)
+
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=9-18')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 9-18/{len(self.CONTENT)}')
+        self.assertEqual(self._body(response), b'0123456789')
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), b'hij')
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3,2-7,-2')
+        self.assertEqual(response.status_code, 206)
+        boundary = response['Content-Type'].split('boundary=')[1]
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        body = self._body(response)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        # Los rangos solapados se entregan como una sola parte
+        self.assertEqual(body.count(f'--{boundary}\r\n'.encode()), 2)
+        self.assertIn(b'Content-Range: bytes 0-7/29\r\n\r\n%PDF-1.4', body)
+        self.assertIn(b'Content-Range: bytes 27-28/29\r\n\r\nij', body)
+        self.assertTrue(body.endswith(f'\r\n--{boundary}--\r\n'.encode()))
+
+    def test_too_many_ranges_sends_whole_file(self):
+        header = 'bytes=' + ','.join(f'{i}-{i}' for i in range(MAX_RANGES + 1))
+        response = self.client.get(self.url, HTTP_RANGE=header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.CONTENT)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=500-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.CONTENT)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"otro"')
+        self.assertEqual(response.status_code, 200)
+
+
+class DeliveryBackendTests(TestCase):
+
+    class S3LikeStorage:
+        bucket = object()
+        bucket_name = 'memorias'
+
+    def test_default_offloads_s3_downloads(self):
+        with self.settings():
+            del settings.MEMORIAS_DELIVERY_BACKEND
+            self.assertIsInstance(get_delivery_backend(self.S3LikeStorage()), PresignedURLDelivery)
+            self.assertIsInstance(get_delivery_backend(FileSystemStorage()), StreamDelivery)
+
+    def test_internal_redirect(self):
+        with self.settings(MEMORIAS_DELIVERY_BACKEND='x-accel'):
+            backend = get_delivery_backend(FileSystemStorage())
+        self.assertIsInstance(backend, XAccelRedirectDelivery)
+        response = backend.deliver(RequestFactory().get('/'), FileSystemStorage(), 'memorias/a.pdf', 10,
+                                   'application/pdf', 'memoria_1.pdf', '"abc"')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/memorias/a.pdf')
+        self.assertEqual(response.content, b'')
+
+    def test_offloaded_backends_are_abstract(self):
+        with self.assertRaises(TypeError):
+            OffloadedDelivery()
+
+
+def _png(color='navy'):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', (800, 600), color).save(output, format='PNG')
+    return SimpleUploadedFile('portada.png', output.getvalue(), content_type='image/png')
+
+
+@override_settings(THUMBNAIL_SYNC=True)
+class ThumbnailTests(MediaTestCase):
+
+    def _thumbnails(self, memoria):
+        response = self.client.get(reverse('memoria-detail', args=[memoria.pk]))
+        return response.json()['imagen_display_thumbnails']
+
+    def test_missing_sizes_use_original_until_generated(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            memoria = _memoria(imagen_display=_png())
+        original = self.client.get(reverse('memoria-detail', args=[memoria.pk])).json()['imagen_display_url']
+        self.assertEqual(set(self._thumbnails(memoria).values()), {original})
+
+        for callback in callbacks:
+            callback()
+        memoria.refresh_from_db()
+        self.assertEqual(memoria.imagen_display_sizes, ['sm', 'md'])
+        # La generación actualiza `updated_at`, por lo que la caché no retiene las URLs originales
+        thumbnails = self._thumbnails(memoria)
+        self.assertEqual(set(thumbnails), {'sm', 'md'})
+        self.assertNotIn(original, thumbnails.values())
+        self.assertTrue(thumbnails['sm'].endswith(thumbnail_name(memoria.imagen_display.name, 'sm')))
+
+    def test_urls_follow_recorded_sizes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            memoria = _memoria(imagen_display=_png())
+        # El derivado 'md' existe en el storage, pero sin registro se usa la imagen original
+        Memoria.objects.filter(pk=memoria.pk).update(imagen_display_sizes=['sm'], updated_at=timezone.now())
+        thumbnails = self._thumbnails(memoria)
+        self.assertTrue(thumbnails['sm'].endswith(thumbnail_name(memoria.imagen_display.name, 'sm')))
+        self.assertTrue(thumbnails['md'].endswith(memoria.imagen_display.name))
+
+    def test_reused_image_copies_recorded_sizes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = _memoria(imagen_display=_png())
+        with self.captureOnCommitCallbacks() as callbacks:
+            second = _memoria(content=b'otro', imagen_display=_png())
+        self.assertEqual(second.imagen_display.name, first.imagen_display.name)
+        self.assertEqual(second.imagen_display_sizes, ['sm', 'md'])
+        self.assertEqual(callbacks, [])
+
+    def test_backfill_command(self):
+        memoria = _memoria(imagen_display=_png('teal'))
+        self.assertEqual(memoria.imagen_display_sizes, [])
+
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        memoria.refresh_from_db()
+        self.assertEqual(memoria.imagen_display_sizes, ['sm', 'md'])
+        self.assertTrue(memoria.imagen_display.storage.exists(thumbnail_name(memoria.imagen_display.name, 'sm')))
+
+
+def _manifest_row(archivo, titulo='Memoria', **fields):
+    row = {
+        'titulo': titulo, 'profesor': 'Profesor', 'descripcion': 'Descripción',
+        'carrera': 'INGINFO', 'escuela': 'IT', 'entidad_involucrada': 'Entidad',
+        'tipo_entidad': 'Empresa', 'tipo_memoria': 'Proyecto',
+        'fecha_inicio': '2023-03-01', 'fecha_termino': '2023-12-01',
+        'archivo': archivo,
+        'detalles': [{'rut_estudiante': '12345678-5', 'nombre_estudiante': 'Ana', 'apellido_estudiante': 'Pérez'}],
+    }
+    row.update(fields)
+    return row
+
+
+class FailingSource(DirectorySource):
+    """Origen que falla al leer `broken`, después de que la validación lo dio por bueno."""
+
+    def __init__(self, root, broken):
+        super().__init__(root)
+        self.broken = broken
+
+    def open(self, name):
+        if name == self.broken:
+            raise OSError(f"No se pudo leer {name}")
+        return super().open(name)
+
+
+class ImportMemoriasTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir, ignore_errors=True)
+        for index in range(3):
+            with open(os.path.join(self.source_dir, f'm{index}.pdf'), 'wb') as fh:
+                fh.write(f'%PDF-1.4 importada {index}'.encode())
+
+    def _entries(self, rows):
+        text = io.StringIO('\n'.join(json.dumps(row) for row in rows))
+        return read_manifest(text, 'jsonl')
+
+    def _stored_files(self):
+        root = settings.MEDIA_ROOT
+        return sorted(
+            os.path.join(path, name) for path, _, names in os.walk(root) for name in names
+        )
+
+    def test_atomic_mode_imports_nothing_on_invalid_row(self):
+        entries = self._entries([_manifest_row('m0.pdf'), _manifest_row('m1.pdf', carrera='NOEXISTE')])
+        report = import_memorias(entries, DirectorySource(self.source_dir))
+        self.assertFalse(report['importado'])
+        self.assertEqual([error['fila'] for error in report['errores']], [2])
+        self.assertEqual(Memoria.objects.count(), 0)
+
+    def test_atomic_mode_rolls_back_earlier_batches(self):
+        entries = self._entries([_manifest_row(f'm{index}.pdf') for index in range(3)])
+        with self.assertRaises(OSError):
+            import_memorias(entries, FailingSource(self.source_dir, 'm2.pdf'), batch_size=1, workers=1)
+        self.assertEqual(Memoria.objects.count(), 0)
+        self.assertEqual(MemoriaDetalle.objects.count(), 0)
+        self.assertEqual(self._stored_files(), [])
+
+    def test_partial_mode_reports_row_errors(self):
+        entries = self._entries([
+            _manifest_row('m0.pdf'),
+            _manifest_row('m1.pdf', carrera='NOEXISTE'),
+            _manifest_row('falta.pdf'),
+            _manifest_row('m2.pdf', titulo='Otra'),
+        ])
+        report = import_memorias(entries, DirectorySource(self.source_dir), partial=True)
+        self.assertTrue(report['importado'])
+        self.assertEqual(report['creadas'], 2)
+        errores = {error['fila']: error['errores'] for error in report['errores']}
+        self.assertEqual(set(errores), {2, 3})
+        self.assertIn('carrera', errores[2])
+        self.assertIn("falta.pdf", errores[3]['archivo'])
+        self.assertEqual(
+            sorted(Memoria.objects.values_list('titulo', flat=True)), ['Memoria', 'Otra'],
+        )
+        self.assertEqual(MemoriaDetalle.objects.count(), 2)
+
+    def test_partial_mode_skips_failed_batches(self):
+        entries = self._entries([_manifest_row(f'm{index}.pdf') for index in range(3)])
+        with self.assertLogs('memories_service.importer', 'ERROR'):
+            report = import_memorias(
+                entries, FailingSource(self.source_dir, 'm1.pdf'), partial=True, batch_size=1, workers=1,
+            )
+        self.assertEqual(report['creadas'], 2)
+        self.assertEqual([error['fila'] for error in report['errores']], [2])
+        self.assertEqual(Memoria.objects.count(), 2)
+
+    def test_zip_and_directory_sources(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.write(os.path.join(self.source_dir, 'm0.pdf'), 'pdfs/m0.pdf')
+        zip_source, directory_source = ZipSource(archive), DirectorySource(self.source_dir)
+        self.assertTrue(zip_source.exists('pdfs/m0.pdf'))
+        self.assertTrue(directory_source.exists('m0.pdf'))
+        self.assertEqual(zip_source.size('pdfs/m0.pdf'), directory_source.size('m0.pdf'))
+        self.assertFalse(directory_source.exists('m9.pdf'))
+
+        entries = self._entries([_manifest_row('pdfs/m0.pdf'), _manifest_row('pdfs/m1.pdf')])
+        report = import_memorias(entries, ZipSource(archive), partial=True)
+        self.assertEqual(report['creadas'], 1)
+        self.assertIn("pdfs/m1.pdf", report['errores'][0]['errores']['archivo'])
+
+        memoria = Memoria.objects.get()
+        with memoria.loc_disco.open('rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 importada 0')
+
+    def test_command_reads_csv_manifest(self):
+        manifest = os.path.join(self.source_dir, 'manifiesto.csv')
+        row = _manifest_row('m0.pdf')
+        row.pop('detalles')
+        columns = list(row) + ['rut_estudiante', 'nombre_estudiante', 'apellido_estudiante']
+        with open(manifest, 'w', encoding='utf-8', newline='') as fh:
+            fh.write(','.join(columns) + '\n')
+            for rut, nombre in (('12345678-5', 'Ana'), ('11111111-1', 'Luis')):
+                fh.write(','.join(list(row.values()) + [rut, nombre, 'Pérez']) + '\n')
+
+        call_command('import_memorias', manifest, stdout=io.StringIO())
+        memoria = Memoria.objects.get()
+        self.assertEqual(memoria.detalles.count(), 2)
+
+    def test_command_fails_without_importing_on_invalid_row(self):
+        manifest = os.path.join(self.source_dir, 'manifiesto.jsonl')
+        with open(manifest, 'w', encoding='utf-8') as fh:
+            fh.write(json.dumps(_manifest_row('m0.pdf')) + '\n')
+            fh.write(json.dumps(_manifest_row('falta.pdf')) + '\n')
+        with self.assertRaises(CommandError):
+            call_command('import_memorias', manifest, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Memoria.objects.count(), 0)
+
+    def test_endpoint(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.write(os.path.join(self.source_dir, 'm0.pdf'), 'm0.pdf')
+        manifest = '\n'.join(json.dumps(row) for row in (_manifest_row('m0.pdf'), _manifest_row('falta.pdf')))
+
+        def post(**extra):
+            data = {
+                'manifest': SimpleUploadedFile('manifiesto.jsonl', manifest.encode()),
+                'archivos': SimpleUploadedFile('archivos.zip', archive.getvalue()),
+            }
+            data.update(extra)
+            return self.client.post(reverse('import-memories'), data, format='multipart')
+
+        response = post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Memoria.objects.count(), 0)
+
+        response = post(partial='true')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['creadas'], 1)
+        self.assertEqual(response.json()['errores'][0]['fila'], 2)
+
+
+class ArchivoBlobTests(MediaTestCase):
+
+    def _blob(self, memoria):
+        return ArchivoBlob.objects.get(name=memoria.loc_disco.name)
+
+    def _exists(self, name):
+        return Memoria._meta.get_field('loc_disco').storage.exists(name)
+
+    def test_identical_upload_is_written_once(self):
+        first = _memoria(b'compartido')
+        name = first.loc_disco.name
+        path = first.loc_disco.path
+        os.utime(path, (0, 0))
+
+        second = _memoria(b'compartido')
+        self.assertEqual(second.loc_disco.name, name)
+        self.assertEqual(self._blob(first).ref_count, 2)
+        # El archivo existente no se vuelve a escribir
+        self.assertEqual(os.stat(path).st_mtime, 0)
+
+        # Volver a subir el mismo contenido a la misma memoria no suma referencias
+        second.loc_disco = SimpleUploadedFile('otra.pdf', b'%PDF-1.4 compartido')
+        second.save()
+        self.assertEqual(self._blob(first).ref_count, 2)
+        self.assertEqual(os.stat(path).st_mtime, 0)
+
+    def test_replacing_file_releases_old_blob(self):
+        first = _memoria(b'original')
+        second = _memoria(b'original')
+        old_name = first.loc_disco.name
+
+        first.loc_disco = SimpleUploadedFile('nueva.pdf', b'%PDF-1.4 reemplazo')
+        first.save()
+        self.assertEqual(ArchivoBlob.objects.get(name=old_name).ref_count, 1)
+        self.assertTrue(self._exists(old_name))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            second.loc_disco = SimpleUploadedFile('nueva.pdf', b'%PDF-1.4 reemplazo')
+            second.save()
+        # El archivo se elimina recién después del commit
+        self.assertEqual(ArchivoBlob.objects.get(name=old_name).ref_count, 0)
+        self.assertTrue(self._exists(old_name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(ArchivoBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(self._exists(old_name))
+        self.assertEqual(self._blob(second).ref_count, 2)
+
+    def test_reupload_before_commit_keeps_released_blob(self):
+        first = _memoria(b'vuelve')
+        name = first.loc_disco.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        # El mismo contenido se sube antes de que corra la eliminación diferida
+        second = _memoria(b'vuelve')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(second.loc_disco.name, name)
+        self.assertEqual(self._blob(second).ref_count, 1)
+        self.assertTrue(self._exists(name))
+
+    def test_delete_releases_blobs(self):
+        first = _memoria(b'borrar', imagen_display=SimpleUploadedFile('portada.gif', b'GIF89a borrar'))
+        second = _memoria(b'borrar')
+        pdf, image = first.loc_disco.name, first.imagen_display.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(ArchivoBlob.objects.get(name=pdf).ref_count, 1)
+        self.assertFalse(ArchivoBlob.objects.filter(name=image).exists())
+        self.assertFalse(self._exists(image))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ArchivoBlob.objects.exists())
+        self.assertFalse(self._exists(pdf))
+
+    def test_failed_save_removes_new_blobs(self):
+        existing = _memoria(b'existente')
+        before = set(ArchivoBlob.objects.values_list('name', flat=True))
+
+        memoria = Memoria(titulo=None)
+        memoria.loc_disco = SimpleUploadedFile('memoria.pdf', b'%PDF-1.4 fallida')
+        with self.assertRaises(IntegrityError):
+            memoria.save()
+        new_name = memoria.loc_disco.name
+        self.assertFalse(self._exists(new_name))
+        self.assertEqual(set(ArchivoBlob.objects.values_list('name', flat=True)), before)
+
+        # Un blob que ya existía sólo recibe una referencia: el fallo no lo elimina
+        memoria = Memoria(titulo=None)
+        memoria.loc_disco = SimpleUploadedFile('memoria.pdf', b'%PDF-1.4 existente')
+        with self.assertRaises(IntegrityError):
+            memoria.save()
+        self.assertTrue(self._exists(existing.loc_disco.name))
+        self.assertEqual(self._blob(existing).ref_count, 1)
+
+
+class BundleDownloadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = _memoria(b'uno', titulo='Primera memoria', carrera='INGINFO')
+        self.second = _memoria(b'dos', titulo='Segunda', carrera='AP')
+
+    def _bundle(self, data):
+        return self.client.post(reverse('download-bundle'), data, format='json')
+
+    def _archive(self, response):
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        return archive
+
+    def test_bundle_by_ids(self):
+        archive = self._archive(self._bundle({'ids': [self.second.pk, self.first.pk]}))
+        self.assertEqual(archive.namelist(), [
+            f'memoria_{self.first.pk}_primera-memoria.pdf', f'memoria_{self.second.pk}_segunda.pdf',
+        ])
+        self.assertEqual(archive.read(archive.namelist()[0]), b'%PDF-1.4 uno')
+
+    def test_bundle_by_filters(self):
+        archive = self._archive(self._bundle({'filters': {'carrera': 'AP'}}))
+        self.assertEqual(archive.namelist(), [f'memoria_{self.second.pk}_segunda.pdf'])
+
+    def test_missing_files_are_listed(self):
+        self.first.loc_disco.storage.delete(self.first.loc_disco.name)
+        archive = self._archive(self._bundle({'ids': [self.first.pk, self.second.pk]}))
+        self.assertEqual(archive.namelist(), [f'memoria_{self.second.pk}_segunda.pdf', 'FALTANTES.txt'])
+        self.assertIn(f'memoria_{self.first.pk}_primera-memoria.pdf', archive.read('FALTANTES.txt').decode())
+
+    def test_limits_and_validation(self):
+        with self.settings(MEMORIAS_BUNDLE_MAX_ITEMS=1):
+            self.assertEqual(self._bundle({'ids': [self.first.pk, self.second.pk]}).status_code, 400)
+        self.assertEqual(self._bundle({'ids': [999]}).status_code, 404)
+        self.assertEqual(self._bundle({'ids': ['1']}).status_code, 400)
+        self.assertEqual(self._bundle({}).status_code, 400)
+        self.assertEqual(self._bundle({'filters': {'carrera': 'NOEXISTE'}}).status_code, 400)
+
+
+class ExportMemoriesTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = _memoria(b'uno', titulo='Con estudiantes', carrera='INGINFO')
+        for rut, nombre in (('12345678-5', 'Ana'), ('11111111-1', 'Luis')):
+            MemoriaDetalle.objects.create(
+                id_memo=self.first, rut_estudiante=rut, nombre_estudiante=nombre, apellido_estudiante='Pérez',
+            )
+        self.second = _memoria(b'dos', titulo='Sin estudiantes', carrera='AP')
+
+    def _export(self, **params):
+        url = reverse('export-memories')
+        response = self.client.post(url, params, format='json') if 'filters' in params else self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        # La consulta se hace al recorrer la respuesta, no al construirla
+        with self.assertNumQueries(1):
+            return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self._export())))
+        self.assertEqual([(row['id_memo'], row['nombre_estudiante']) for row in rows], [
+            (str(self.first.pk), 'Ana'), (str(self.first.pk), 'Luis'), (str(self.second.pk), ''),
+        ])
+        self.assertEqual(rows[0]['titulo'], 'Con estudiantes')
+        self.assertNotIn('loc_disco', rows[0])
+
+    def test_ndjson(self):
+        lines = [json.loads(line) for line in self._export(formato='ndjson').splitlines()]
+        self.assertEqual([line['id_memo'] for line in lines], [self.first.pk, self.second.pk])
+        self.assertEqual([d['nombre_estudiante'] for d in lines[0]['detalles']], ['Ana', 'Luis'])
+        self.assertEqual(lines[1]['detalles'], [])
+        self.assertEqual(lines[0]['fecha_inicio'], '2023-03-01')
+
+    def test_filters(self):
+        lines = self._export(formato='ndjson', filters={'carrera': 'AP'}).splitlines()
+        self.assertEqual([json.loads(line)['id_memo'] for line in lines], [self.second.pk])
+
+        response = self.client.post(reverse('export-memories'), {'filters': {'carrera': 'NOEXISTE'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('export-memories'), {'formato': 'xml'}).status_code, 400)
+
+    def test_single_query_regardless_of_size(self):
+        for index in range(20):
+            memoria = _memoria(f'extra {index}'.encode())
+            MemoriaDetalle.objects.create(
+                id_memo=memoria, rut_estudiante='12345678-5', nombre_estudiante='Ana', apellido_estudiante='Pérez',
+            )
+        self.assertEqual(len(self._export(formato='ndjson').splitlines()), 22)
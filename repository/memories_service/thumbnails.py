@@ -0,0 +1,168 @@
+"""
+Generación de miniaturas (derivados redimensionados) para imágenes subidas.
+
+Se usa desde `Memoria.imagen_display`. Al guardar una imagen nueva se programa la
+generación de los derivados en un pool de hilos, fuera del ciclo de la solicitud y
+sólo después del commit de la transacción. El servicio no depende del paquete
+`core` de gestión (que mantiene su propia versión para `Table.image`).
+
+Configuración (settings, todas opcionales):
+- THUMBNAIL_SIZES: dict {'clave': (ancho, alto)}. Por defecto sm=320 y md=640.
+- THUMBNAIL_FORMAT: 'WEBP' (por defecto) o 'JPEG'.
+- THUMBNAIL_QUALITY: calidad de compresión (por defecto 80).
+- THUMBNAIL_WORKERS: hilos del pool (por defecto 2).
+- THUMBNAIL_SYNC: si es True se generan en el mismo hilo (útil en tests).
+
+Los nombres de los derivados son deterministas (`<dir>/thumbs/<nombre>_<clave>.<ext>`).
+Al terminar, el worker entrega las claves generadas a `on_done` para que el modelo
+las registre (`Memoria.imagen_display_sizes`); `thumbnail_urls` arma las URLs sólo con
+ese registro, sin consultar el storage (en S3 cada `exists()` es un HEAD). Los
+tamaños no registrados (generación pendiente o fallida, imágenes subidas antes de
+las miniaturas) apuntan a la imagen original.
+"""
+
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {
+    'sm': (320, 320),
+    'md': (640, 640),
+}
+FORMAT_EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', DEFAULT_SIZES)
+
+
+def get_format():
+    fmt = str(getattr(settings, 'THUMBNAIL_FORMAT', 'WEBP')).upper()
+    return fmt if fmt in FORMAT_EXTENSIONS else 'WEBP'
+
+
+def thumbnail_name(name, size_key):
+    """Ruta del derivado `size_key` para la imagen almacenada como `name`."""
+    directory, filename = posixpath.split(name.replace('\\', '/'))
+    base = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'thumbs', f"{base}_{size_key}.{FORMAT_EXTENSIONS[get_format()]}")
+
+
+def missing_thumbnails(sizes):
+    """Claves configuradas que no figuran entre los tamaños generados `sizes`."""
+    generated = set(sizes or ())
+    return [size_key for size_key in get_sizes() if size_key not in generated]
+
+
+def thumbnail_urls(fieldfile, sizes, request=None):
+    """
+    Retorna {'clave': url} con las miniaturas de `fieldfile` (o {} si no hay imagen).
+    `sizes` son las claves ya generadas; las demás apuntan a la imagen original.
+    """
+    if not fieldfile:
+        return {}
+    storage = fieldfile.storage
+    missing = set(missing_thumbnails(sizes))
+    urls = {}
+    for size_key in get_sizes():
+        if size_key in missing:
+            url = storage.url(fieldfile.name)
+        else:
+            url = storage.url(thumbnail_name(fieldfile.name, size_key))
+        urls[size_key] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def generate_thumbnails(storage, name):
+    """
+    Genera (o regenera) todos los derivados de la imagen `name` en `storage` y
+    retorna la lista de claves generadas.
+    """
+    from PIL import Image, ImageOps
+
+    fmt = get_format()
+    quality = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    # Respetar la orientación EXIF de fotos tomadas con celular
+    original = ImageOps.exif_transpose(original)
+
+    for size_key, (width, height) in get_sizes().items():
+        image = original.copy()
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif fmt == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        output = io.BytesIO()
+        image.save(output, format=fmt, quality=quality)
+
+        target = thumbnail_name(name, size_key)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(output.getvalue()))
+
+    return list(get_sizes())
+
+
+def delete_thumbnails(storage, name):
+    """Elimina los derivados de la imagen `name` (si existen)."""
+    for size_key in get_sizes():
+        target = thumbnail_name(name, size_key)
+        try:
+            if storage.exists(target):
+                storage.delete(target)
+        except Exception:
+            logger.exception("No se pudo eliminar la miniatura %s", target)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _generate_safely(storage, name, on_done=None):
+    try:
+        sizes = generate_thumbnails(storage, name)
+        if on_done is not None:
+            on_done(sizes)
+    except Exception:
+        logger.exception("Error al generar miniaturas de %s", name)
+
+
+def schedule_thumbnails(storage, name, on_done=None):
+    """
+    Programa la generación de miniaturas de `name` tras el commit de la transacción
+    en curso (o inmediatamente si no hay transacción).
+
+    `on_done(sizes)` se llama después de generar los derivados con las claves
+    generadas, para que el modelo las registre.
+    """
+    if getattr(settings, 'THUMBNAIL_SYNC', False):
+        transaction.on_commit(lambda: _generate_safely(storage, name, on_done))
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_generate_safely, storage, name, on_done))
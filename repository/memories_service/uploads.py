@@ -0,0 +1,39 @@
+"""
+Manejadores de subida que calculan el hash del archivo mientras se recibe.
+
+Reemplazan a los manejadores por defecto de Django (ver `FILE_UPLOAD_HANDLERS`):
+cada archivo subido queda con el atributo `content_digest` (SHA-256 en hex), de
+modo que `Memoria.save` puede ubicar el blob correspondiente (`blobs.py`) sin
+volver a leer el archivo.
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadMixin:
+    def new_file(self, *args, **kwargs):
+        # Antes de super(): el manejador en memoria detiene la cadena con una excepción
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # El manejador en memoria se desactiva para archivos grandes: no hashear dos veces
+        if getattr(self, 'activated', True):
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_digest = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
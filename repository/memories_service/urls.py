@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import MemoriaViewSet
-from .api import DownloadMemoryView, MemoryDetailView, FilterMemoriesView
+from .api import DownloadMemoryView, MemoryDetailView, FilterMemoriesView, FacetMemoriesView, BundleDownloadView, ImportMemoriesView, ExportMemoriesView
 
 router = DefaultRouter()
 router.register(r'memories', MemoriaViewSet)
@@ -10,5 +10,9 @@ urlpatterns = [
     path('memos/', include(router.urls)),
     path('memos/<int:pk>/', MemoryDetailView.as_view(), name='memory-detail'),
     path('memos/download/<int:pk>/', DownloadMemoryView.as_view(), name='download-memory'),
+    path('memos/download/bundle/', BundleDownloadView.as_view(), name='download-bundle'),
     path('memos/filter/', FilterMemoriesView.as_view(), name='filter-memories'),
+    path('memos/facets/', FacetMemoriesView.as_view(), name='facet-memories'),
+    path('memos/import/', ImportMemoriesView.as_view(), name='import-memories'),
+    path('memos/export/', ExportMemoriesView.as_view(), name='export-memories'),
 ]
\ No newline at end of file
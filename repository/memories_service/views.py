@@ -4,7 +4,10 @@ from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from .models import Memoria, MemoriaDetalle
+from django.db import transaction
 from .serializers import MemoriaSerializer, MemoriaDetalleSerializer
+from .cache import cached_memoria_payload
+from .detalles import DETALLES_MODES, bulk_create_detalles, resolve_detalles_mode, validate_detalles
 import json
 
 
@@ -20,6 +23,7 @@ class MemoriaViewSet(viewsets.ModelViewSet):
     - PATCH /memories/{id}/ : Actualizar parcialmente una memoria
     - DELETE /memories/{id}/ : Eliminar una memoria y sus detalles
     - POST /memories/{id}/add_detalle/ : Agregar un detalle a una memoria
+    - POST /memories/{id}/add_detalles/ : Agregar varios detalles en bloque
     - PUT /memories/{id}/update_detalle/{detalle_id}/ : Actualizar un detalle
     - DELETE /memories/{id}/delete_detalle/{detalle_id}/ : Eliminar un detalle
     - GET /memories/{id}/detalles/ : Obtener todos los detalles de una memoria
@@ -30,6 +34,11 @@ class MemoriaViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         """
         Crea una nueva memoria con opción de incluir detalles en la misma solicitud.
+
+        Todos los detalles se validan antes de guardar y se insertan en bloque,
+        dentro de la misma transacción que la memoria. Con `detalles_mode`
+        ("atomic" o "partial", por defecto `settings.MEMORIAS_DETALLES_MODE`) se
+        elige si un detalle inválido cancela todo o sólo se omite.
         
         Payload esperado (SIN detalles):
         {
@@ -80,42 +89,44 @@ class MemoriaViewSet(viewsets.ModelViewSet):
         detalles_data = self._extract_and_parse_detalles(request.data.pop('detalles', []))
         if isinstance(detalles_data, Response):
             return detalles_data
+
+        mode = resolve_detalles_mode(request.data.pop('detalles_mode', None))
+        if mode is None:
+            return Response(
+                {"error": f"El campo 'detalles_mode' debe ser uno de: {', '.join(DETALLES_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Crear la memoria
+        # Validar la memoria y todos los detalles antes de escribir nada
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        memoria = serializer.save()
-        
-        # Crear los detalles si se proporcionaron
-        detalles_creados = []
-        detalles_errores = []
-        
-        for idx, detalle_data in enumerate(detalles_data):
-            # Hacer una copia para no modificar el original
-            if isinstance(detalle_data, dict):
-                detalle_data = detalle_data.copy()
-            else:
-                detalles_errores.append({
-                    "index": idx,
-                    "errores": {"detalle": "El detalle debe ser un objeto JSON."}
-                })
-                continue
-            
-            detalle_data['id_memo'] = memoria.id_memo
-            detalle_serializer = MemoriaDetalleSerializer(data=detalle_data)
-            
-            if detalle_serializer.is_valid():
-                detalle_serializer.save()
-                detalles_creados.append(detalle_serializer.data)
-            else:
-                detalles_errores.append({
-                    "index": idx,
-                    "errores": detalle_serializer.errors
-                })
+        detalles_validos, detalles_errores = validate_detalles(detalles_data)
+
+        if detalles_errores and mode == 'atomic':
+            return Response(
+                {
+                    "error": "Hay detalles con errores; no se creó la memoria.",
+                    "detalles_con_errores": detalles_errores
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Crear la memoria y sus detalles en una sola transacción
+        memoria = None
+        try:
+            with transaction.atomic():
+                memoria = serializer.save()
+                detalles = bulk_create_detalles(memoria, detalles_validos)
+        except Exception:
+            # La transacción se revirtió: no dejar huérfanos los blobs nuevos de esta memoria
+            if memoria is not None:
+                for storage, name in getattr(memoria, '_new_blob_files', []):
+                    storage.delete(name)
+            raise
         
         # Preparar respuesta
         response_data = serializer.data
-        response_data['detalles_creados'] = detalles_creados
+        response_data['detalles_creados'] = MemoriaDetalleSerializer(detalles, many=True).data
         
         if detalles_errores:
             response_data['detalles_con_errores'] = detalles_errores
@@ -140,7 +151,7 @@ class MemoriaViewSet(viewsets.ModelViewSet):
             return []
         
         # Caso 1: Si es una lista con un string adentro (QueryDict behavior)
-        if isinstance(detalles_raw, list) and len(detalles_raw) > 0:
+        if isinstance(detalles_raw, list) and len(detalles_raw) == 1 and isinstance(detalles_raw[0], str):
             detalles_raw = detalles_raw[0]
         
         # Caso 2: Si es un string, parsearlo como JSON
@@ -164,6 +175,20 @@ class MemoriaViewSet(viewsets.ModelViewSet):
         
         return detalles_data
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Obtiene una memoria. La representación se guarda en la caché de lectura
+        de memorias y se invalida al modificar la memoria o sus detalles.
+        """
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        data = cached_memoria_payload(
+            'retrieve',
+            pk,
+            lambda: dict(self.get_serializer(self.get_object()).data),
+            variant=request.build_absolute_uri('/'),
+        )
+        return Response(data)
+
     def update(self, request, *args, **kwargs):
         """
         Actualiza una memoria existente (reemplaza todos los campos).
@@ -194,15 +219,17 @@ class MemoriaViewSet(viewsets.ModelViewSet):
         
         GET /memories/{id}/detalles/
         """
-        memoria = self.get_object()
-        detalles = memoria.detalles.all()
-        serializer = MemoriaDetalleSerializer(detalles, many=True)
-        return Response({
-            "memoria_id": memoria.id_memo,
-            "titulo": memoria.titulo,
-            "total_detalles": detalles.count(),
-            "detalles": serializer.data
-        }, status=status.HTTP_200_OK)
+        def build():
+            memoria = self.get_object()
+            detalles = list(MemoriaDetalleSerializer(memoria.detalles.all(), many=True).data)
+            return {
+                "memoria_id": memoria.id_memo,
+                "titulo": memoria.titulo,
+                "total_detalles": len(detalles),
+                "detalles": detalles
+            }
+
+        return Response(cached_memoria_payload('detalles', pk, build), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], url_path='add_detalle')
     def add_detalle(self, request, pk=None):
@@ -238,6 +265,65 @@ class MemoriaViewSet(viewsets.ModelViewSet):
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'], url_path='add_detalles')
+    def add_detalles(self, request, pk=None):
+        """
+        Agrega varios detalles a una memoria existente con un único INSERT.
+        
+        POST /memories/{id}/add_detalles/
+        
+        Payload esperado (lista directa o dentro de "detalles"):
+        {
+            "detalles": [
+                {
+                    "rut_estudiante": "XX.XXX.XXX-X",
+                    "nombre_estudiante": "string",
+                    "apellido_estudiante": "string",
+                    ...
+                },
+                ...
+            ],
+            "detalles_mode": "atomic | partial (opcional)"
+        }
+        """
+        memoria = self.get_object()
+
+        if isinstance(request.data, list):
+            detalles_raw, mode_raw = request.data, None
+        else:
+            detalles_raw, mode_raw = request.data.get('detalles', []), request.data.get('detalles_mode')
+
+        detalles_data = self._extract_and_parse_detalles(detalles_raw)
+        if isinstance(detalles_data, Response):
+            return detalles_data
+        if not detalles_data:
+            return Response({"error": "Debe proporcionar al menos un detalle."}, status=status.HTTP_400_BAD_REQUEST)
+
+        mode = resolve_detalles_mode(mode_raw)
+        if mode is None:
+            return Response(
+                {"error": f"El campo 'detalles_mode' debe ser uno de: {', '.join(DETALLES_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        detalles_validos, detalles_errores = validate_detalles(detalles_data)
+        if detalles_errores and (mode == 'atomic' or not detalles_validos):
+            return Response(
+                {"error": "Hay detalles con errores; no se agregó ninguno.", "detalles_con_errores": detalles_errores},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            detalles = bulk_create_detalles(memoria, detalles_validos)
+
+        response_data = {
+            "message": f"{len(detalles)} detalle(s) agregado(s) exitosamente.",
+            "detalles_creados": MemoriaDetalleSerializer(detalles, many=True).data,
+        }
+        if detalles_errores:
+            response_data['detalles_con_errores'] = detalles_errores
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['put', 'patch'], url_path=r'update_detalle/(?P<detalle_id>\d+)')
     def update_detalle(self, request, pk=None, detalle_id=None):
         """
@@ -83,4 +83,60 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-STATIC_URL = '/static/'
\ No newline at end of file
+STATIC_URL = '/static/'
+
+# Entrega de archivos de memorias (ver memories_service/delivery.py):
+# 'auto' (URL prefirmada en S3, streaming en local), 'stream', 'x-accel' (nginx),
+# 'x-sendfile' (Apache/lighttpd) o 'presigned' (S3)
+MEMORIAS_DELIVERY_BACKEND = os.environ.get('MEMORIAS_DELIVERY_BACKEND', 'auto')
+# Location `internal` de nginx que apunta a MEDIA_ROOT (backend 'x-accel')
+MEMORIAS_ACCEL_REDIRECT_PREFIX = os.environ.get('MEMORIAS_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Vigencia en segundos de las URLs prefirmadas de S3 (backend 'presigned')
+MEMORIAS_PRESIGNED_URL_EXPIRE = int(os.environ.get('MEMORIAS_PRESIGNED_URL_EXPIRE', 300))
+# Máximo de memorias por paquete ZIP (/api/memos/download/bundle/)
+MEMORIAS_BUNDLE_MAX_ITEMS = int(os.environ.get('MEMORIAS_BUNDLE_MAX_ITEMS', 500))
+
+# Miniaturas de imágenes subidas (ver memories_service/thumbnails.py)
+THUMBNAIL_SIZES = {
+    'sm': (320, 320),
+    'md': (640, 640),
+}
+THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'WEBP')
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Creación de detalles en bloque (ver memories_service/detalles.py):
+# 'partial' crea los detalles válidos e informa los inválidos; 'atomic' no crea nada si alguno falla
+MEMORIAS_DETALLES_MODE = os.environ.get('MEMORIAS_DETALLES_MODE', 'partial')
+
+# Importación masiva de memorias (ver memories_service/importer.py)
+MEMORIAS_IMPORT_BATCH_SIZE = int(os.environ.get('MEMORIAS_IMPORT_BATCH_SIZE', 200))
+MEMORIAS_IMPORT_WORKERS = int(os.environ.get('MEMORIAS_IMPORT_WORKERS', 4))
+
+# Las subidas calculan el SHA-256 de cada archivo mientras se reciben, para
+# almacenar los archivos de memorias por contenido (ver memories_service/blobs.py)
+FILE_UPLOAD_HANDLERS = [
+    'memories_service.uploads.HashingMemoryFileUploadHandler',
+    'memories_service.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Caché de Django. Por defecto cada proceso tiene la suya (LocMemCache): las
+# invalidaciones hechas por otros procesos (otros workers, `import_memorias`,
+# `generate_memorias`) no la alcanzan y las respuestas del catálogo pueden quedar
+# desactualizadas hasta MEMORIAS_CACHE['CATALOG_TIMEOUT'] segundos. Con un backend
+# compartido (p. ej. 'django.core.cache.backends.redis.RedisCache') se ven de inmediato.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
+# Caché de lectura de las representaciones de memorias (ver memories_service/cache.py):
+# 'local' = LRU en memoria de cada proceso; 'django' = alias de CACHES compartido
+MEMORIAS_CACHE = {
+    'BACKEND': os.environ.get('MEMORIAS_CACHE_BACKEND', 'local'),
+    'MAX_ENTRIES': int(os.environ.get('MEMORIAS_CACHE_MAX_ENTRIES', 1024)),
+    'ALIAS': os.environ.get('MEMORIAS_CACHE_ALIAS', 'default'),
+    # Vigencia (segundos) de las respuestas agregadas del catálogo si CACHES no es compartida
+    'CATALOG_TIMEOUT': int(os.environ.get('MEMORIAS_CATALOG_CACHE_TIMEOUT', 60)),
+}
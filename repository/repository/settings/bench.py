@@ -0,0 +1,33 @@
+from .base import *
+
+# Configuración para `manage.py benchmark_memorias` / `generate_memorias`.
+# Usa SQLite salvo que se definan las variables BENCH_DB_* (PostgreSQL).
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+if os.environ.get('BENCH_DB_NAME'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['BENCH_DB_NAME'],
+            'USER': os.environ.get('BENCH_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BENCH_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('BENCH_DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'bench.sqlite3',
+        }
+    }
+
+STATIC_URL = 'static/'
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'bench_media'
+
+# Miniaturas en el mismo hilo: el benchmark no debe dejar trabajo en segundo plano
+THUMBNAIL_SYNC = True
@@ -37,4 +37,8 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
-}
\ No newline at end of file
+}
+
+# Con S3, MEMORIAS_DELIVERY_BACKEND='auto' responde las descargas con una redirección
+# a una URL prefirmada: el api_gateway la entrega al cliente sin seguirla y S3 atiende
+# la transferencia (incluidos los rangos).
@@ -1 +1,5 @@
 from django.contrib import admin
+from .models import OutboxMessage
+
+
+admin.site.register(OutboxMessage)
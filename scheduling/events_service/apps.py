@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EventsServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events_service'
+
+    def ready(self):
+        # Registrar las señales que mantienen el índice de calendario
+        from . import signals  # noqa: F401
@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.conflicts import EventConflict, check_conflicts
+from core.models import Event, EventSpace, StatusEvent, Workspace
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo de la detección de choques al crear eventos, con N eventos "
+        "existentes por espacio. Los datos se generan en una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000', help="Eventos existentes por espacio, separados por coma.")
+        parser.add_argument('--repeat', type=int, default=50, help="Mediciones por tamaño.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        except ValueError:
+            raise CommandError("--sizes debe ser una lista de enteros separados por coma.")
+        workspace_ids = list(Workspace.objects.values_list('id_workspace', flat=True)[:6])
+        if not workspace_ids:
+            raise CommandError("Se necesita al menos un espacio creado.")
+
+        rng = random.Random(options['seed'])
+        repeat = max(1, options['repeat'])
+        self.stdout.write(f"{'eventos':>8}  {'check p50 ms':>12} {'check p95 ms':>12} {'create p50 ms':>13} {'consultas':>9}")
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(f"bench-{time.time_ns()}")
+                base = timezone.now() + timedelta(days=1)
+                existing = 0
+                for size in sizes:
+                    self._generate(user, workspace_ids, base, existing, size)
+                    existing = size
+                    row = self._measure(user, workspace_ids, base, size, rng, repeat)
+                    self.stdout.write(
+                        f"{size:>8}  {row['check_p50']:>12} {row['check_p95']:>12} {row['create_p50']:>13} {row['queries']:>9}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _generate(self, user, workspace_ids, base, start_index, size):
+        """Eventos de una hora cada dos horas en cada espacio (sin choques entre ellos)."""
+        for index in range(start_index, size):
+            start = base + timedelta(hours=2 * index)
+            events = Event.objects.bulk_create([
+                Event(title=f"Bench {index}", start_datetime=start, end_datetime=start + timedelta(hours=1),
+                      created_by=user, status=StatusEvent.CONFIRMED)
+                for _ in workspace_ids
+            ])
+            EventSpace.objects.bulk_create([
+                EventSpace(event=event, workspace_id=workspace_id) for event, workspace_id in zip(events, workspace_ids)
+            ])
+
+    def _measure(self, user, workspace_ids, base, size, rng, repeat):
+        checks, creates, queries = [], [], 0
+        client = Client()
+        for _ in range(repeat):
+            # Intervalo libre (entre dos eventos) en un espacio al azar
+            start = base + timedelta(hours=2 * rng.randrange(size) + 1, minutes=10)
+            end = start + timedelta(minutes=40)
+            workspace_id = rng.choice(workspace_ids)
+
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                try:
+                    check_conflicts([workspace_id], start, end)
+                except EventConflict:
+                    raise CommandError("Se encontró un choque en un intervalo libre.")
+                checks.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(ctx.captured_queries))
+
+            started = time.perf_counter()
+            response = client.post(reverse('event-list'), {
+                'title': 'Bench', 'created_by': user.pk,
+                'start_datetime': timezone.localtime(start).strftime('%Y-%m-%dT%H:%M:%S'),
+                'end_datetime': timezone.localtime(end).strftime('%Y-%m-%dT%H:%M:%S'),
+                'detail': {'attendees': 1}, 'spaces': [workspace_id],
+            }, content_type='application/json')
+            creates.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 201:
+                raise CommandError(f"La creación respondió {response.status_code}: {response.content[:200]!r}")
+            # Liberar el intervalo para las siguientes mediciones
+            Event.objects.filter(pk=response.json()['id_event']).delete()
+
+        checks.sort()
+        return {
+            'check_p50': round(statistics.median(checks), 3),
+            'check_p95': round(checks[min(len(checks) - 1, int(len(checks) * 0.95))], 3),
+            'create_p50': round(statistics.median(creates), 2),
+            'queries': queries,
+        }
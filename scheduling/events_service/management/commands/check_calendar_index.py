@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events_service.services.calendar_index import get_calendar_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga el índice de calendario y lo compara con la base de datos. "
+        "Termina con error si hay diferencias."
+    )
+
+    def handle(self, *args, **options):
+        index = get_calendar_index()
+        if index is None:
+            raise CommandError("El índice de calendario está deshabilitado (SCHEDULING_CALENDAR_INDEX).")
+
+        report = index.verify()
+        for key, event_ids in report.items():
+            self.stdout.write(f"{key}: {len(event_ids)}" + (f" {event_ids[:20]}" if event_ids else ""))
+        if any(report.values()):
+            raise CommandError("El índice no coincide con la base de datos.")
+        self.stdout.write(self.style.SUCCESS("El índice coincide con la base de datos."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events_service.services.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los mensajes pendientes del outbox (formularios de invitación) con "
+        "reintentos y espera exponencial. Sin --once se queda consultando cada --interval segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Procesar los mensajes vencidos y terminar.")
+        parser.add_argument('--interval', type=float, default=5, help="Segundos entre consultas cuando no hay mensajes.")
+        parser.add_argument('--batch-size', type=int, help="Mensajes por lote (por defecto SCHEDULING_OUTBOX['BATCH_SIZE']).")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = process_outbox(limit=options['batch_size'])
+            handled = sum(counts.values())
+            if handled:
+                self.stdout.write(
+                    f"procesados={counts['procesados']} reintentos={counts['reintentos']} fallidos={counts['fallidos']}"
+                )
+            if options['once']:
+                # Seguir mientras haya lotes completos vencidos
+                if handled:
+                    continue
+                return
+            if not handled:
+                time.sleep(options['interval'])
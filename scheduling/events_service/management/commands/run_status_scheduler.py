@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import StatusEvent
+from events_service.services.status_scheduler import StatusScheduler, catch_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica automáticamente las transiciones de estado de los eventos (en curso y "
+        "realizado) según su horario. Con --catch-up aplica lo vencido y termina."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catch-up', action='store_true', help="Aplicar las transiciones vencidas y terminar.")
+
+    def handle(self, *args, **options):
+        if options['catch_up']:
+            applied = catch_up()
+            self.stdout.write(
+                f"en curso={len(applied[StatusEvent.IN_COURSE])} realizados={len(applied[StatusEvent.COMPLETED])}"
+            )
+            return
+        StatusScheduler().run_forever()
@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+from core.models import Event
+from core.models.__base__ import BaseModel
+
+
+class OutboxStatus(models.IntegerChoices):
+    PENDING = 0, 'Pendiente'
+    DONE = 1, 'Procesado'
+    FAILED = 2, 'Fallido'
+
+
+class OutboxMessage(BaseModel, models.Model):
+    """
+    Tarea pendiente hacia un servicio externo, escrita en la misma transacción que
+    el cambio que la origina y procesada por `process_outbox` (ver `services/outbox.py`).
+    """
+    INVITATION_FORM = 'invitation_form'
+    KIND_CHOICES = [
+        (INVITATION_FORM, 'Formulario de invitación'),
+    ]
+
+    id_message = models.BigAutoField(primary_key=True, db_column='id_mensaje')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, db_column='tipo', verbose_name='Tipo')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='outbox_messages', db_column='evento')
+    payload = models.JSONField(default=dict, blank=True, db_column='datos')
+    status = models.IntegerField(choices=OutboxStatus.choices, default=OutboxStatus.PENDING, db_column='estado', verbose_name='Estado')
+    attempts = models.PositiveIntegerField(default=0, db_column='intentos', verbose_name='Intentos')
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_column='proximo_intento', verbose_name='Próximo intento')
+    last_error = models.TextField(blank=True, db_column='ultimo_error', verbose_name='Último error')
+
+    class Meta:
+        db_table = 'outbox_eventos'
+        verbose_name = 'Mensaje pendiente'
+        verbose_name_plural = 'Mensajes pendientes'
+        indexes = [
+            # Selección de mensajes vencidos por el worker
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_estado_intento_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} del evento {self.event_id} ({self.get_status_display()})"
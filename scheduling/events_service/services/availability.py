@@ -0,0 +1,143 @@
+"""
+Cálculo de disponibilidad (huecos libres) de los espacios de trabajo.
+
+Los intervalos ocupados salen del índice de calendario del proceso
+(`calendar_index.py`, que incorpora los cambios de otros procesos cada
+`SCHEDULING_CALENDAR_INDEX['SYNC']` segundos) o, si está deshabilitado, de una
+sola consulta sobre `EventSpace` (eventos en estado activo que se cruzan con el
+rango), ya ordenados por espacio y hora de inicio, más las ocurrencias de las
+series recurrentes dentro del rango (ver `core/recurrence.py`). Para cada espacio se fusionan los intervalos solapados y se
+restan de las ventanas de atención de cada día, recorriendo ambas listas en
+paralelo: el costo es lineal en la cantidad de eventos y días del rango.
+"""
+
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import ACTIVE_STATUSES, Event, EventSpace
+from core.recurrence import expand_event, load_exceptions, window_filter
+
+from .calendar_index import get_calendar_index
+
+
+DEFAULT_OPENING_HOURS = ('08:00', '22:00')
+
+
+def get_opening_hours():
+    """Horario de atención por defecto (`SCHEDULING_OPENING_HOURS`) como (time, time)."""
+    opening, closing = getattr(settings, 'SCHEDULING_OPENING_HOURS', DEFAULT_OPENING_HOURS)
+    return time.fromisoformat(opening), time.fromisoformat(closing)
+
+
+def busy_intervals(workspace_ids, start, end):
+    """
+    Retorna {workspace_id: [(inicio, término), ...]} con los eventos activos que se
+    cruzan con [start, end), ordenados por inicio.
+    """
+    index = get_calendar_index()
+    if index is not None:
+        return {
+            workspace_id: [(event_start, event_end) for event_start, event_end, _ in items]
+            for workspace_id, items in index.overlapping(workspace_ids, start, end).items()
+        }
+
+    rows = (
+        EventSpace.objects
+        .filter(workspace_id__in=workspace_ids, event__status__in=ACTIVE_STATUSES)
+        .filter(window_filter(start, end, prefix='event__'))
+        .order_by('workspace_id', 'event__start_datetime')
+        .values_list('workspace_id', 'event__start_datetime', 'event__end_datetime', 'event__recurrence', 'event_id')
+    )
+    busy = {workspace_id: [] for workspace_id in workspace_ids}
+    series = {}
+    for workspace_id, group in groupby(rows, key=lambda row: row[0]):
+        for _, event_start, event_end, recurrence_id, event_id in group:
+            if recurrence_id is None:
+                busy[workspace_id].append((event_start, event_end))
+            else:
+                series.setdefault(event_id, []).append(workspace_id)
+
+    if series:
+        # Las series se expanden sólo dentro del rango (dos consultas más, sólo si hay series)
+        events = Event.objects.filter(pk__in=series).select_related('recurrence')
+        for event in load_exceptions(list(events)):
+            occurrences = [(occurrence.start, occurrence.end) for occurrence in expand_event(event, start, end)]
+            for workspace_id in series[event.pk]:
+                busy[workspace_id] = sorted(busy[workspace_id] + occurrences)
+    return busy
+
+
+def merge_intervals(intervals):
+    """Fusiona intervalos ordenados por inicio que se solapan o se tocan."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def opening_windows(start, end, opening, closing, weekdays=None):
+    """
+    Ventanas de atención [apertura, cierre) de cada día entre `start` y `end`
+    (recortadas al rango), en la zona horaria del proyecto. `weekdays` limita
+    los días (0 = lunes); None incluye todos.
+    """
+    windows = []
+    day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end).date()
+    while day <= last_day:
+        if weekdays is None or day.weekday() in weekdays:
+            window_start = max(timezone.make_aware(datetime.combine(day, opening)), start)
+            window_end = min(timezone.make_aware(datetime.combine(day, closing)), end)
+            if window_start < window_end:
+                windows.append((window_start, window_end))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_slots(busy, windows, min_duration):
+    """
+    Resta los intervalos ocupados (fusionados y ordenados) de las ventanas de
+    atención y retorna los huecos de al menos `min_duration`.
+    """
+    slots = []
+    index = 0
+    for window_start, window_end in windows:
+        # Descartar ocupaciones que terminan antes de la ventana
+        while index < len(busy) and busy[index][1] <= window_start:
+            index += 1
+        cursor = window_start
+        position = index
+        while position < len(busy) and busy[position][0] < window_end:
+            busy_start, busy_end = busy[position]
+            if busy_start - cursor >= min_duration:
+                slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            position += 1
+        if window_end - cursor >= min_duration:
+            slots.append((cursor, window_end))
+    return slots
+
+
+def find_availability(workspace_ids, start, end, min_duration, opening=None, closing=None, weekdays=None):
+    """
+    Retorna {workspace_id: [(inicio, término), ...]} con los huecos libres de cada
+    espacio dentro de `[start, end)` y del horario de atención.
+    """
+    if opening is None or closing is None:
+        default_opening, default_closing = get_opening_hours()
+        opening = opening or default_opening
+        closing = closing or default_closing
+
+    windows = opening_windows(start, end, opening, closing, weekdays)
+    busy = busy_intervals(workspace_ids, start, end)
+    return {
+        workspace_id: free_slots(merge_intervals(intervals), windows, min_duration)
+        for workspace_id, intervals in busy.items()
+    }
@@ -0,0 +1,467 @@
+"""
+Índice en memoria de la ocupación de cada espacio de trabajo.
+
+Por cada `Workspace` se mantiene un árbol de intervalos (AVL aumentado con el
+término máximo de cada subárbol) con los eventos en estado activo
+(`ACTIVE_STATUSES`). Las consultas de cruce con un rango y de ocupación en un
+instante recorren sólo las ramas que pueden contener resultados: O(log n + k)
+cuando los eventos de un espacio no se solapan entre sí (lo que garantiza la
+detección de choques), y como máximo O(k log n) en general.
+
+Ciclo de vida:
+
+- Se carga de forma diferida en la primera consulta del proceso (una sola
+  consulta sobre `EventSpace`, y dos más si hay series), no en `AppConfig.ready`, donde Django
+  desaconseja acceder a la base de datos.
+- Las señales de `Event` y `EventSpace` (ver `events_service/signals.py`)
+  actualizan el evento afectado al confirmarse la transacción.
+- Los cambios hechos por otros procesos (otros workers o el servicio de
+  gestión) no emiten señales aquí. Antes de responder, si pasaron más de
+  `SCHEDULING_CALENDAR_INDEX['SYNC']` segundos desde la última revisión, se
+  buscan los eventos con `updated_at` posterior a la última marca (índice
+  `evento_actualizado_idx`) y se actualizan sólo esos. Las eliminaciones hechas
+  por otros procesos no cambian ningún `updated_at`: para ellas (y como respaldo)
+  el índice se recarga completo cuando su antigüedad supera
+  `SCHEDULING_CALENDAR_INDEX['TTL']` segundos.
+- `verify()` compara el índice con la base de datos (comando
+  `check_calendar_index`).
+
+Las series recurrentes no se guardan ocurrencia por ocurrencia: se guarda la
+serie (regla y excepciones) con sus espacios y se expande en cada consulta,
+sólo dentro del rango consultado (ver `core/recurrence.py`).
+
+Alcance: el índice sólo responde la ocupación por espacio de la disponibilidad
+(`availability.busy_intervals`). La detección de choques al escribir
+(`core.conflicts`) sigue consultando la base de datos, que es la única que puede
+bloquear los espacios dentro de la transacción. `get_future_activity` y
+`get_scheduled_events` también siguen en SQL: devuelven eventos en cualquier
+estado (no sólo los activos), con todos sus campos y paginados por cursor, o sin
+filtrar por espacio, y el índice sólo guarda intervalos activos por espacio.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import ACTIVE_STATUSES, Event, EventSpace
+from core.recurrence import expand_event, load_exceptions
+
+
+DEFAULT_CALENDAR_INDEX = {'ENABLED': True, 'TTL': 60, 'SYNC': 2}
+# Más cambios que esto en una revisión: conviene recargar el índice completo
+SYNC_RELOAD_THRESHOLD = 100
+
+
+# ---------------------------------------------------------------------------
+# Árbol de intervalos
+# ---------------------------------------------------------------------------
+
+class _Node:
+    __slots__ = ('key', 'max_end', 'height', 'left', 'right')
+
+    def __init__(self, key):
+        # key = (inicio, término, id_evento): ordena por inicio y desempata por evento
+        self.key = key
+        self.max_end = key[1]
+        self.height = 1
+        self.left = None
+        self.right = None
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _update(node):
+    node.height = 1 + max(_height(node.left), _height(node.right))
+    node.max_end = node.key[1]
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _rotate_right(node):
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rotate_left(node):
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rebalance(node):
+    _update(node)
+    balance = _height(node.left) - _height(node.right)
+    if balance > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if balance < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+
+def _insert(node, key):
+    if node is None:
+        return _Node(key)
+    if key < node.key:
+        node.left = _insert(node.left, key)
+    elif key > node.key:
+        node.right = _insert(node.right, key)
+    else:
+        return node
+    return _rebalance(node)
+
+
+def _pop_min(node):
+    """Retorna (subárbol sin su mínimo, nodo mínimo)."""
+    if node.left is None:
+        return node.right, node
+    node.left, smallest = _pop_min(node.left)
+    return _rebalance(node), smallest
+
+
+def _delete(node, key):
+    if node is None:
+        return None
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    elif key > node.key:
+        node.right = _delete(node.right, key)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        right, successor = _pop_min(node.right)
+        successor.left, successor.right = node.left, right
+        node = successor
+    return _rebalance(node)
+
+
+def _build(keys, low, high):
+    """Árbol balanceado a partir de claves ordenadas, en O(n)."""
+    if low >= high:
+        return None
+    middle = (low + high) // 2
+    node = _Node(keys[middle])
+    node.left = _build(keys, low, middle)
+    node.right = _build(keys, middle + 1, high)
+    _update(node)
+    return node
+
+
+class IntervalTree:
+    """Conjunto de intervalos [inicio, término) identificados por evento."""
+
+    def __init__(self, keys=()):
+        keys = sorted(set(keys))
+        self._root = _build(keys, 0, len(keys))
+        self._size = len(keys)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, start, end, event_id):
+        key = (start, end, event_id)
+        if not self._find(key):
+            self._root = _insert(self._root, key)
+            self._size += 1
+
+    def remove(self, start, end, event_id):
+        key = (start, end, event_id)
+        if self._find(key):
+            self._root = _delete(self._root, key)
+            self._size -= 1
+
+    def _find(self, key):
+        node = self._root
+        while node is not None:
+            if key == node.key:
+                return True
+            node = node.left if key < node.key else node.right
+        return False
+
+    def overlapping(self, start, end):
+        """Intervalos que se cruzan con [start, end), ordenados por inicio."""
+        result = []
+        self._search(self._root, start, lambda node_start: node_start < end, result)
+        return result
+
+    def at(self, moment):
+        """Intervalos que contienen el instante `moment`."""
+        result = []
+        self._search(self._root, moment, lambda node_start: node_start <= moment, result)
+        return result
+
+    def _search(self, node, start, starts_before, result):
+        # Poda: ningún intervalo del subárbol termina después de `start`
+        while node is not None and node.max_end > start:
+            self._search(node.left, start, starts_before, result)
+            if not starts_before(node.key[0]):
+                # Todo el subárbol derecho empieza aún más tarde
+                return
+            if node.key[1] > start:
+                result.append(node.key)
+            node = node.right
+
+    def __iter__(self):
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key
+            node = node.right
+
+
+# ---------------------------------------------------------------------------
+# Índice por espacio
+# ---------------------------------------------------------------------------
+
+def _active_rows(**filters):
+    return (
+        EventSpace.objects
+        .filter(event__status__in=ACTIVE_STATUSES, **filters)
+        .values_list('event_id', 'workspace_id', 'event__start_datetime', 'event__end_datetime', 'event__recurrence')
+    )
+
+
+def _group_rows(rows):
+    """
+    ({id_evento: (inicio, término, frozenset(espacios))}, {id_serie: frozenset(espacios)})
+    a partir de filas de `_active_rows`: eventos simples y series por separado.
+    """
+    events = {}
+    series = {}
+    for event_id, workspace_id, start, end, recurrence_id in rows:
+        if recurrence_id is not None:
+            series[event_id] = series.get(event_id, frozenset()) | {workspace_id}
+            continue
+        _, _, workspaces = events.get(event_id, (start, end, frozenset()))
+        events[event_id] = (start, end, workspaces | {workspace_id})
+    return events, series
+
+
+def _load_series(series):
+    """{id_evento: (serie, espacios)} con regla y excepciones, para los ids de `series` ({id: espacios})."""
+    if not series:
+        return {}
+    events = list(Event.objects.filter(pk__in=series).select_related('recurrence'))
+    load_exceptions(events)
+    return {event.pk: (event, series[event.pk]) for event in events}
+
+
+def _series_version(entry):
+    event, workspaces = entry
+    return event.updated_at, workspaces
+
+
+class CalendarIndex:
+
+    def __init__(self, ttl=None, sync=None):
+        self.ttl = ttl
+        self.sync = sync
+        self._lock = threading.RLock()
+        self._trees = {}
+        self._events = {}
+        self._series = {}
+        self._loaded_at = None
+        self._synced_at = None
+        # `updated_at` más reciente ya incorporado
+        self._mark = None
+
+    def load(self):
+        """Reconstruye el índice completo (una consulta para eventos simples y tres para series)."""
+        mark = timezone.now()
+        events, series = _group_rows(_active_rows())
+        series = _load_series(series)
+        keys = {}
+        for event_id, (start, end, workspaces) in events.items():
+            for workspace_id in workspaces:
+                keys.setdefault(workspace_id, []).append((start, end, event_id))
+        trees = {workspace_id: IntervalTree(items) for workspace_id, items in keys.items()}
+        with self._lock:
+            self._events = events
+            self._series = series
+            self._trees = trees
+            self._loaded_at = self._synced_at = time.monotonic()
+            self._mark = mark
+
+    def clear(self):
+        with self._lock:
+            self._events = {}
+            self._series = {}
+            self._trees = {}
+            self._loaded_at = self._synced_at = None
+            self._mark = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        now = time.monotonic()
+        if loaded_at is None or (self.ttl is not None and now - loaded_at > self.ttl):
+            self.load()
+        elif self.sync is not None and now - self._synced_at > self.sync:
+            self.sync_changes()
+
+    def sync_changes(self):
+        """
+        Incorpora los eventos modificados por otros procesos desde la última marca
+        (una consulta, más las de `refresh_event` por cada evento cambiado).
+        """
+        changed = list(
+            Event.objects.filter(updated_at__gt=self._mark)
+            .order_by('updated_at')
+            .values_list('pk', 'updated_at')[:SYNC_RELOAD_THRESHOLD + 1]
+        )
+        if len(changed) > SYNC_RELOAD_THRESHOLD:
+            self.load()
+            return
+        for event_id, _ in changed:
+            self.refresh_event(event_id)
+        with self._lock:
+            if changed:
+                self._mark = max(self._mark, changed[-1][1])
+            self._synced_at = time.monotonic()
+
+    def _discard(self, event_id):
+        self._series.pop(event_id, None)
+        entry = self._events.pop(event_id, None)
+        if entry is not None:
+            start, end, workspaces = entry
+            for workspace_id in workspaces:
+                tree = self._trees.get(workspace_id)
+                if tree is not None:
+                    tree.remove(start, end, event_id)
+
+    def refresh_event(self, event_id):
+        """Vuelve a leer un evento desde la base de datos (estado, horario y espacios)."""
+        if self._loaded_at is None:
+            # Aún no cargado: la carga completa lo incluirá
+            return
+        events, series = _group_rows(_active_rows(event_id=event_id))
+        entry = events.get(event_id)
+        series = _load_series(series).get(event_id)
+        with self._lock:
+            self._discard(event_id)
+            if series is not None:
+                self._series[event_id] = series
+            if entry is not None:
+                start, end, workspaces = entry
+                self._events[event_id] = entry
+                for workspace_id in workspaces:
+                    self._trees.setdefault(workspace_id, IntervalTree()).add(start, end, event_id)
+
+    def remove_event(self, event_id):
+        with self._lock:
+            self._discard(event_id)
+
+    def _add_occurrences(self, result, start, end):
+        """Agrega a `result` las ocurrencias de las series que se cruzan con [start, end)."""
+        for event, workspaces in self._series.values():
+            targets = workspaces.intersection(result)
+            if not targets:
+                continue
+            items = [(occurrence.start, occurrence.end, event.pk) for occurrence in expand_event(event, start, end)]
+            for workspace_id in targets:
+                result[workspace_id].extend(items)
+        for items in result.values():
+            items.sort()
+        return result
+
+    def overlapping(self, workspace_ids, start, end):
+        """{id_espacio: [(inicio, término, id_evento), ...]} de los eventos que se cruzan con [start, end)."""
+        self._ensure_loaded()
+        with self._lock:
+            result = {
+                workspace_id: self._trees[workspace_id].overlapping(start, end) if workspace_id in self._trees else []
+                for workspace_id in workspace_ids
+            }
+            return self._add_occurrences(result, start, end)
+
+    def at(self, workspace_ids, moment):
+        """{id_espacio: [(inicio, término, id_evento), ...]} de los eventos en curso en `moment`."""
+        self._ensure_loaded()
+        with self._lock:
+            result = {
+                workspace_id: self._trees[workspace_id].at(moment) if workspace_id in self._trees else []
+                for workspace_id in workspace_ids
+            }
+            return self._add_occurrences(result, moment, moment + timedelta(microseconds=1))
+
+    def verify(self):
+        """
+        Compara el índice con la base de datos. Retorna {"faltantes", "sobrantes",
+        "distintos"} con los ids de eventos en cada caso (listas vacías si coincide).
+        """
+        self._ensure_loaded()
+        expected, expected_series = _group_rows(_active_rows())
+        expected_series = {pk: _series_version(entry) for pk, entry in _load_series(expected_series).items()}
+        with self._lock:
+            actual = dict(self._events)
+            actual_series = {pk: _series_version(entry) for pk, entry in self._series.items()}
+            # Lo que efectivamente contienen los árboles, reconstruido por evento
+            indexed = {}
+            for workspace_id, tree in self._trees.items():
+                for start, end, event_id in tree:
+                    _, _, workspaces = indexed.get(event_id, (start, end, frozenset()))
+                    indexed[event_id] = (start, end, workspaces | {workspace_id})
+        return {
+            "faltantes": sorted((set(expected) - set(actual)) | (set(expected_series) - set(actual_series))),
+            "sobrantes": sorted((set(actual) - set(expected)) | (set(actual_series) - set(expected_series))),
+            "distintos": sorted(
+                [
+                    event_id for event_id in set(expected) & set(actual)
+                    if expected[event_id] != actual[event_id] or indexed.get(event_id) != expected[event_id]
+                ] + [
+                    event_id for event_id in set(expected_series) & set(actual_series)
+                    if expected_series[event_id] != actual_series[event_id]
+                ]
+            ),
+        }
+
+
+_calendar_index = None
+_calendar_index_lock = threading.Lock()
+
+
+def get_calendar_config():
+    return {**DEFAULT_CALENDAR_INDEX, **getattr(settings, 'SCHEDULING_CALENDAR_INDEX', {})}
+
+
+def get_calendar_index():
+    """Índice del proceso, o None si está deshabilitado (`SCHEDULING_CALENDAR_INDEX['ENABLED']`)."""
+    global _calendar_index
+    config = get_calendar_config()
+    if not config['ENABLED']:
+        return None
+    if _calendar_index is None:
+        with _calendar_index_lock:
+            if _calendar_index is None:
+                _calendar_index = CalendarIndex(ttl=config['TTL'], sync=config['SYNC'])
+    return _calendar_index
+
+
+@receiver(setting_changed)
+def _reset_calendar_index(setting, **kwargs):
+    global _calendar_index
+    if setting == 'SCHEDULING_CALENDAR_INDEX':
+        _calendar_index = None
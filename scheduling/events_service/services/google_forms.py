@@ -1,22 +1,34 @@
 import requests
 from django.conf import settings
 
+
+class FormServiceError(Exception):
+    """El script de Google no respondió o no pudo crear el formulario."""
+
+
 def create_event_form(event_name):
+    """
+    Crea el formulario de invitación mediante el script de Google (`GOOGLE_SCRIPT_URL`).
+    Lanza `FormServiceError` si el script no está configurado, no responde o
+    responde con error. Se llama desde el outbox (ver `outbox.py`), nunca dentro
+    de una solicitud.
+    """
     script_url = settings.GOOGLE_SCRIPT_URL
+    if not script_url:
+        raise FormServiceError("GOOGLE_SCRIPT_URL no está configurado.")
+
+    timeout = getattr(settings, 'GOOGLE_SCRIPT_TIMEOUT', 15)
     try:
-        response = requests.post(script_url, json={"event_name": event_name}, timeout=15)
+        response = requests.post(script_url, json={"event_name": event_name}, timeout=timeout)
         response.raise_for_status()
         data = response.json()
-        
-        if data.get("status") == "success":
-            return {
-                "edit_link": data.get("form_edit_link"),
-                "public_link": data.get("form_public_link"),
-                "published_available": data.get("published_available", False)
-            }
-        else:
-            print("Error del script:", data)
-            return None
-    except Exception as e:
-        print("Error al conectar con Google Script:", e)
-        return None
+    except (requests.RequestException, ValueError) as e:
+        raise FormServiceError(f"Error al conectar con Google Script: {e}") from e
+
+    if data.get("status") != "success":
+        raise FormServiceError(f"Error del script: {data}")
+    return {
+        "edit_link": data.get("form_edit_link"),
+        "public_link": data.get("form_public_link"),
+        "published_available": data.get("published_available", False)
+    }
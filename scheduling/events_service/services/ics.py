@@ -0,0 +1,358 @@
+"""
+Feeds iCalendar (RFC 5545) por espacio de trabajo y por usuario creador.
+
+La generación es incremental:
+
+1. Una consulta liviana obtiene (id, `updated_at` del evento, `updated_at` del
+   detalle) de los eventos del feed. Con eso se calculan el ETag (hash de todas
+   las versiones) y `Last-Modified` (ver más abajo): si el cliente ya tiene esa
+   versión se responde 304 sin generar nada.
+2. Cada bloque VEVENT se guarda en la caché bajo su versión
+   (`ics:vevent:<id>:<versiones>`), por lo que un cambio en un evento invalida
+   sólo su bloque. Los bloques que faltan se generan con una consulta
+   (`select_related`) limitada a esos eventos.
+
+Los eventos eliminados desaparecen del conjunto de versiones y cambian el ETag.
+
+Las series recurrentes se publican como un VEVENT con `RRULE` (los clientes de
+calendario expanden las ocurrencias), `EXDATE` para las canceladas y un VEVENT
+con `RECURRENCE-ID` por cada ocurrencia cambiada de horario. Sus fechas van en
+hora local (`TZID`) para que la repetición respete los cambios de horario, como
+en `core/recurrence.py`; el calendario incluye el VTIMEZONE de `TIME_ZONE` con
+sus transiciones (ver `vtimezone`). Un cambio en la regla o en una ocurrencia
+actualiza el `updated_at` de la serie y, con ello, su versión.
+La ventana del feed va desde `SCHEDULING_ICS_PAST_DAYS` días atrás hacia el futuro.
+
+`Last-Modified` no puede ser sólo la versión más reciente: si un evento se elimina
+o sale de la ventana (o de un espacio) el conjunto se achica sin que aumente esa
+fecha, y un cliente que sólo envía `If-Modified-Since` recibiría 304. Por eso se
+guarda en la caché el momento en que cada feed pasó a tener su ETag actual
+(`ics:feed:<archivo>`) y se usa el mayor de ambos.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from core.models import Event, EventDetail, StatusEvent
+from core.recurrence import format_rrule, load_exceptions
+
+
+VEVENT_KEY = 'ics:vevent:{pk}:{version}'
+VEVENT_TIMEOUT = 60 * 60 * 24 * 7
+FEED_STATE_KEY = 'ics:feed:{feed}'
+DEFAULT_PAST_DAYS = 30
+# Años hacia el futuro cubiertos por las transiciones del VTIMEZONE
+VTIMEZONE_YEARS_AHEAD = 10
+
+ICS_STATUS = {
+    StatusEvent.AGENDED: 'TENTATIVE',
+    StatusEvent.CONFIRMED: 'CONFIRMED',
+    StatusEvent.IN_COURSE: 'CONFIRMED',
+    StatusEvent.COMPLETED: 'CONFIRMED',
+    StatusEvent.CANCELL: 'CANCELLED',
+    StatusEvent.REJECT: 'CANCELLED',
+}
+
+
+def _escape(text):
+    """Escapa un valor de texto (RFC 5545, sección 3.3.11)."""
+    return (
+        (text or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Corta las líneas en 75 octetos, continuando con un espacio (sección 3.1)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # No cortar a mitad de un carácter UTF-8
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(name, value):
+    """Propiedad con fecha-hora local y `TZID`."""
+    return f"{name};TZID={settings.TIME_ZONE}:{timezone.localtime(value).strftime('%Y%m%dT%H%M%S')}"
+
+
+def _offset(value):
+    """Desfase UTC en formato RFC 5545 (`-0300`, `+053000`)."""
+    seconds = int(value.total_seconds())
+    sign = '-' if seconds < 0 else '+'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{sign}{hours:02d}{minutes:02d}" + (f"{seconds:02d}" if seconds else '')
+
+
+def _transitions(tz, start, end):
+    """[(instante UTC, desfase anterior, desfase nuevo)] de `tz` entre dos timestamps."""
+    step = 24 * 60 * 60
+
+    def offset_at(ts):
+        return datetime.fromtimestamp(ts, tz).utcoffset()
+
+    result = []
+    current, offset = start, offset_at(start)
+    while current < end:
+        following = current + step
+        new = offset_at(following)
+        if new != offset:
+            # Búsqueda binaria del primer segundo con el desfase nuevo
+            low, high = current, following
+            while high - low > 1:
+                middle = (low + high) // 2
+                if offset_at(middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            result.append((high, offset, new))
+            offset = new
+        current = following
+    return result
+
+
+@lru_cache(maxsize=8)
+def vtimezone(tzname, first_year, last_year):
+    """
+    Bloque VTIMEZONE de `tzname` con una observancia por cada transición entre
+    `first_year` y `last_year`. No se usan reglas `RRULE`, por lo que también se
+    respetan los cambios de horario irregulares (como los de Chile).
+    """
+    tz = ZoneInfo(tzname)
+    start = int(datetime(first_year, 1, 1, tzinfo=dt_timezone.utc).timestamp())
+    end = int(datetime(last_year + 1, 1, 1, tzinfo=dt_timezone.utc).timestamp())
+    initial = datetime.fromtimestamp(start, tz).utcoffset()
+    observances = [(start, initial, initial)] + _transitions(tz, start, end)
+
+    lines = ['BEGIN:VTIMEZONE', f"TZID:{tzname}"]
+    for instant, before, after in observances:
+        local = datetime.fromtimestamp(instant, tz)
+        kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+        lines += [
+            f"BEGIN:{kind}",
+            # Inicio de la observancia en la hora local vigente hasta ese momento
+            f"DTSTART:{(datetime.fromtimestamp(instant, dt_timezone.utc) + before).strftime('%Y%m%dT%H%M%S')}",
+            f"TZOFFSETFROM:{_offset(before)}",
+            f"TZOFFSETTO:{_offset(after)}",
+            f"TZNAME:{_escape(local.tzname())}",
+            f"END:{kind}",
+        ]
+    lines.append('END:VTIMEZONE')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def _version(updated_at, detail_updated_at):
+    version = f"{updated_at.timestamp():.6f}"
+    if detail_updated_at is not None:
+        version += f"-{detail_updated_at.timestamp():.6f}"
+    return version
+
+
+def render_vevent(event):
+    """
+    Bloque VEVENT de un evento (con `eventdetail`, `created_by`, `recurrence` y
+    `occurrence_exceptions` ya cargados). Una serie incluye además los VEVENT de
+    sus ocurrencias cambiadas de horario.
+    """
+    try:
+        detail = event.eventdetail
+    except EventDetail.DoesNotExist:
+        detail = None
+    host = getattr(settings, 'SCHEDULING_ICS_UID_DOMAIN', 'scheduling')
+    recurrence = getattr(event, 'recurrence', None)
+    exceptions = list(event.occurrence_exceptions.all()) if recurrence is not None else []
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:evento-{event.pk}@{host}",
+        f"DTSTAMP:{_utc(event.updated_at)}",
+        f"LAST-MODIFIED:{_utc(event.updated_at)}",
+    ]
+    if recurrence is None:
+        lines += [f"DTSTART:{_utc(event.start_datetime)}", f"DTEND:{_utc(event.end_datetime)}"]
+    else:
+        lines += [
+            _local('DTSTART', event.start_datetime),
+            _local('DTEND', event.end_datetime),
+            f"RRULE:{format_rrule(recurrence)}",
+        ]
+        lines += [
+            _local('EXDATE', exception.original_start)
+            for exception in sorted(exceptions, key=lambda exception: exception.original_start)
+            if exception.cancelled
+        ]
+    lines += [
+        f"SUMMARY:{_escape(event.title)}",
+        f"STATUS:{ICS_STATUS.get(event.status, 'CONFIRMED')}",
+    ]
+    if detail is not None:
+        if detail.description:
+            lines.append(f"DESCRIPTION:{_escape(detail.description)}")
+        lines.append(f"CATEGORIES:{_escape(detail.event_type)}")
+    if event.created_by is not None and event.created_by.email:
+        lines.append(f"ORGANIZER:mailto:{event.created_by.email}")
+    if event.form_public_link:
+        lines.append(f"URL:{event.form_public_link}")
+    lines.append('END:VEVENT')
+
+    for exception in sorted(exceptions, key=lambda exception: exception.original_start):
+        if exception.cancelled or exception.start_datetime is None:
+            continue
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:evento-{event.pk}@{host}",
+            f"DTSTAMP:{_utc(exception.updated_at)}",
+            _local('RECURRENCE-ID', exception.original_start),
+            _local('DTSTART', exception.start_datetime),
+            _local('DTEND', exception.end_datetime),
+            f"SUMMARY:{_escape(event.title)}",
+            f"STATUS:{ICS_STATUS.get(event.status, 'CONFIRMED')}",
+            'END:VEVENT',
+        ]
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def _window_start():
+    return timezone.now() - timedelta(days=getattr(settings, 'SCHEDULING_ICS_PAST_DAYS', DEFAULT_PAST_DAYS))
+
+
+def feed_versions(events):
+    """[(id, versión, updated_at)] de los eventos del feed, ordenados por inicio."""
+    since = _window_start()
+    rows = (
+        events
+        .filter(
+            Q(end_datetime__gte=since)
+            # Series que siguen teniendo ocurrencias dentro de la ventana
+            | Q(recurrence__isnull=False, recurrence__last_end__isnull=True)
+            | Q(recurrence__last_end__gte=since)
+        )
+        .order_by('start_datetime', 'id_event')
+        .values_list('pk', 'updated_at', 'eventdetail__updated_at')
+    )
+    return [
+        (pk, _version(updated_at, detail_updated_at), max(filter(None, (updated_at, detail_updated_at))))
+        for pk, updated_at, detail_updated_at in rows
+    ]
+
+
+def feed_validators(name, versions):
+    """ETag fuerte y fecha de última modificación del feed."""
+    digest = hashlib.sha256(name.encode('utf-8'))
+    for pk, version, _ in versions:
+        digest.update(f"{pk}:{version};".encode('ascii'))
+    last_modified = max((modified for _, _, modified in versions), default=None)
+    return f'"{digest.hexdigest()[:32]}"', last_modified
+
+
+def render_feed(name, versions):
+    """Calendario completo; sólo genera los VEVENT que no están en la caché."""
+    keys = {pk: VEVENT_KEY.format(pk=pk, version=version) for pk, version, _ in versions}
+    blocks = cache.get_many(list(keys.values()))
+
+    missing = [pk for pk, key in keys.items() if key not in blocks]
+    if missing:
+        rendered = {}
+        events = list(Event.objects.filter(pk__in=missing).select_related('eventdetail', 'created_by', 'recurrence'))
+        load_exceptions(events)
+        for event in events:
+            rendered[keys[event.pk]] = render_vevent(event)
+        cache.set_many(rendered, VEVENT_TIMEOUT)
+        blocks.update(rendered)
+
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//CITT//Scheduling//ES',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        _fold(f"X-WR-CALNAME:{_escape(name)}"),
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+    ]
+    # Definición de la zona usada en los `TZID` de las series
+    first_year = _window_start().year - 1
+    parts = [
+        '\r\n'.join(header) + '\r\n',
+        vtimezone(settings.TIME_ZONE, first_year, timezone.now().year + VTIMEZONE_YEARS_AHEAD),
+    ]
+    # Un evento eliminado entre ambas consultas no tiene bloque: se omite
+    parts.extend(blocks[keys[pk]] for pk, _, _ in versions if keys[pk] in blocks)
+    parts.append('END:VCALENDAR\r\n')
+    return ''.join(parts)
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def feed_changed_at(feed, etag):
+    """
+    Momento en que el feed `feed` pasó a tener el ETag `etag`. Si la caché no lo
+    recuerda se toma el actual: a lo sumo el cliente vuelve a descargar el feed.
+    """
+    key = FEED_STATE_KEY.format(feed=feed)
+    state = cache.get(key)
+    if state is None or state[0] != etag:
+        changed_at = timezone.now()
+        if state is not None:
+            # `Last-Modified` tiene resolución de segundos: el cambio debe caer en el siguiente
+            changed_at = max(changed_at, state[1] + timedelta(seconds=1))
+        state = (etag, changed_at)
+        cache.set(key, state, VEVENT_TIMEOUT)
+    return state[1]
+
+
+def feed_response(request, name, events, filename):
+    """Respuesta del feed `name` con los eventos de `events` (200 o 304)."""
+    versions = feed_versions(events)
+    etag, last_modified = feed_validators(name, versions)
+    # Un conjunto que se achica no aumenta la versión más reciente (ver docstring del módulo)
+    changed_at = feed_changed_at(filename, etag)
+    last_modified = changed_at if last_modified is None else max(last_modified, changed_at)
+
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age=0, must-revalidate'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+
+    if _not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render_feed(name, versions), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    for key, value in headers.items():
+        response[key] = value
+    return response
@@ -0,0 +1,141 @@
+"""
+Outbox transaccional para las llamadas a servicios externos.
+
+Las solicitudes no llaman al servicio externo: escriben un `OutboxMessage` en la
+misma transacción que el cambio que lo origina (si la transacción se revierte,
+el mensaje tampoco existe). El comando `process_outbox` toma los mensajes
+vencidos y ejecuta su manejador fuera de cualquier transacción:
+
+- Cada lote se reclama con `SELECT ... FOR UPDATE SKIP LOCKED` y se le asigna un
+  plazo (`LEASE`): varios workers pueden correr a la vez, y si uno muere a mitad
+  de un lote sus mensajes vuelven a estar disponibles al vencer el plazo.
+- Si el manejador falla, el mensaje se reintenta con espera exponencial
+  (`BACKOFF_BASE` * 2^(intentos-1), hasta `BACKOFF_MAX`, con variación aleatoria)
+  y se marca como fallido tras `MAX_ATTEMPTS` intentos.
+
+Configuración en `SCHEDULING_OUTBOX` (todas opcionales, ver `DEFAULT_OUTBOX`).
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import OutboxMessage, OutboxStatus
+from .google_forms import create_event_form
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX = {
+    'BATCH_SIZE': 20,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'LEASE': 120,
+}
+
+
+def get_outbox_config():
+    return {**DEFAULT_OUTBOX, **getattr(settings, 'SCHEDULING_OUTBOX', {})}
+
+
+def enqueue_invitation(event):
+    """
+    Registra la creación del formulario de invitación de `event`. Debe llamarse
+    dentro de la transacción que crea o modifica el evento. No duplica un mensaje
+    que siga pendiente.
+    """
+    pending = OutboxMessage.objects.filter(
+        kind=OutboxMessage.INVITATION_FORM, event=event, status=OutboxStatus.PENDING,
+    ).first()
+    if pending is not None:
+        return pending
+    return OutboxMessage.objects.create(kind=OutboxMessage.INVITATION_FORM, event=event)
+
+
+def _handle_invitation_form(message):
+    event = message.event
+    if event.form_public_link:
+        # Ya creado (p. ej. por un intento anterior que falló al marcar el mensaje)
+        return
+    result = create_event_form(event.title)
+    event.form_public_link = result.get("public_link")
+    event.form_edit_link = result.get("edit_link")
+    event.save(update_fields=['form_public_link', 'form_edit_link', 'updated_at'])
+
+
+HANDLERS = {
+    OutboxMessage.INVITATION_FORM: _handle_invitation_form,
+}
+
+
+def backoff_delay(attempts, config=None):
+    """Espera (segundos) antes del intento siguiente al número `attempts`."""
+    config = config or get_outbox_config()
+    delay = min(config['BACKOFF_MAX'], config['BACKOFF_BASE'] * 2 ** max(0, attempts - 1))
+    # Variación aleatoria para que los reintentos de un mismo corte no coincidan
+    return delay * random.uniform(0.75, 1.0)
+
+
+def claim_batch(limit, lease):
+    """
+    Reclama hasta `limit` mensajes vencidos, corriendo su próximo intento al fin
+    del plazo `lease` para que otros workers no los tomen.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('event')
+            .filter(status=OutboxStatus.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id_message')[:limit]
+        )
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                next_attempt_at=now + timedelta(seconds=lease), updated_at=now,
+            )
+    return messages
+
+
+def process_message(message, config=None):
+    """Ejecuta el manejador del mensaje y registra el resultado. Retorna el nuevo estado."""
+    config = config or get_outbox_config()
+    message.attempts += 1
+    try:
+        HANDLERS[message.kind](message)
+    except Exception as e:
+        message.last_error = str(e)[:2000]
+        if message.attempts >= config['MAX_ATTEMPTS']:
+            message.status = OutboxStatus.FAILED
+            logger.error("Outbox %s falló definitivamente tras %s intentos: %s", message.pk, message.attempts, e)
+        else:
+            message.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(message.attempts, config))
+            logger.warning("Outbox %s falló (intento %s), se reintentará: %s", message.pk, message.attempts, e)
+    else:
+        message.status = OutboxStatus.DONE
+        message.last_error = ''
+    message.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error', 'updated_at'])
+    return message.status
+
+
+def process_outbox(limit=None):
+    """
+    Procesa un lote de mensajes vencidos. Retorna {"procesados", "reintentos", "fallidos"}.
+    """
+    config = get_outbox_config()
+    messages = claim_batch(limit or config['BATCH_SIZE'], config['LEASE'])
+    counts = {"procesados": 0, "reintentos": 0, "fallidos": 0}
+    for message in messages:
+        result = process_message(message, config)
+        if result == OutboxStatus.DONE:
+            counts["procesados"] += 1
+        elif result == OutboxStatus.FAILED:
+            counts["fallidos"] += 1
+        else:
+            counts["reintentos"] += 1
+    return counts
@@ -0,0 +1,187 @@
+"""
+Transiciones automáticas de estado de los eventos.
+
+- AGENDED / CONFIRMED pasan a IN_COURSE al llegar su inicio.
+- AGENDED / CONFIRMED / IN_COURSE pasan a COMPLETED al llegar su término.
+
+`StatusScheduler` mantiene un heap con los próximos límites (inicio o término)
+de los eventos activos dentro de una ventana (`LOOKAHEAD`), duerme hasta el más
+cercano y aplica todos los vencidos con un `UPDATE` por estado de destino y
+lote. El heap se recarga cada `RELOAD` segundos para incluir eventos creados o
+modificados por otros procesos.
+
+Cada `UPDATE` repite las condiciones de estado y horario, por lo que aplicar una
+transición dos veces (o con un límite desactualizado por una edición) no tiene
+efecto. `catch_up` aplica todo lo vencido de una vez, tras una caída o al
+iniciar, y es idempotente.
+
+Las series recurrentes tienen un solo estado para toda la serie: no pasan por
+IN_COURSE en cada ocurrencia y pasan a COMPLETED cuando termina su última
+ocurrencia (nunca, si la serie no termina).
+
+Las actualizaciones masivas no emiten `post_save`: se emite la señal
+`event_status_changed` con los ids afectados.
+
+Configuración en `EVENT_STATUS_SCHEDULER` (ver `DEFAULT_STATUS_SCHEDULER`).
+"""
+
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ACTIVE_STATUSES, Event, StatusEvent
+
+from ..signals import event_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS_SCHEDULER = {
+    'ENABLED': False,
+    'BATCH_SIZE': 500,
+    'LOOKAHEAD': 3600,
+    'RELOAD': 60,
+}
+
+# Estados de origen de cada transición
+PENDING_STATUSES = (StatusEvent.AGENDED, StatusEvent.CONFIRMED)
+
+
+def get_scheduler_config():
+    return {**DEFAULT_STATUS_SCHEDULER, **getattr(settings, 'EVENT_STATUS_SCHEDULER', {})}
+
+
+def scheduler_enabled():
+    """Si el planificador está activo, el estado de los eventos refleja su horario."""
+    return get_scheduler_config()['ENABLED']
+
+
+def _due_queryset(target, now):
+    """Eventos cuya transición a `target` está vencida en `now`."""
+    if target == StatusEvent.COMPLETED:
+        return Event.objects.filter(status__in=ACTIVE_STATUSES).filter(
+            Q(recurrence__isnull=True, end_datetime__lte=now) | Q(recurrence__last_end__lte=now)
+        )
+    return Event.objects.single().filter(status__in=PENDING_STATUSES, start_datetime__lte=now, end_datetime__gt=now)
+
+
+def _apply(target, now, event_ids=None, batch_size=500):
+    """
+    Aplica la transición a `target` a los eventos vencidos (todos, o sólo entre
+    `event_ids`) en lotes de `batch_size`. Retorna los ids actualizados.
+    """
+    due = _due_queryset(target, now)
+    if event_ids is not None:
+        candidates = list(event_ids)
+    else:
+        candidates = list(due.order_by('pk').values_list('pk', flat=True))
+
+    updated = []
+    for offset in range(0, len(candidates), batch_size):
+        chunk = candidates[offset:offset + batch_size]
+        with transaction.atomic():
+            ids = list(due.filter(pk__in=chunk).select_for_update().values_list('pk', flat=True))
+            if ids:
+                Event.objects.filter(pk__in=ids).update(status=target, updated_at=now)
+                transaction.on_commit(lambda ids=ids: event_status_changed.send(
+                    sender=Event, event_ids=ids, status=target,
+                ))
+        updated.extend(ids)
+    return updated
+
+
+def catch_up(now=None, batch_size=None):
+    """
+    Aplica todas las transiciones vencidas. Primero los términos, para que un
+    evento que ya terminó no pase antes por IN_COURSE.
+    Retorna {estado: [ids]}.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_scheduler_config()['BATCH_SIZE']
+    return {
+        StatusEvent.COMPLETED: _apply(StatusEvent.COMPLETED, now, batch_size=batch_size),
+        StatusEvent.IN_COURSE: _apply(StatusEvent.IN_COURSE, now, batch_size=batch_size),
+    }
+
+
+class StatusScheduler:
+
+    def __init__(self, config=None, clock=timezone.now, sleep=time.sleep):
+        self.config = config or get_scheduler_config()
+        self.clock = clock
+        self.sleep = sleep
+        self._heap = []
+        self._reload_at = None
+
+    def load(self, now):
+        """Límites de los eventos activos dentro de (now, now + LOOKAHEAD]."""
+        horizon = now + timedelta(seconds=self.config['LOOKAHEAD'])
+        heap = []
+        rows = (
+            Event.objects
+            .single()
+            .filter(status__in=ACTIVE_STATUSES, start_datetime__lte=horizon, end_datetime__gt=now)
+            .values_list('pk', 'status', 'start_datetime', 'end_datetime')
+        )
+        # Las series sólo cambian al terminar su última ocurrencia
+        series = (
+            Event.objects
+            .filter(status__in=ACTIVE_STATUSES, recurrence__last_end__gt=now, recurrence__last_end__lte=horizon)
+            .values_list('pk', 'recurrence__last_end')
+        )
+        for pk, last_end in series:
+            heap.append((last_end, StatusEvent.COMPLETED, pk))
+        for pk, status, start, end in rows:
+            if status in PENDING_STATUSES and start > now:
+                heap.append((start, StatusEvent.IN_COURSE, pk))
+            if end <= horizon:
+                heap.append((end, StatusEvent.COMPLETED, pk))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._reload_at = now + timedelta(seconds=self.config['RELOAD'])
+
+    def run_pending(self, now):
+        """Aplica los límites vencidos en `now`. Retorna {estado: [ids]}."""
+        due = {StatusEvent.COMPLETED: [], StatusEvent.IN_COURSE: []}
+        while self._heap and self._heap[0][0] <= now:
+            _, target, pk = heapq.heappop(self._heap)
+            due[target].append(pk)
+        return {
+            target: _apply(target, now, event_ids=ids, batch_size=self.config['BATCH_SIZE']) if ids else []
+            for target, ids in due.items()
+        }
+
+    def next_wakeup(self):
+        """Instante de la próxima acción: el límite más cercano o la recarga."""
+        if self._heap and self._heap[0][0] < self._reload_at:
+            return self._heap[0][0]
+        return self._reload_at
+
+    def tick(self):
+        """Una iteración: recarga si corresponde y aplica lo vencido. Retorna {estado: [ids]}."""
+        now = self.clock()
+        if self._reload_at is None or now >= self._reload_at:
+            # La recarga parte con una puesta al día: cubre ediciones hechas entre recargas
+            applied = catch_up(now, self.config['BATCH_SIZE'])
+            self.load(now)
+            return applied
+        return self.run_pending(now)
+
+    def run_forever(self):
+        while True:
+            applied = self.tick()
+            changed = sum(len(ids) for ids in applied.values())
+            if changed:
+                logger.info(
+                    "Estados actualizados: %s en curso, %s realizados",
+                    len(applied[StatusEvent.IN_COURSE]), len(applied[StatusEvent.COMPLETED]),
+                )
+            delay = (self.next_wakeup() - self.clock()).total_seconds()
+            if delay > 0:
+                self.sleep(delay)
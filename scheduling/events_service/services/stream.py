@@ -0,0 +1,366 @@
+"""
+Difusión de cambios de la agenda por Server-Sent Events (`/api/stream/`).
+
+`ChangeBroker` es un broker en memoria del proceso:
+
+- Cada cambio (`created`, `updated`, `status`, `deleted`) recibe un id
+  `<arranque>-<secuencia>` y se guarda en un buffer circular de `BUFFER`
+  entradas. Un cliente que se reconecta con `Last-Event-ID` recibe lo que se
+  perdió; si el id es de otro arranque del proceso o ya salió del buffer, recibe
+  un evento `reset` para que vuelva a cargar la agenda completa.
+- Los suscriptores son colas de asyncio de `QUEUE` mensajes; la publicación se
+  hace desde hilos síncronos (señales, poller) con `call_soon_threadsafe`. Si un
+  cliente no lee y su cola se llena, se descartan sus pendientes, recibe `reset`
+  y se cierra su conexión: al reconectarse retoma desde el buffer o recarga.
+
+Los cambios llegan por dos vías:
+
+- Las señales de `Event`/`EventSpace` y `event_status_changed` de este proceso
+  (ver `events_service/signals.py`), al confirmarse la transacción.
+- Un poller (un hilo por proceso, sólo mientras haya suscriptores) que cada
+  `POLL` segundos busca eventos con `updated_at` reciente: cubre lo que
+  escriben otros procesos, como el servicio de gestión. Las versiones ya
+  publicadas no se repiten. Para las eliminaciones, el poller recuerda los ids
+  de los eventos existentes con sus espacios y publica `deleted` para los que
+  dejan de estar en la tabla (una consulta de ids por ciclo).
+
+El endpoint necesita un servidor ASGI (ver `scheduling/asgi.py`). El gateway lo
+expone como `/api/event/stream/` y reenvía los mensajes según llegan; bajo WSGI
+cada conexión abierta ocupa un worker del gateway.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.models import Event, EventSpace
+from core.recurrence import format_rrule
+from core.serializers.common import FlexibleDateTimeField
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_STREAM = {
+    'BUFFER': 1000,
+    'HEARTBEAT': 15,
+    'POLL': 5,
+    'QUEUE': 100,
+}
+# Versiones publicadas que se recuerdan para no repetir cambios
+PUBLISHED_VERSIONS = 10000
+# Espera sugerida al cliente antes de reconectarse
+RECONNECT_DELAY_MS = 3000
+# Versión registrada para los eventos eliminados
+DELETED = 'deleted'
+
+
+def get_stream_config():
+    return {**DEFAULT_EVENT_STREAM, **getattr(settings, 'SCHEDULING_EVENT_STREAM', {})}
+
+
+def event_snapshots(event_ids):
+    """{id_evento: datos} de los eventos indicados, con sus espacios (dos consultas)."""
+    field = FlexibleDateTimeField()
+    snapshots = {}
+    for event in Event.objects.filter(pk__in=event_ids).select_related('recurrence'):
+        recurrence = getattr(event, 'recurrence', None)
+        snapshots[event.pk] = {
+            'id_event': event.pk,
+            'title': event.title,
+            'start_datetime': field.to_representation(event.start_datetime),
+            'end_datetime': field.to_representation(event.end_datetime),
+            'status': event.status,
+            # Regla de repetición de las series (las ocurrencias las calcula el cliente o `/future-activity/`)
+            'recurrence': format_rrule(recurrence) if recurrence is not None else None,
+            'spaces': [],
+            '_version': event.updated_at,
+        }
+    for event_id, workspace_id in EventSpace.objects.filter(event_id__in=snapshots).values_list('event_id', 'workspace_id'):
+        snapshots[event_id]['spaces'].append(workspace_id)
+    return snapshots
+
+
+# Marca en la cola de un suscriptor que se quedó atrás
+OVERFLOW = None
+
+
+class Subscription:
+
+    def __init__(self, broker, workspace_ids, loop):
+        self.broker = broker
+        self.workspace_ids = set(workspace_ids) if workspace_ids else None
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=broker.queue_size)
+        self.overflowed = False
+
+    def matches(self, workspaces):
+        return self.workspace_ids is None or bool(self.workspace_ids.intersection(workspaces))
+
+    def deliver(self, message):
+        """
+        Encola un mensaje (en el loop del suscriptor). Si la cola está llena el
+        cliente no está leyendo: se vacía y se deja `OVERFLOW` para cerrar el stream.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class ChangeBroker:
+
+    def __init__(self, buffer_size=1000, poll_interval=5, queue_size=100):
+        self.boot = uuid.uuid4().hex[:8]
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._last_sequence = 0
+        # Mensajes: (secuencia, id, tipo, datos, espacios)
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._versions = OrderedDict()
+        # {id_evento: espacios} de los eventos existentes, para detectar eliminaciones (lo carga el poller)
+        self._known = None
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def _message_id(self, sequence):
+        return f"{self.boot}-{sequence}"
+
+    # -- publicación -------------------------------------------------------
+
+    def _remember(self, event_id, version):
+        """Registra la versión publicada. Retorna False si ya se había publicado."""
+        if version is not None:
+            if self._versions.get(event_id) == version:
+                return False
+            self._versions[event_id] = version
+            self._versions.move_to_end(event_id)
+            while len(self._versions) > PUBLISHED_VERSIONS:
+                self._versions.popitem(last=False)
+        return True
+
+    def publish(self, kind, event_id, data=None, workspaces=(), version=None):
+        """Publica un cambio. Retorna su id, o None si esa versión ya se publicó."""
+        with self._lock:
+            if not self._remember(event_id, version):
+                return None
+            self._last_sequence += 1
+            message = (
+                self._last_sequence, self._message_id(self._last_sequence), kind,
+                {'type': kind, 'id_event': event_id, 'event': data}, frozenset(workspaces),
+            )
+            self._buffer.append(message)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.matches(message[4]):
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+        return message[1]
+
+    def mark_gap(self):
+        """
+        Registra cambios que no se publicaron (sin suscriptores no se consultan):
+        quien se reconecte con un id anterior recibirá `reset`.
+        """
+        with self._lock:
+            self._last_sequence += 1
+            self._buffer.clear()
+            # Los eventos creados durante el hueco no están en `_known`
+            self._known = None
+
+    def publish_events(self, kind, event_ids):
+        """Publica el estado actual de los eventos indicados (leído de la base de datos)."""
+        if not self._subscribers:
+            self.mark_gap()
+            return
+        for event_id, data in event_snapshots(event_ids).items():
+            version = data.pop('_version')
+            with self._lock:
+                if self._known is not None:
+                    self._known[event_id] = frozenset(data['spaces'])
+            self.publish(kind, event_id, data, data['spaces'], version)
+
+    def publish_deleted(self, event_id, workspaces):
+        if not self._subscribers:
+            self.mark_gap()
+            return
+        with self._lock:
+            if self._known is not None:
+                self._known.pop(event_id, None)
+        # Versión fija: la señal local y el poller no la publican dos veces
+        self.publish('deleted', event_id, None, workspaces, version=DELETED)
+
+    # -- suscripción ---------------------------------------------------------
+
+    def subscribe(self, workspace_ids=None, last_event_id=None):
+        """
+        Registra un suscriptor en el loop actual. Retorna (suscripción, pendientes,
+        último id), donde pendientes son los mensajes posteriores a `last_event_id`,
+        o None si no se pueden recuperar (hay que enviar `reset`).
+        """
+        subscription = Subscription(self, workspace_ids, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = self._missed(last_event_id)
+            latest_id = self._message_id(self._last_sequence)
+        if missed is not None:
+            missed = [message for message in missed if subscription.matches(message[4])]
+        self._ensure_poller()
+        return subscription, missed, latest_id
+
+    def _missed(self, last_event_id):
+        if not last_event_id:
+            return []
+        boot, _, sequence = last_event_id.partition('-')
+        if boot != self.boot or not sequence.isdigit() or int(sequence) > self._last_sequence:
+            # Otro arranque del proceso (u otro proceso): no hay forma de saber qué se perdió
+            return None
+        sequence = int(sequence)
+        if sequence == self._last_sequence:
+            return []
+        if not self._buffer or sequence < self._buffer[0][0] - 1:
+            # Se perdieron mensajes que ya salieron del buffer
+            return None
+        return [message for message in self._buffer if message[0] > sequence]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def latest_id(self):
+        with self._lock:
+            return self._message_id(self._last_sequence)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # -- poller --------------------------------------------------------------
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._poller is None and self.poll_interval:
+                self._poller = threading.Thread(target=self._poll_loop, name='event-stream-poller', daemon=True)
+                self._poller.start()
+
+    def poll_once(self, since):
+        """
+        Publica los eventos modificados después de `since` y los eliminados desde la
+        consulta anterior. Retorna la nueva marca.
+        """
+        with self._lock:
+            loaded = self._known is not None
+        if not loaded:
+            self._load_known()
+        changed = list(
+            Event.objects.filter(updated_at__gt=since).order_by('updated_at').values_list('pk', 'updated_at')[:500]
+        )
+        if changed:
+            self.publish_events('updated', [pk for pk, _ in changed])
+            since = changed[-1][1]
+        self._publish_removed()
+        return since
+
+    def _load_known(self):
+        known = {pk: set() for pk in Event.objects.values_list('pk', flat=True)}
+        for event_id, workspace_id in EventSpace.objects.values_list('event_id', 'workspace_id'):
+            known.setdefault(event_id, set()).add(workspace_id)
+        with self._lock:
+            self._known = {pk: frozenset(workspaces) for pk, workspaces in known.items()}
+
+    def _publish_removed(self):
+        """Publica `deleted` para los eventos conocidos que ya no existen (p. ej. borrados por otro proceso)."""
+        with self._lock:
+            known = dict(self._known or {})
+        if not known:
+            return
+        existing = set(Event.objects.values_list('pk', flat=True))
+        for event_id in known.keys() - existing:
+            self.publish_deleted(event_id, known[event_id])
+
+    def _poll_loop(self):
+        since = timezone.now()
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._subscribers:
+                # Sin suscriptores no se consulta: lo ocurrido mientras tanto es un hueco
+                since = timezone.now()
+                self.mark_gap()
+                continue
+            try:
+                close_old_connections()
+                since = self.poll_once(since)
+            except Exception:
+                # Un error de la base de datos no debe detener el poller
+                logger.exception("Error al consultar cambios de eventos")
+            finally:
+                close_old_connections()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker(create=True):
+    """Broker del proceso. Con `create=False` retorna None si nadie se ha suscrito aún."""
+    global _broker
+    if _broker is None and not create:
+        return None
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = get_stream_config()
+                _broker = ChangeBroker(
+                    buffer_size=config['BUFFER'], poll_interval=config['POLL'], queue_size=config['QUEUE'],
+                )
+    return _broker
+
+
+def format_message(message_id, kind, data):
+    """Mensaje en formato `text/event-stream`."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {message_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+async def stream_messages(broker, workspace_ids=None, last_event_id=None, heartbeat=15):
+    """Generador asíncrono con los mensajes SSE de un suscriptor, con latidos periódicos."""
+    subscription, missed, latest_id = broker.subscribe(workspace_ids, last_event_id)
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        if missed is None:
+            # El id del reset permite retomar desde aquí tras recargar la agenda
+            yield format_message(latest_id, 'reset', {'type': 'reset'})
+        else:
+            for _, message_id, kind, data, _ in missed:
+                yield format_message(message_id, kind, data)
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": heartbeat\n\n"
+                continue
+            if message is OVERFLOW:
+                # Cliente lento: se le pide recargar y se cierra; al reconectarse
+                # con este id retoma desde el buffer
+                yield format_message(broker.latest_id(), 'reset', {'type': 'reset'})
+                return
+            _, message_id, kind, data, _ = message
+            yield format_message(message_id, kind, data)
+    finally:
+        subscription.close()
@@ -0,0 +1,110 @@
+"""
+Mantiene al día el índice de calendario del proceso (`services/calendar_index.py`).
+
+Los cambios se aplican al confirmarse la transacción, releyendo el evento
+desde la base de datos: así se incluyen los `EventSpace` creados con
+`bulk_create` (que no emite señales) en la misma transacción que el evento.
+
+También se escuchan `EventRecurrence` y `EventOccurrenceException`: cambiar la
+regla o una ocurrencia de una serie actualiza la serie completa.
+
+Las mismas señales publican los cambios en el stream SSE (`services/stream.py`)
+cuando hay un broker activo en el proceso.
+
+`event_status_changed` la emite el planificador de estados
+(`services/status_scheduler.py`) tras sus `UPDATE` masivos, con los argumentos
+`event_ids` y `status`.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from core.models import ACTIVE_STATUSES, Event, EventOccurrenceException, EventRecurrence, EventSpace
+
+from .services.calendar_index import get_calendar_index
+from .services.stream import get_broker
+
+
+event_status_changed = Signal()
+
+
+def _schedule_refresh(event_id):
+    index = get_calendar_index()
+    if index is not None and event_id is not None:
+        transaction.on_commit(partial(index.refresh_event, event_id))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def refresh_event_in_index(sender, instance, **kwargs):
+    _schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=EventSpace)
+@receiver(post_delete, sender=EventSpace)
+@receiver(post_save, sender=EventRecurrence)
+@receiver(post_delete, sender=EventRecurrence)
+@receiver(post_save, sender=EventOccurrenceException)
+@receiver(post_delete, sender=EventOccurrenceException)
+def refresh_event_space_in_index(sender, instance, **kwargs):
+    _schedule_refresh(instance.event_id)
+
+
+@receiver(event_status_changed)
+def refresh_status_in_index(sender, event_ids, status, **kwargs):
+    index = get_calendar_index()
+    if index is not None and status not in ACTIVE_STATUSES:
+        # El horario no cambia: sólo salen del índice los que dejan de ocupar el espacio
+        for event_id in event_ids:
+            index.remove_event(event_id)
+
+
+# ---------------------------------------------------------------------------
+# Stream de cambios (SSE)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Event)
+def publish_event_change(sender, instance, created, **kwargs):
+    broker = get_broker(create=False)
+    if broker is not None:
+        transaction.on_commit(partial(broker.publish_events, 'created' if created else 'updated', [instance.pk]))
+
+
+@receiver(post_save, sender=EventSpace)
+@receiver(post_delete, sender=EventSpace)
+@receiver(post_save, sender=EventRecurrence)
+@receiver(post_delete, sender=EventRecurrence)
+@receiver(post_save, sender=EventOccurrenceException)
+@receiver(post_delete, sender=EventOccurrenceException)
+def publish_event_space_change(sender, instance, **kwargs):
+    broker = get_broker(create=False)
+    if broker is not None:
+        # Si el evento se está eliminando ya no existe al confirmarse: no se publica
+        transaction.on_commit(partial(broker.publish_events, 'updated', [instance.event_id]))
+
+
+@receiver(pre_delete, sender=Event)
+def remember_event_spaces(sender, instance, **kwargs):
+    # Los espacios se eliminan en cascada antes que el evento: guardarlos para filtrar
+    if get_broker(create=False) is not None:
+        instance._stream_workspaces = list(
+            EventSpace.objects.filter(event=instance).values_list('workspace_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Event)
+def publish_event_deleted(sender, instance, **kwargs):
+    broker = get_broker(create=False)
+    if broker is not None:
+        workspaces = getattr(instance, '_stream_workspaces', [])
+        transaction.on_commit(partial(broker.publish_deleted, instance.pk, workspaces))
+
+
+@receiver(event_status_changed)
+def publish_status_change(sender, event_ids, status, **kwargs):
+    broker = get_broker(create=False)
+    if broker is not None:
+        broker.publish_events('status', event_ids)
@@ -1,3 +1,928 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Event, EventDetail, EventSpace, StatusEvent, Workspace
+from events_service.models import OutboxMessage, OutboxStatus
+from events_service.services import stream
+from events_service.services.outbox import process_outbox
+from events_service.services.stream import ChangeBroker, Subscription, format_message, stream_messages
+from events_service.services.status_scheduler import StatusScheduler, catch_up
+from events_service.signals import event_status_changed
+
+
+class SchedulingTestCase(TestCase):
+    """Base de los tests: el coordinador que crea los eventos y los espacios Sala y Lab."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('coordinador', email='coordinador@example.com', password='x', first_name='Ana')
+        cls.sala = Workspace.objects.create(name='Sala', space_type='Sala', description='', max_occupancy=10, zone_space='NO')
+        cls.lab = Workspace.objects.create(name='Lab', space_type='Lab', description='', max_occupancy=10, zone_space='NE')
+
+    @classmethod
+    def _event(cls, start, end, *spaces, title='x', status=StatusEvent.CONFIRMED):
+        """Evento del coordinador en los espacios indicados (con señales, como lo crearía la API)."""
+        event = Event.objects.create(title=title, start_datetime=start, end_datetime=end, created_by=cls.user, status=status)
+        for space in spaces:
+            EventSpace.objects.create(event=event, workspace=space)
+        return event
+
+
+class ScheduledEventsTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        for i in range(20):
+            event = cls._event(now + timedelta(days=i + 1), now + timedelta(days=i + 1, hours=2), cls.sala, title=f'Evento {i}')
+            # La mitad de los eventos no tiene detalle
+            if i % 2 == 0:
+                EventDetail.objects.create(event=event, attendees=10, description=f'Detalle {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_single_query_regardless_of_event_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('scheduled-events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['events']), 20)
+
+    def test_enriched_fields(self):
+        events = self.client.get(reverse('scheduled-events')).json()['events']
+        first, second = events[0], events[1]
+        self.assertEqual(first['description'], 'Detalle 0')
+        self.assertEqual(first['event_type'], 'Evento Académico')
+        self.assertEqual(first['created_by_email'], 'coordinador@example.com')
+        self.assertIsNone(second['description'])
+        self.assertIsNone(second['event_type'])
+        for field in ('created_by', 'created_by_username', 'form_edit_link'):
+            self.assertNotIn(field, first)
+
+    def test_today_single_query(self):
+        now = timezone.now()
+        self._event(now - timedelta(hours=1), now + timedelta(hours=1), title='En curso', status=StatusEvent.IN_COURSE)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('scheduled-events'), {'today': 'true'})
+        self.assertEqual([e['title'] for e in response.json()['events']], ['En curso'])
+
+
+class FutureActivityTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        cls.in_course = cls._event(now - timedelta(hours=1), now + timedelta(hours=1), cls.sala, cls.lab, title='En curso')
+        cls.week = [cls._event(now + timedelta(days=i), now + timedelta(days=i, hours=1), cls.sala, title=f'Día {i}') for i in range(1, 6)]
+        cls.later = cls._event(now + timedelta(days=30), now + timedelta(days=30, hours=1), cls.lab, title='Lejano')
+        cls._event(now - timedelta(days=2), now - timedelta(days=2) + timedelta(hours=1), cls.sala, title='Pasado')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_default_window_is_one_week(self):
+        data = self.client.get(reverse('future-activity')).json()
+        titles = [e['title'] for e in data['events']]
+        self.assertEqual(titles, ['En curso'] + [f'Día {i}' for i in range(1, 6)])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_spaces_without_duplicates(self):
+        data = self.client.get(reverse('future-activity'), {'spaces': f'{self.sala.pk},{self.lab.pk}'}).json()
+        ids = [e['id_event'] for e in data['events']]
+        self.assertEqual(len(ids), len(set(ids)))
+        data = self.client.get(reverse('future-activity'), {'spaces': str(self.lab.pk), 'to': (timezone.now() + timedelta(days=40)).date().isoformat()}).json()
+        self.assertEqual([e['title'] for e in data['events']], ['En curso', 'Lejano'])
+
+    def test_cursor_pagination(self):
+        seen = []
+        params = {'limit': 2}
+        for _ in range(5):
+            data = self.client.get(reverse('future-activity'), params).json()
+            seen += [e['id_event'] for e in data['events']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(seen, [self.in_course.pk] + [e.pk for e in self.week])
+
+    def test_compact(self):
+        # Series de la ventana + eventos simples + espacios
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('future-activity'), {'compact': 'true'}).json()
+        first = data['events'][0]
+        self.assertEqual(set(first), {'id', 'start', 'end', 'status', 'spaces'})
+        self.assertEqual(sorted(first['spaces']), sorted([self.sala.pk, self.lab.pk]))
+
+    def test_invalid_params(self):
+        for params in ({'from': 'ayer'}, {'limit': '0'}, {'cursor': '!!'}, {'spaces': 'a,b'},
+                       {'from': '2025-01-10', 'to': '2025-01-01'}, {'from': '2025-01-01', 'to': '2025-12-01'}):
+            self.assertEqual(self.client.get(reverse('future-activity'), params).status_code, 400, params)
+
+
+@override_settings(SCHEDULING_CALENDAR_INDEX={'ENABLED': False})
+class AvailabilityTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.day = (timezone.localtime() + timedelta(days=3)).date()
+        at = cls._at
+        # 09:00-10:00 y 09:30-11:00 se fusionan; 15:00-15:20 deja huecos menores al mínimo
+        cls._event(at(9), at(10), cls.sala)
+        cls._event(at(9, 30), at(11), cls.sala)
+        cls._event(at(15), at(15, 20), cls.sala, cls.lab)
+        cls._event(at(12), at(13), cls.sala, status=StatusEvent.CANCELL)
+
+    @classmethod
+    def _at(cls, hour, minute=0):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour, minute)))
+
+    def _get(self, **params):
+        params.setdefault('from', self.day.isoformat())
+        params.setdefault('to', (self.day + timedelta(days=1)).isoformat())
+        return self.client.get(reverse('availability'), params)
+
+    def test_free_slots(self):
+        with self.assertNumQueries(3):
+            response = self._get(spaces=f'{self.sala.pk},{self.lab.pk}', open='08:00', close='18:00', min_duration='30')
+        self.assertEqual(response.status_code, 200, response.content)
+        slots = {s['workspace']: [(x['start'][11:16], x['end'][11:16]) for x in s['slots']] for s in response.json()['spaces']}
+        self.assertEqual(slots[self.sala.pk], [('08:00', '09:00'), ('11:00', '15:00'), ('15:20', '18:00')])
+        self.assertEqual(slots[self.lab.pk], [('08:00', '15:00'), ('15:20', '18:00')])
+
+    def test_min_duration_and_weekdays(self):
+        data = self._get(spaces=str(self.sala.pk), open='08:00', close='18:00', min_duration='240').json()
+        self.assertEqual([(x['start'][11:16], x['end'][11:16]) for x in data['spaces'][0]['slots']], [('11:00', '15:00')])
+        other_days = ','.join(str(d) for d in range(7) if d != self.day.weekday())
+        data = self._get(spaces=str(self.sala.pk), weekdays=other_days).json()
+        self.assertEqual(data['spaces'][0]['slots'], [])
+
+    def test_invalid_params(self):
+        for params in ({'min_duration': '0'}, {'open': '25:00'}, {'open': '18:00', 'close': '08:00'},
+                       {'weekdays': '7'}, {'spaces': '999'}, {'to': '2000-01-01'}):
+            self.assertEqual(self._get(**params).status_code, 400, params)
+
+    def test_merge_and_subtract(self):
+        from events_service.services.availability import free_slots, merge_intervals
+        self.assertEqual(merge_intervals([(1, 3), (2, 4), (4, 5), (7, 8)]), [(1, 5), (7, 8)])
+        self.assertEqual(free_slots([(1, 5), (7, 8)], [(0, 10)], 1), [(0, 1), (5, 7), (8, 10)])
+        self.assertEqual(free_slots([(5, 15)], [(0, 10), (12, 20)], 1), [(0, 5), (15, 20)])
+
+
+class ConflictDetectionTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.day = (timezone.localtime() + timedelta(days=2)).date()
+        cls.existing = cls._existing(10, 12)
+        cls._existing(14, 16, status=StatusEvent.CANCELL)
+
+    @classmethod
+    def _at(cls, hour):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour)))
+
+    @classmethod
+    def _existing(cls, h1, h2, status=StatusEvent.CONFIRMED):
+        return cls._event(cls._at(h1), cls._at(h2), cls.sala, title='Existente', status=status)
+
+    def _create(self, h1, h2, spaces):
+        return self.client.post(reverse('event-list'), {
+            'title': 'Nuevo', 'created_by': self.user.pk,
+            'start_datetime': f'{self.day.isoformat()}T{h1:02d}:00:00',
+            'end_datetime': f'{self.day.isoformat()}T{h2:02d}:00:00',
+            'detail': {'attendees': 5}, 'spaces': spaces,
+        }, content_type='application/json')
+
+    def test_overlap_returns_conflicting_events(self):
+        response = self._create(11, 13, [self.lab.pk, self.sala.pk])
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual([c['id_event'] for c in response.json()['conflicts']], [self.existing.pk])
+        self.assertFalse(Event.objects.filter(title='Nuevo').exists())
+
+    def test_no_conflict(self):
+        # Contiguo al existente, sobre un cancelado y en otro espacio
+        for h1, h2, spaces in ((12, 13, [self.sala.pk]), (14, 16, [self.sala.pk]), (10, 12, [self.lab.pk])):
+            self.assertEqual(self._create(h1, h2, spaces).status_code, 201)
+
+    def test_invalid_interval(self):
+        self.assertEqual(self._create(13, 12, [self.sala.pk]).status_code, 400)
+
+    def test_patch_checks_conflicts(self):
+        event = self._existing(13, 14)
+        url = reverse('event-detail', args=[event.pk])
+        response = self.client.patch(url, {'start_datetime': f'{self.day.isoformat()}T11:00:00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual([c['id_event'] for c in response.json()['conflicts']], [self.existing.pk])
+        event.refresh_from_db()
+        self.assertEqual(event.start_datetime, self._at(13))
+
+        response = self.client.patch(url, {'start_datetime': f'{self.day.isoformat()}T12:00:00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        response = self.client.patch(url, {'end_datetime': f'{self.day.isoformat()}T11:00:00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_patch_reactivation_checks_conflicts(self):
+        event = self._existing(11, 13, status=StatusEvent.REJECT)
+        url = reverse('event-detail', args=[event.pk])
+        response = self.client.patch(url, {'status': StatusEvent.CONFIRMED}, content_type='application/json')
+        self.assertEqual(response.status_code, 409, response.content)
+        event.refresh_from_db()
+        self.assertEqual(event.status, StatusEvent.REJECT)
+        # Otros cambios de un evento inactivo no se revisan
+        response = self.client.patch(url, {'title': 'Renombrado'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_check_cost_independent_of_history(self):
+        from core.conflicts import check_conflicts
+        base = self._at(0) + timedelta(days=1)
+        events = Event.objects.bulk_create([
+            Event(title=f'H{i}', start_datetime=base + timedelta(hours=2 * i), end_datetime=base + timedelta(hours=2 * i + 1),
+                  created_by=self.user, status=StatusEvent.CONFIRMED)
+            for i in range(500)
+        ])
+        EventSpace.objects.bulk_create([EventSpace(event=event, workspace=self.sala) for event in events])
+        # Bloqueo de espacios + búsqueda de choques
+        with self.assertNumQueries(2):
+            check_conflicts([self.sala.pk], base + timedelta(hours=1), base + timedelta(hours=2))
+
+
+@override_settings(SCHEDULING_CALENDAR_INDEX={'ENABLED': True, 'TTL': None, 'SYNC': None})
+class CalendarIndexTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.base = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def setUp(self):
+        from events_service.services.calendar_index import get_calendar_index
+        self.index = get_calendar_index()
+        self.index.clear()
+
+    def _indexed(self, hours, length, *spaces, status=StatusEvent.CONFIRMED):
+        """Evento `hours` horas después de `base`, con las señales del índice ya ejecutadas."""
+        start = self.base + timedelta(hours=hours)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._event(start, start + timedelta(hours=length), *spaces, status=status)
+
+    def _ids(self, result):
+        return {workspace_id: [event_id for _, _, event_id in items] for workspace_id, items in result.items()}
+
+    def test_interval_tree(self):
+        from events_service.services.calendar_index import IntervalTree
+        rng = random.Random(0)
+        intervals = set()
+        tree = IntervalTree()
+        for event_id in range(400):
+            start = rng.randrange(1000)
+            interval = (start, start + rng.randrange(1, 50), event_id)
+            intervals.add(interval)
+            tree.add(*interval)
+        for interval in rng.sample(sorted(intervals), 150):
+            intervals.discard(interval)
+            tree.remove(*interval)
+        self.assertEqual(len(tree), len(intervals))
+        self.assertEqual(list(tree), sorted(intervals))
+        for _ in range(200):
+            start = rng.randrange(1000)
+            end = start + rng.randrange(1, 40)
+            self.assertEqual(tree.overlapping(start, end), sorted(i for i in intervals if i[0] < end and i[1] > start))
+            self.assertEqual(tree.at(start), sorted(i for i in intervals if i[0] <= start < i[1]))
+
+    def test_loaded_once_and_kept_current_by_signals(self):
+        first = self._indexed(0, 2, self.sala)
+        with self.assertNumQueries(1):
+            result = self.index.overlapping([self.sala.pk, self.lab.pk], self.base, self.base + timedelta(days=1))
+        self.assertEqual(self._ids(result), {self.sala.pk: [first.pk], self.lab.pk: []})
+
+        second = self._indexed(3, 1, self.sala, self.lab)
+        self._indexed(5, 1, self.lab, status=StatusEvent.CANCELL)
+        with self.assertNumQueries(0):
+            result = self.index.overlapping([self.sala.pk, self.lab.pk], self.base, self.base + timedelta(days=1))
+            current = self.index.at([self.sala.pk], self.base + timedelta(hours=3, minutes=30))
+        self.assertEqual(self._ids(result), {self.sala.pk: [first.pk, second.pk], self.lab.pk: [second.pk]})
+        self.assertEqual(self._ids(current), {self.sala.pk: [second.pk]})
+
+        # Cambio de horario, cancelación y eliminación
+        with self.captureOnCommitCallbacks(execute=True):
+            first.start_datetime += timedelta(hours=10)
+            first.end_datetime += timedelta(hours=10)
+            first.save()
+            second.status = StatusEvent.CANCELL
+            second.save()
+        result = self.index.overlapping([self.sala.pk], self.base, self.base + timedelta(hours=6))
+        self.assertEqual(self._ids(result), {self.sala.pk: []})
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.index.verify(), {"faltantes": [], "sobrantes": [], "distintos": []})
+        self.assertEqual(len(self.index._events), 0)
+
+    def test_verify_detects_changes_without_signals(self):
+        event = self._indexed(0, 1, self.sala)
+        self.index.load()
+        Event.objects.filter(pk=event.pk).update(end_datetime=event.end_datetime + timedelta(hours=1))
+        self.assertEqual(self.index.verify()["distintos"], [event.pk])
+
+    def test_sync_picks_up_changes_from_other_processes(self):
+        event = self._indexed(0, 1, self.sala)
+        self.index.load()
+        self.index.sync = 0
+        # Como lo haría el servicio de gestión: sin señales en este proceso
+        moved = event.start_datetime + timedelta(hours=4)
+        Event.objects.filter(pk=event.pk).update(
+            start_datetime=moved, end_datetime=moved + timedelta(hours=1), updated_at=timezone.now(),
+        )
+        result = self.index.overlapping([self.sala.pk], self.base, self.base + timedelta(days=1))
+        self.assertEqual([start for start, _, _ in result[self.sala.pk]], [moved])
+        self.assertEqual(self.index.verify()["distintos"], [])
+
+        self.index.sync = 60
+        with self.assertNumQueries(0):
+            # Dentro del intervalo de revisión no se consulta la base de datos
+            self.index.overlapping([self.sala.pk], self.base, self.base + timedelta(days=1))
+
+    def test_availability_uses_index(self):
+        self._indexed(2, 1, self.sala)
+        day = timezone.localtime(self.base).date()
+        params = {'spaces': str(self.sala.pk), 'from': day.isoformat(), 'to': (day + timedelta(days=2)).isoformat()}
+        expected = self.client.get(reverse('availability'), params).json()
+        with override_settings(SCHEDULING_CALENDAR_INDEX={'ENABLED': False}):
+            self.assertEqual(self.client.get(reverse('availability'), params).json(), expected)
+
+
+class _ScriptStub(BaseHTTPRequestHandler):
+    """Imita el script de Google: responde según `server.responses` (código, cuerpo)."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        code, payload = self.server.responses.pop(0) if self.server.responses else self.server.default
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class InvitationOutboxTests(SchedulingTestCase):
+    SUCCESS = (200, {"status": "success", "form_public_link": "https://forms.example.com/p/1",
+                     "form_edit_link": "https://forms.example.com/e/1"})
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ScriptStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.script_url = f"http://127.0.0.1:{cls.server.server_address[1]}/exec"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.responses = []
+        self.server.default = self.SUCCESS
+        settings_override = override_settings(
+            GOOGLE_SCRIPT_URL=self.script_url,
+            SCHEDULING_OUTBOX={'MAX_ATTEMPTS': 3, 'BACKOFF_BASE': 10, 'BACKOFF_MAX': 60},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _create(self):
+        day = (timezone.localtime() + timedelta(days=5)).date().isoformat()
+        return self.client.post(reverse('event-list'), {
+            'title': 'Charla', 'created_by': self.user.pk, 'create_invitation': True,
+            'start_datetime': f'{day}T10:00:00', 'end_datetime': f'{day}T11:00:00',
+            'detail': {'attendees': 5}, 'spaces': [self.sala.pk],
+        }, content_type='application/json')
+
+    def test_create_does_not_call_script(self):
+        response = self._create()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(response.json()['invitation_pending'])
+        self.assertEqual(self.server.requests, [])
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.kind, message.event_id), (OutboxMessage.INVITATION_FORM, response.json()['id_event']))
+
+    def test_worker_writes_links(self):
+        event_id = self._create().json()['id_event']
+        self.assertEqual(process_outbox(), {"procesados": 1, "reintentos": 0, "fallidos": 0})
+        self.assertEqual(self.server.requests, [{"event_name": "Charla"}])
+        event = Event.objects.get(pk=event_id)
+        self.assertEqual(event.form_public_link, "https://forms.example.com/p/1")
+        self.assertEqual(event.form_edit_link, "https://forms.example.com/e/1")
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxStatus.DONE)
+        # Nada más pendiente
+        self.assertEqual(process_outbox(), {"procesados": 0, "reintentos": 0, "fallidos": 0})
+
+    def test_retries_with_backoff_then_fails(self):
+        self._create()
+        self.server.default = (500, {"status": "error"})
+        before = timezone.now()
+        self.assertEqual(process_outbox()["reintentos"], 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), (OutboxStatus.PENDING, 1))
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=7))
+        self.assertIn('500', message.last_error)
+        # No vencido: no se reintenta todavía
+        self.assertEqual(process_outbox()["reintentos"], 0)
+
+        for expected in ("reintentos", "fallidos"):
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(process_outbox()[expected], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxStatus.FAILED, 3))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_script_error_then_success(self):
+        self._create()
+        self.server.responses = [(200, {"status": "error", "message": "cuota"})]
+        self.assertEqual(process_outbox()["reintentos"], 1)
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_outbox()["procesados"], 1)
+        self.assertIsNotNone(Event.objects.get().form_public_link)
+
+    def test_generate_invitation_enqueues_once(self):
+        event_id = self._create().json()['id_event']
+        url = reverse('event-generate-invitation', args=[event_id])
+        self.assertEqual(self.client.post(url).status_code, 202)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        process_outbox()
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+
+class StatusSchedulerTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.now = timezone.now().replace(microsecond=0)
+
+    def _between(self, start_minutes, end_minutes, status=StatusEvent.CONFIRMED):
+        """Evento sin espacios entre `now + start_minutes` y `now + end_minutes`."""
+        return self._event(self.now + timedelta(minutes=start_minutes), self.now + timedelta(minutes=end_minutes), status=status)
+
+    def _status(self, event):
+        return Event.objects.values_list('status', flat=True).get(pk=event.pk)
+
+    def test_catch_up_is_idempotent(self):
+        finished = self._between(-120, -60, StatusEvent.IN_COURSE)
+        running = self._between(-10, 50, StatusEvent.AGENDED)
+        future = self._between(30, 90)
+        cancelled = self._between(-120, -60, StatusEvent.CANCELL)
+        received = []
+
+        def receiver(sender, event_ids, status, **kwargs):
+            received.append((status, sorted(event_ids)))
+        event_status_changed.connect(receiver)
+        self.addCleanup(event_status_changed.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            applied = catch_up(self.now)
+        self.assertEqual(applied, {StatusEvent.COMPLETED: [finished.pk], StatusEvent.IN_COURSE: [running.pk]})
+        self.assertEqual(
+            [self._status(e) for e in (finished, running, future, cancelled)],
+            [StatusEvent.COMPLETED, StatusEvent.IN_COURSE, StatusEvent.CONFIRMED, StatusEvent.CANCELL],
+        )
+        self.assertEqual(sorted(received), [(StatusEvent.IN_COURSE, [running.pk]), (StatusEvent.COMPLETED, [finished.pk])])
+        self.assertEqual(catch_up(self.now), {StatusEvent.COMPLETED: [], StatusEvent.IN_COURSE: []})
+
+    def test_scheduler_applies_boundaries_from_heap(self):
+        clock = [self.now]
+        scheduler = StatusScheduler(config={'BATCH_SIZE': 2, 'LOOKAHEAD': 3600, 'RELOAD': 600}, clock=lambda: clock[0])
+        events = [self._between(5 + i, 20 + i) for i in range(3)]
+        late = self._between(120, 180)
+        scheduler.tick()
+        self.assertEqual(scheduler.next_wakeup(), self.now + timedelta(minutes=5))
+
+        clock[0] = self.now + timedelta(minutes=7)
+        with CaptureQueriesContext(connection) as ctx:
+            applied = scheduler.run_pending(clock[0])
+        # Lotes de hasta 2 eventos: un UPDATE por lote
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 2)
+        self.assertEqual(sorted(applied[StatusEvent.IN_COURSE]), [e.pk for e in events])
+
+        # Un evento editado después de cargarse el heap no se adelanta
+        Event.objects.filter(pk=events[2].pk).update(end_datetime=self.now + timedelta(minutes=40))
+        clock[0] = self.now + timedelta(minutes=25)
+        applied = scheduler.tick()
+        self.assertEqual(sorted(applied[StatusEvent.COMPLETED]), [events[0].pk, events[1].pk])
+        self.assertEqual(self._status(events[2]), StatusEvent.IN_COURSE)
+        self.assertEqual(self._status(late), StatusEvent.CONFIRMED)
+
+    @override_settings(EVENT_STATUS_SCHEDULER={'ENABLED': True})
+    def test_scheduled_events_filter_by_status(self):
+        current = self._between(-10, 50, StatusEvent.IN_COURSE)
+        future = self._between(60 * 24 * 2, 60 * 24 * 2 + 60)
+        self._between(-120, -60, StatusEvent.COMPLETED)
+        ids = [e['id_event'] for e in self.client.get(reverse('scheduled-events')).json()['events']]
+        self.assertEqual(ids, [current.pk, future.pk])
+
+
+class CalendarFeedTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.events = [
+            cls._event(start + timedelta(hours=3 * i), start + timedelta(hours=3 * i + 1), space, title=f'Charla {i}; parte, uno')
+            for i, space in enumerate((cls.sala, cls.sala, cls.lab))
+        ]
+        EventDetail.objects.create(event=cls.events[0], attendees=5, description='Línea 1\nLínea 2 ' + 'x' * 80)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('workspace-calendar', args=[self.sala.pk])
+
+    def test_workspace_feed(self):
+        response = self.client.get(self.url + '/', HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:Charla 0\\; parte\\, uno\r\n', body)
+        self.assertIn('X-WR-CALNAME:Sala\r\n', body)
+        self.assertIn('ORGANIZER:mailto:coordinador@example.com', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+        unfolded = body.replace('\r\n ', '')
+        self.assertIn('DESCRIPTION:Línea 1\\nLínea 2 ' + 'x' * 80, unfolded)
+
+    def test_user_feed(self):
+        body = self.client.get(reverse('user-calendar', args=[self.user.pk])).content.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertEqual(self.client.get(reverse('user-calendar', args=[999])).status_code, 404)
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with self.assertNumQueries(2):
+            # Espacio + versiones: sin generar el calendario
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # Un cambio en el detalle cambia el ETag
+        EventDetail.objects.filter(event=self.events[0]).get().save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_if_modified_since_after_delete(self):
+        response = self.client.get(self.url)
+        self.events[1].delete()
+        # Sin ETag el cliente sólo tiene la fecha: el conjunto más chico debe descargarse
+        changed = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.content.decode().count('BEGIN:VEVENT'), 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=changed['Last-Modified']).status_code, 304)
+
+    def test_only_changed_events_are_rendered(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            # Todos los bloques en caché
+            self.client.get(self.url)
+        event = self.events[1]
+        event.title = 'Renombrado'
+        event.save()
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get(self.url).content.decode()
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertIn(f'IN ({event.pk})', ctx.captured_queries[-1]['sql'])
+        self.assertIn('SUMMARY:Renombrado', body)
+        self.assertIn('SUMMARY:Charla 0', body)
+
+
+class EventStreamTests(SchedulingTestCase):
+
+    def setUp(self):
+        self.broker = ChangeBroker(buffer_size=3, poll_interval=0)
+        stream._broker = self.broker
+        self.addCleanup(setattr, stream, '_broker', None)
+
+    def _listen(self, workspace_ids=None):
+        """Suscriptor cuyo loop no corre: basta para que el broker publique."""
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = Subscription(self.broker, workspace_ids, loop)
+        self.broker._subscribers.add(subscription)
+        return subscription
+
+    def _published(self):
+        return [(kind, data['id_event']) for _, _, kind, data, _ in self.broker._buffer]
+
+    def test_signals_publish_changes(self):
+        self._listen()
+        start = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(title='Charla', start_datetime=start, end_datetime=start + timedelta(hours=1),
+                                         created_by=self.user)
+            EventSpace.objects.bulk_create([EventSpace(event=event, workspace=self.sala)])
+        created = self.broker._buffer[-1]
+        self.assertEqual(created[2], 'created')
+        self.assertEqual(created[3]['event']['spaces'], [self.sala.pk])
+        self.assertEqual(created[4], {self.sala.pk})
+
+        # Misma versión (p. ej. vista por el poller): no se repite
+        self.broker.poll_once(start - timedelta(days=2))
+        self.assertEqual(self._published(), [('created', event.pk)])
+
+        event_id = event.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        self.assertEqual(self.broker._buffer[-1][2:], ('deleted', {'type': 'deleted', 'id_event': event_id, 'event': None}, {self.sala.pk}))
+
+    def test_replay_and_reset(self):
+        async def scenario():
+            broker = self.broker
+            first = broker.publish('updated', 1, {}, [self.sala.pk])
+            broker.publish('updated', 2, {}, [self.lab.pk])
+            broker.publish('updated', 3, {}, [self.sala.pk])
+
+            _, missed, _ = broker.subscribe([self.sala.pk], first)
+            self.assertEqual([m[3]['id_event'] for m in missed], [3])
+            _, missed, latest = broker.subscribe(None, f'{broker.boot}-3')
+            self.assertEqual((missed, latest), ([], f'{broker.boot}-3'))
+            # Otro arranque o fuera del buffer (tamaño 3): reset
+            self.assertIsNone(broker.subscribe(None, 'otro-1')[1])
+            broker.publish('updated', 4, {}, [self.sala.pk])
+            self.assertEqual(len(broker.subscribe(None, first)[1]), 3)
+            broker.publish('updated', 5, {}, [self.sala.pk])
+            self.assertIsNone(broker.subscribe(None, first)[1])
+            # Cambios sin suscriptores: hueco
+            broker._subscribers.clear()
+            broker.mark_gap()
+            self.assertIsNone(broker.subscribe(None, f'{broker.boot}-5')[1])
+        asyncio.run(scenario())
+
+    def test_stream_messages(self):
+        async def scenario():
+            messages = stream_messages(self.broker, [self.sala.pk], heartbeat=0.05)
+            self.assertTrue((await anext(messages)).startswith('retry:'))
+            self.assertEqual(await anext(messages), ': heartbeat\n\n')
+            self.broker.publish('updated', 7, None, [self.lab.pk])
+            message_id = self.broker.publish('status', 8, {'status': 3}, [self.sala.pk])
+            self.assertEqual(
+                await anext(messages),
+                f'id: {message_id}\nevent: status\ndata: {{"type": "status", "id_event": 8, "event": {{"status": 3}}}}\n\n',
+            )
+            await messages.aclose()
+            self.assertEqual(self.broker.subscriber_count, 0)
+        asyncio.run(scenario())
+
+    def test_slow_client_gets_reset(self):
+        async def scenario():
+            broker = ChangeBroker(buffer_size=3, poll_interval=0, queue_size=2)
+            messages = stream_messages(broker, heartbeat=5)
+            await anext(messages)
+            for event_id in (1, 2, 3):
+                broker.publish('updated', event_id, {}, [self.sala.pk])
+            # Las entregas se encolan con call_soon_threadsafe
+            await asyncio.sleep(0)
+            self.assertEqual(await anext(messages), format_message(f'{broker.boot}-3', 'reset', {'type': 'reset'}))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(messages)
+            self.assertEqual(broker.subscriber_count, 0)
+        asyncio.run(scenario())
+
+    def test_poller_publishes_remote_deletes(self):
+        start = timezone.now() + timedelta(days=1)
+        event = self._event(start, start + timedelta(hours=1), self.sala, title='Charla')
+        self._listen()
+        since = self.broker.poll_once(timezone.now())
+        event_id = event.pk
+        # Eliminado por otro proceso: sin broker, las señales no publican nada
+        stream._broker = None
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        stream._broker = self.broker
+        self.assertEqual(self._published(), [])
+
+        self.broker.poll_once(since)
+        self.assertEqual(self.broker._buffer[-1][2:], ('deleted', {'type': 'deleted', 'id_event': event_id, 'event': None}, {self.sala.pk}))
+        # La señal local de la misma eliminación no la repite
+        self.broker.publish_deleted(event_id, [self.sala.pk])
+        self.assertEqual(self._published(), [('deleted', event_id)])
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(reverse('event-stream')).status_code, 501)
+
+    async def test_asgi_response(self):
+        response = await self.async_client.get(reverse('event-stream'), {'spaces': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get(reverse('event-stream'), headers={'Last-Event-ID': 'otro-3'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertIn(b'event: reset', await anext(chunks))
+        await chunks.aclose()
+
+
+@override_settings(SCHEDULING_CALENDAR_INDEX={'ENABLED': False})
+class RecurringEventTests(SchedulingTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        today = timezone.localtime().date()
+        # Lunes de la semana siguiente
+        cls.monday = today + timedelta(days=7 - today.weekday())
+
+    @classmethod
+    def _at(cls, day, hour):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def _create(self, day, h1, h2, spaces, recurrence=None, title='Taller'):
+        data = {
+            'title': title, 'created_by': self.user.pk,
+            'start_datetime': f'{day.isoformat()}T{h1:02d}:00:00',
+            'end_datetime': f'{day.isoformat()}T{h2:02d}:00:00',
+            'detail': {'attendees': 5}, 'spaces': spaces,
+        }
+        if recurrence:
+            data['recurrence'] = recurrence
+        return self.client.post(reverse('event-list'), data, content_type='application/json')
+
+    def _series(self, recurrence='FREQ=WEEKLY;BYDAY=MO,WE;COUNT=6'):
+        response = self._create(self.monday, 10, 12, [self.sala.pk], recurrence)
+        self.assertEqual(response.status_code, 201, response.content)
+        return Event.objects.get(pk=response.json()['id_event'])
+
+    def _activity(self, **params):
+        params.setdefault('from', self.monday.isoformat())
+        params.setdefault('to', (self.monday + timedelta(days=28)).isoformat())
+        return self.client.get(reverse('future-activity'), params).json()
+
+    def test_rrule_subset(self):
+        from core.recurrence import RecurrenceError, format_rrule, parse_rrule
+        from core.models import EventRecurrence
+        rule = parse_rrule('RRULE:freq=weekly;interval=2;byday=WE,MO;until=20300101T000000Z')
+        self.assertEqual((rule['frequency'], rule['interval'], rule['weekdays']), ('WEEKLY', 2, 'MO,WE'))
+        self.assertEqual(format_rrule(EventRecurrence(**rule)), 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20300101T000000Z')
+        for text in ('', 'FREQ=YEARLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=XX', 'FREQ=DAILY;COUNT=0',
+                     'FREQ=DAILY;COUNT=2;UNTIL=20300101', 'FREQ=DAILY;BYMONTH=1', 'FREQ=DAILY;;'):
+            with self.assertRaises(RecurrenceError, msg=text):
+                parse_rrule(text)
+
+    def test_expansion_jumps_to_window(self):
+        from core.models import EventRecurrence
+        from core.recurrence import iter_starts
+        start = self._at(self.monday, 10)
+        weekly = EventRecurrence(frequency='WEEKLY', interval=2, weekdays='MO,WE', count=2000)
+        # Lejos del inicio: se salta al periodo de la ventana sin recorrer los anteriores
+        after = start + timedelta(weeks=1000)
+        starts = list(iter_starts(weekly, start, after=after))
+        self.assertEqual(len(starts), 2000 - 1000)
+        self.assertEqual(starts[0], self._at(self.monday + timedelta(weeks=1000), 10))
+        self.assertEqual(starts[-1], self._at(self.monday + timedelta(weeks=1998, days=2), 10))
+        daily = EventRecurrence(frequency='DAILY', interval=3, count=10)
+        self.assertEqual(list(iter_starts(daily, start, after=start + timedelta(days=25))), [start + timedelta(days=27)])
+        monthly = EventRecurrence(frequency='MONTHLY', count=3)
+        jan31 = timezone.make_aware(datetime(2031, 1, 31, 9))
+        self.assertEqual([d.month for d in iter_starts(monthly, jan31)], [1, 3, 5])
+
+    def test_future_activity_expands_occurrences(self):
+        series = self._series()
+        self.assertEqual(Event.objects.count(), 1)
+        data = self._activity()
+        starts = [e['start_datetime'] for e in data['events']]
+        self.assertEqual(len(starts), 6)
+        self.assertEqual(starts[:2], [f'{self.monday.isoformat()}T10:00:00', f'{(self.monday + timedelta(days=2)).isoformat()}T10:00:00'])
+        self.assertEqual({e['id_event'] for e in data['events']}, {series.pk})
+        self.assertEqual(data['events'][1]['original_start'], starts[1])
+
+        # Intercalado con eventos simples y paginado por cursor
+        self._create(self.monday + timedelta(days=1), 10, 12, [self.sala.pk], title='Simple')
+        seen, params = [], {'limit': 3, 'compact': 'true'}
+        for _ in range(5):
+            data = self._activity(**params)
+            seen += [e['start'] for e in data['events']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_scheduled_events_expand_series(self):
+        from core.models import EventOccurrenceException, EventRecurrence
+        today = timezone.localtime().date()
+        # Serie diaria que empezó hace tres días: su fila base ya pasó
+        series = self._event(self._at(today - timedelta(days=3), 1), self._at(today - timedelta(days=3), 2), title='Diaria')
+        EventRecurrence.objects.create(event=series, frequency='DAILY')
+
+        with self.assertNumQueries(2):
+            events = self.client.get(reverse('scheduled-events'), {'today': 'true'}).json()['events']
+        self.assertEqual([e['start_datetime'] for e in events], [f'{today.isoformat()}T01:00:00'])
+        self.assertEqual(events[0]['original_start'], events[0]['start_datetime'])
+
+        # Sin `today`: la ocurrencia en curso o la próxima, no la fila base
+        upcoming = today if timezone.now() < self._at(today, 2) else today + timedelta(days=1)
+        events = self.client.get(reverse('scheduled-events')).json()['events']
+        self.assertEqual([e['start_datetime'] for e in events], [f'{upcoming.isoformat()}T01:00:00'])
+
+        EventOccurrenceException.objects.create(event=series, original_start=self._at(upcoming, 1), cancelled=True)
+        events = self.client.get(reverse('scheduled-events')).json()['events']
+        following = upcoming + timedelta(days=1)
+        self.assertEqual([e['start_datetime'] for e in events], [f'{following.isoformat()}T01:00:00'])
+
+    def test_conflicts_with_occurrences(self):
+        self._series()
+        # Un evento simple sobre la tercera ocurrencia
+        response = self._create(self.monday + timedelta(days=7), 11, 13, [self.sala.pk])
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(response.json()['conflicts'][0]['original_start'], f'{(self.monday + timedelta(days=7)).isoformat()}T10:00:00')
+        response = self._create(self.monday + timedelta(days=7), 12, 13, [self.sala.pk])
+        self.assertEqual(response.status_code, 201, response.content)
+        # Una serie nueva que choca con ese evento en su segunda semana
+        response = self._create(self.monday, 12, 13, [self.sala.pk], 'FREQ=WEEKLY')
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(self._create(self.monday, 13, 14, [self.sala.pk], 'FREQ=DAILY').status_code, 201)
+        self.assertEqual(self._create(self.monday, 10, 11, [self.lab.pk], 'FREQ=DAILY;BYDAY=MO').status_code, 400)
+
+    def test_occurrence_exceptions(self):
+        series = self._series()
+        url = reverse('event-occurrences', args=[series.pk])
+        wednesday = self.monday + timedelta(days=2)
+        cancel = self.client.post(url, {'original_start': f'{self.monday.isoformat()}T10:00:00', 'cancelled': True},
+                                  content_type='application/json')
+        self.assertEqual(cancel.status_code, 200, cancel.content)
+        moved = self.client.post(url, {
+            'original_start': f'{wednesday.isoformat()}T10:00:00',
+            'start_datetime': f'{wednesday.isoformat()}T15:00:00',
+        }, content_type='application/json')
+        self.assertEqual(moved.json()['end_datetime'], f'{wednesday.isoformat()}T17:00:00')
+        not_an_occurrence = self.client.post(url, {'original_start': f'{wednesday.isoformat()}T11:00:00', 'cancelled': True},
+                                             content_type='application/json')
+        self.assertEqual(not_an_occurrence.status_code, 404)
+
+        starts = [e['start_datetime'] for e in self._activity()['events']]
+        self.assertEqual(len(starts), 5)
+        self.assertEqual(starts[0], f'{wednesday.isoformat()}T15:00:00')
+        listing = self.client.get(url, {'from': self.monday.isoformat(), 'to': (self.monday + timedelta(days=7)).isoformat()}).json()
+        self.assertEqual(listing['cancelled'], [f'{self.monday.isoformat()}T10:00:00'])
+        self.assertTrue(listing['occurrences'][0]['modified'])
+
+        # Disponibilidad: el lunes cancelado queda libre, el miércoles ocupado a las 15:00
+        availability = self.client.get(reverse('availability'), {
+            'spaces': str(self.sala.pk), 'from': self.monday.isoformat(),
+            'to': (self.monday + timedelta(days=3)).isoformat(), 'open': '08:00', 'close': '18:00',
+        }).json()
+        slots = [(x['start'][:16], x['end'][11:16]) for x in availability['spaces'][0]['slots']]
+        self.assertEqual(slots[0], (f'{self.monday.isoformat()}T08:00', '18:00'))
+        self.assertIn((f'{wednesday.isoformat()}T08:00', '15:00'), slots)
+
+        restore = self.client.post(url, {'original_start': f'{self.monday.isoformat()}T10:00:00', 'restore': True},
+                                   content_type='application/json')
+        self.assertEqual(restore.status_code, 200)
+        self.assertEqual(len(self._activity()['events']), 6)
+
+    def test_calendar_feed_and_index(self):
+        from events_service.services.calendar_index import CalendarIndex
+        series = self._series('FREQ=WEEKLY;BYDAY=MO')
+        self.client.post(reverse('event-occurrences', args=[series.pk]), {
+            'original_start': f'{(self.monday + timedelta(days=7)).isoformat()}T10:00:00', 'cancelled': True,
+        }, content_type='application/json')
+        cache.clear()
+        body = self.client.get(reverse('workspace-calendar', args=[self.sala.pk])).content.decode()
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO', body)
+        self.assertIn(f"EXDATE;TZID={settings.TIME_ZONE}:", body)
+        # Cada TZID usado tiene su definición en el calendario
+        self.assertEqual(body.count('BEGIN:VTIMEZONE'), 1)
+        self.assertIn(f"BEGIN:VTIMEZONE\r\nTZID:{settings.TIME_ZONE}\r\n", body)
+        self.assertLess(body.index('END:VTIMEZONE'), body.index('BEGIN:VEVENT'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+
+        index = CalendarIndex()
+        window = (self._at(self.monday, 0), self._at(self.monday + timedelta(days=21), 0))
+        result = index.overlapping([self.sala.pk, self.lab.pk], *window)
+        self.assertEqual([start for start, _, _ in result[self.sala.pk]],
+                         [self._at(self.monday, 10), self._at(self.monday + timedelta(days=14), 10)])
+        self.assertEqual(result[self.lab.pk], [])
+        self.assertEqual(index.verify(), {"faltantes": [], "sobrantes": [], "distintos": []})
 
-# Create your tests here.
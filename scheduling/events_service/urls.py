@@ -1,6 +1,9 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
-from .views import EventViewSet, get_future_activity, get_scheduled_events
+from .views import (
+    EventViewSet, event_stream, get_availability, get_future_activity, get_scheduled_events, user_calendar,
+    workspace_calendar,
+)
 
 router = DefaultRouter()
 router.register(r'events', EventViewSet, basename='event')
@@ -9,4 +12,9 @@ urlpatterns = [
     path('event/', include(router.urls)),
     path('future-activity/', get_future_activity, name='future-activity'),
     path('scheduled-events/', get_scheduled_events, name='scheduled-events'),
+    path('availability/', get_availability, name='availability'),
+    path('stream/', event_stream, name='event-stream'),
+    # El gateway agrega siempre una barra final: se acepta con y sin ella
+    re_path(r'^calendar/workspaces/(?P<workspace_id>\d+)\.ics/?$', workspace_calendar, name='workspace-calendar'),
+    re_path(r'^calendar/users/(?P<user_id>\d+)\.ics/?$', user_calendar, name='user-calendar'),
 ]
\ No newline at end of file
@@ -3,23 +3,46 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
-from core.models import Event, Workspace, EventSpace, StatusEvent, EventDetail
+from django.utils.dateparse import parse_date, parse_datetime
+from core.models import (
+    ACTIVE_STATUSES, Event, Workspace, EventSpace, StatusEvent, EventDetail, EventOccurrenceException, EventRecurrence,
+)
+from core.conflicts import (
+    EventConflict, check_conflicts, check_event_change, check_series_conflicts, conflict_payload,
+)
+from core.recurrence import (
+    RecurrenceError, expand, expand_event, format_rrule, is_occurrence, load_exceptions, next_occurrence,
+    occurrence_event, parse_rrule, series_filter, series_in_window,
+)
 from core.serializers import EventSerializer, EventDetailSerializer, EventSpaceSerializer
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .services.google_forms import create_event_form
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.db.models import Prefetch, Q
+from datetime import datetime, time, timedelta
+import base64
+import heapq
+from .services.ics import feed_response
+from .services.outbox import enqueue_invitation
+from .services.stream import get_broker, get_stream_config, stream_messages
+from .services.status_scheduler import scheduler_enabled
+from .services.availability import find_availability, get_opening_hours
 
 
 def _enrich_event_data(event_data, event_instance):
     """
     Enriquece los datos del evento con información adicional de EventDetail.
     Elimina campos sensibles y agrega descripción, tipo de evento y email del creador.
+
+    `event_instance` debe venir con `select_related('eventdetail', 'created_by')`
+    para no generar consultas adicionales por evento.
     """
     # Obtener EventDetail si existe
     try:
-        event_detail = EventDetail.objects.get(event=event_instance)
+        event_detail = event_instance.eventdetail
         event_data['event_type'] = event_detail.event_type
         event_data['description'] = event_detail.description
     except EventDetail.DoesNotExist:
@@ -71,9 +94,33 @@ class EventViewSet(viewsets.ModelViewSet):
             return Response({"error": "Algunos espacios no existen.", "missing_space_ids": list(missing)},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        start = serializer.validated_data['start_datetime']
+        end = serializer.validated_data['end_datetime']
+        if end <= start:
+            return Response({"error": "La fecha de término debe ser posterior a la de inicio."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Regla de repetición opcional (subconjunto de RRULE, ver core/recurrence.py)
+        recurrence = None
+        if request.data.get("recurrence"):
+            try:
+                recurrence = EventRecurrence(**parse_rrule(request.data["recurrence"]))
+            except RecurrenceError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if recurrence.until is not None and recurrence.until < start:
+                return Response({"error": "UNTIL debe ser posterior al inicio del evento."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
         #* Todo validado: crear registros dentro de una transacción atómica
         try:
             with transaction.atomic():
+                # Bloquea los espacios y rechaza el evento si choca con otro activo
+                if serializer.validated_data.get('status', StatusEvent.AGENDED) in ACTIVE_STATUSES:
+                    if recurrence is not None:
+                        check_series_conflicts(existing_space_ids, start, end, recurrence)
+                    else:
+                        check_conflicts(existing_space_ids, start, end)
+
                 event = serializer.save()
 
                 # Guardar detalle asociándolo al evento creado
@@ -87,14 +134,17 @@ class EventViewSet(viewsets.ModelViewSet):
                 event_space_objs = [EventSpace(event=event, workspace_id=wid) for wid in existing_space_ids]
                 EventSpace.objects.bulk_create(event_space_objs)
 
-                # Si se solicita crear invitación externa
+                if recurrence is not None:
+                    recurrence.event = event
+                    recurrence.save()
+
+                # La invitación externa se crea en segundo plano (outbox), sin
+                # mantener la transacción abierta durante la llamada al script
                 if create_invitation:
-                    result = create_event_form(event.title)
-                    if result:
-                        event.form_edit_link = result.get("edit_link")
-                        event.form_public_link = result.get("public_link")
-                        event.save()
+                    enqueue_invitation(event)
 
+        except EventConflict as conflict:
+            return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({"error": "Error al crear el evento.", "details": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -103,9 +153,42 @@ class EventViewSet(viewsets.ModelViewSet):
         response_data.update({
             'detail': EventDetailSerializer(event_detail).data,
             'spaces': existing_space_ids,
+            'recurrence': format_rrule(recurrence) if recurrence is not None else None,
+            'invitation_pending': create_invitation,
         })
         return Response(response_data, status=status.HTTP_201_CREATED)
     
+    def update(self, request, *args, **kwargs):
+        """
+        PUT / PATCH del evento. Si cambia el horario o el evento vuelve a un estado
+        activo se revisan los choques en sus espacios (409), igual que al crearlo;
+        en una serie el cambio se aplica a todas sus ocurrencias.
+        """
+        partial = kwargs.pop('partial', False)
+        event = self.get_object()
+        serializer = self.get_serializer(event, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        serializer.validated_data.pop('create_invitation', None)
+
+        start = serializer.validated_data.get('start_datetime', event.start_datetime)
+        end = serializer.validated_data.get('end_datetime', event.end_datetime)
+        if end <= start:
+            return Response({"error": "La fecha de término debe ser posterior a la de inicio."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        moved = (start, end) != (event.start_datetime, event.end_datetime)
+
+        try:
+            with transaction.atomic():
+                check_event_change(event, start, end, serializer.validated_data.get('status', event.status))
+                event = serializer.save()
+                recurrence = getattr(event, 'recurrence', None)
+                if moved and recurrence is not None:
+                    recurrence.save(update_fields=['last_end', 'updated_at'])
+        except EventConflict as conflict:
+            return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
+
+        return Response(serializer.data)
+
     @action(detail=True, methods=['POST'])
     def generate_invitation(self, request, pk=None):
         event = self.get_object()
@@ -113,17 +196,120 @@ class EventViewSet(viewsets.ModelViewSet):
             return Response({"message": "Invitación ya creada"},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        form_data = create_google_form(event.title)
-        if form_data:
-            event.form_public_link = form_data.get('form_public_link')
-            event.form_edit_link = form_data.get('form_edit_link')
-            event.save()
-            return Response({
-                "form_public_link": event.form_public_link,
-                "form_edit_link": event.form_edit_link
-            }, status=status.HTTP_200_OK)
+        enqueue_invitation(event)
+        return Response({"message": "Invitación en proceso"}, status=status.HTTP_202_ACCEPTED)
 
-        return Response({"message": "Error al generar invitación"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    #! /{id}/occurrences
+    @action(detail=True, methods=['GET', 'POST'])
+    def occurrences(self, request, pk=None):
+        """
+        Ocurrencias de un evento recurrente.
+
+        GET: ocurrencias que se cruzan con `from` / `to` (por defecto, desde ahora y
+        31 días; máximo 93), y las canceladas en ese rango.
+
+        POST: modifica una ocurrencia, identificada por `original_start`:
+        - {"cancelled": true} la cancela.
+        - {"start_datetime", "end_datetime"} (uno o ambos) la cambia de horario.
+        - {"restore": true} elimina el cambio y la devuelve a la regla.
+        """
+        event = self.get_object()
+        recurrence = EventRecurrence.objects.filter(event=event).first()
+        if recurrence is None:
+            return Response({"error": "El evento no es recurrente."}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'GET':
+            return self._list_occurrences(request, event, recurrence)
+
+        original_start = _parse_datetime_param(str(request.data.get('original_start') or ''))
+        if original_start is None:
+            return Response({"error": "El campo 'original_start' debe ser una fecha-hora ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not is_occurrence(recurrence, event.start_datetime, original_start):
+            return Response({"error": "La serie no tiene una ocurrencia con ese inicio."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        if request.data.get('restore'):
+            exception = EventOccurrenceException.objects.filter(event=event, original_start=original_start).first()
+            if exception is not None:
+                exception.delete()
+            return Response({"original_start": _format_datetime(original_start), "restored": True})
+
+        cancelled = bool(request.data.get('cancelled', False))
+        start = end = None
+        if not cancelled:
+            duration = event.end_datetime - event.start_datetime
+            start = original_start
+            if request.data.get('start_datetime'):
+                start = _parse_datetime_param(str(request.data['start_datetime']))
+            end = start + duration if start is not None else None
+            if request.data.get('end_datetime'):
+                end = _parse_datetime_param(str(request.data['end_datetime']))
+            if start is None or end is None:
+                return Response({"error": "Las fechas de la ocurrencia deben ser fechas-hora ISO 8601."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if end <= start:
+                return Response({"error": "La fecha de término debe ser posterior a la de inicio."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if start < event.start_datetime:
+                return Response({"error": "Una ocurrencia no puede moverse antes del inicio de la serie."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                if not cancelled and event.status in ACTIVE_STATUSES:
+                    # Las demás ocurrencias de la misma serie no se consideran choques
+                    space_ids = list(EventSpace.objects.filter(event=event).values_list('workspace_id', flat=True))
+                    check_conflicts(space_ids, start, end, exclude=event.pk)
+                exception, _ = EventOccurrenceException.objects.update_or_create(
+                    event=event, original_start=original_start,
+                    defaults={'cancelled': cancelled, 'start_datetime': start, 'end_datetime': end},
+                )
+        except EventConflict as conflict:
+            return Response(conflict_payload(conflict), status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            "original_start": _format_datetime(exception.original_start),
+            "cancelled": exception.cancelled,
+            "start_datetime": _format_datetime(exception.start_datetime) if exception.start_datetime else None,
+            "end_datetime": _format_datetime(exception.end_datetime) if exception.end_datetime else None,
+        })
+
+    def _list_occurrences(self, request, event, recurrence):
+        params = request.query_params
+        window_start = _parse_datetime_param(params['from']) if params.get('from') else timezone.now()
+        window_end = (
+            _parse_datetime_param(params['to']) if params.get('to')
+            else window_start and window_start + timedelta(days=31)
+        )
+        if window_start is None or window_end is None:
+            return Response({"error": "Los parámetros 'from' y 'to' deben ser fechas u horas ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if window_end <= window_start or window_end - window_start > timedelta(days=FUTURE_ACTIVITY_MAX_DAYS):
+            return Response({"error": f"La ventana debe ser positiva y de máximo {FUTURE_ACTIVITY_MAX_DAYS} días."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        exceptions = {exception.original_start: exception for exception in event.occurrence_exceptions.all()}
+        occurrences = expand(
+            event.pk, event.start_datetime, event.end_datetime, recurrence, exceptions, window_start, window_end,
+        )
+        return Response({
+            'recurrence': format_rrule(recurrence),
+            'from': _format_datetime(window_start),
+            'to': _format_datetime(window_end),
+            'occurrences': [
+                {
+                    'original_start': _format_datetime(occurrence.original_start),
+                    'start': _format_datetime(occurrence.start),
+                    'end': _format_datetime(occurrence.end),
+                    'modified': occurrence.modified,
+                }
+                for occurrence in occurrences
+            ],
+            'cancelled': sorted(
+                _format_datetime(original) for original, exception in exceptions.items()
+                if exception.cancelled and window_start <= original < window_end
+            ),
+        })
 
     #! /user/{user_id}
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>[^/.]+)')
@@ -139,37 +325,183 @@ class EventViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(schedules, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+FUTURE_ACTIVITY_DEFAULT_DAYS = 7
+FUTURE_ACTIVITY_MAX_DAYS = 93
+FUTURE_ACTIVITY_DEFAULT_LIMIT = 200
+FUTURE_ACTIVITY_MAX_LIMIT = 1000
+
+
+def _parse_datetime_param(value):
+    """
+    Interpreta una fecha (YYYY-MM-DD) o fecha-hora ISO 8601 de la query string.
+    Los valores sin zona horaria se asumen en la zona del proyecto. Retorna None si no es válido.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date_value = parse_date(value)
+        if date_value is None:
+            return None
+        parsed = datetime.combine(date_value, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_space_ids(value):
+    """Lista de ids separados por comas; lanza ValueError si alguno no es entero."""
+    return [int(space_id.strip()) for space_id in value.split(',') if space_id.strip()]
+
+
+def _format_datetime(value):
+    """Mismo formato que `FlexibleDateTimeField`: hora local sin sufijo de zona."""
+    return timezone.localtime(value).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _encode_cursor(event):
+    raw = f"{event.start_datetime.isoformat()}|{event.id_event}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _activity_key(event):
+    return event.start_datetime, event.id_event
+
+
+def _decode_cursor(cursor):
+    """Retorna (inicio, id) del último evento entregado, o None si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start_raw, id_raw = raw.split('|')
+        start = parse_datetime(start_raw)
+        return (start, int(id_raw)) if start is not None else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
 @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
 def get_future_activity(request):
-    now = timezone.now()
-    
-    # Traer eventos futuros o activos
-    events = Event.objects.filter(
-        Q(start_datetime__gte=now) | Q(end_datetime__gte=now)
-    )
-    
+    """
+    Obtiene los eventos que se cruzan con una ventana de tiempo.
+
+    Parámetros:
+    - from (fecha o fecha-hora ISO): inicio de la ventana. Por defecto, ahora.
+    - to (fecha o fecha-hora ISO): fin de la ventana. Por defecto, `from` + 7 días
+      (máximo 93 días).
+    - spaces (ids separados por coma): sólo eventos en alguno de esos espacios.
+    - all (bool): si es true se ignora `spaces`.
+    - limit (int): eventos por página (por defecto 200, máximo 1000).
+    - cursor: valor `next_cursor` de la página anterior.
+    - compact (bool): si es true cada evento trae sólo id, intervalo, estado y espacios.
+
+    Los eventos recurrentes aparecen una vez por ocurrencia dentro de la ventana,
+    con su horario y el campo `original_start`.
+    """
+    params = request.query_params
+
+    window_start = timezone.now()
+    if params.get('from'):
+        window_start = _parse_datetime_param(params['from'])
+        if window_start is None:
+            return Response({"error": "El parámetro 'from' debe ser una fecha u hora ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    window_end = window_start + timedelta(days=FUTURE_ACTIVITY_DEFAULT_DAYS)
+    if params.get('to'):
+        window_end = _parse_datetime_param(params['to'])
+        if window_end is None:
+            return Response({"error": "El parámetro 'to' debe ser una fecha u hora ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    if window_end <= window_start:
+        return Response({"error": "El parámetro 'to' debe ser posterior a 'from'."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if window_end - window_start > timedelta(days=FUTURE_ACTIVITY_MAX_DAYS):
+        return Response({"error": f"La ventana no puede superar {FUTURE_ACTIVITY_MAX_DAYS} días."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(params.get('limit', FUTURE_ACTIVITY_DEFAULT_LIMIT)), FUTURE_ACTIVITY_MAX_LIMIT)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "El parámetro 'limit' debe ser un entero positivo."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    events = Event.objects.all()
+
     # Filtrar por espacios si se proporcionan (no si all=true)
-    all_events = request.query_params.get('all', 'false').lower() == 'true'
+    all_events = params.get('all', 'false').lower() == 'true'
     
     if not all_events:
-        spaces_param = request.query_params.get('spaces', '')
+        spaces_param = params.get('spaces', '')
         if spaces_param:
             try:
-                space_ids = [int(space_id.strip()) for space_id in spaces_param.split(',') if space_id.strip()]
-                if space_ids:
-                    # Filtrar eventos que tengan al menos uno de los espacios solicitados
-                    events = events.filter(eventspace__workspace_id__in=space_ids).distinct()
+                space_ids = _parse_space_ids(spaces_param)
             except (ValueError, AttributeError):
                 return Response(
                     {"error": "El parámetro 'spaces' debe ser una lista de IDs separados por comas."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-    
-    events = events.order_by('start_datetime')
+            if space_ids:
+                # Semi-join: eventos con al menos uno de los espacios, sin duplicados
+                events = events.in_workspaces(space_ids)
+
+    # Eventos simples que se cruzan con la ventana: inicio < to y término > from
+    singles = events.single().overlapping(window_start, window_end)
+    position = None
+    if params.get('cursor'):
+        position = _decode_cursor(params['cursor'])
+        if position is None:
+            return Response({"error": "El parámetro 'cursor' no es válido."}, status=status.HTTP_400_BAD_REQUEST)
+        last_start, last_id = position
+        singles = singles.filter(
+            Q(start_datetime__gt=last_start) | Q(start_datetime=last_start, id_event__gt=last_id)
+        )
+
+    compact = params.get('compact', 'false').lower() == 'true'
+    series = series_in_window(events, window_start, window_end)
+    singles = singles.order_by('start_datetime', 'id_event')
+    if compact:
+        spaces_prefetch = Prefetch('eventspace_set', queryset=EventSpace.objects.only('event_id', 'workspace_id'))
+        singles = singles.only('id_event', 'start_datetime', 'end_datetime', 'status').prefetch_related(spaces_prefetch)
+        series = series.prefetch_related(spaces_prefetch)
+    else:
+        singles = singles.select_related('created_by')
+        series = series.select_related('created_by')
+
+    # Las series se expanden sólo dentro de la ventana y se intercalan por (inicio, id)
+    occurrences = []
+    for event in series:
+        for occurrence in expand_event(event, window_start, window_end):
+            if position is None or (occurrence.start, event.id_event) > position:
+                occurrences.append(occurrence_event(event, occurrence))
+    occurrences.sort(key=_activity_key)
+
+    page = list(heapq.merge(singles[:limit + 1], occurrences, key=_activity_key))[:limit + 1]
+    next_cursor = _encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    if compact:
+        events_data = [
+            {
+                'id': event.id_event,
+                'start': _format_datetime(event.start_datetime),
+                'end': _format_datetime(event.end_datetime),
+                'status': event.status,
+                'spaces': [space.workspace_id for space in event.eventspace_set.all()],
+            }
+            for event in page
+        ]
+    else:
+        events_data = EventSerializer(page, many=True).data
+    for event_data, event in zip(events_data, page):
+        if hasattr(event, 'original_start'):
+            # Ocurrencia de una serie: el inicio original la identifica ante `/occurrences/`
+            event_data['original_start'] = _format_datetime(event.original_start)
 
     return Response({
-        'events': EventSerializer(events, many=True).data
+        'events': events_data,
+        'from': _format_datetime(window_start),
+        'to': _format_datetime(window_end),
+        'next_cursor': next_cursor,
     })
 
 
@@ -182,6 +514,10 @@ def get_scheduled_events(request):
     Parámetros:
     - today (bool): Si es true, obtiene solo eventos del día actual (que empiecen hoy, estén en curso o terminen hoy).
                     Si es false, obtiene todos los eventos futuros exceptuando IN_COURSE (a menos que estén activos).
+
+    Los eventos recurrentes se expanden: con today=true aparecen sus ocurrencias
+    del día; si no, su ocurrencia en curso o la próxima. Cada ocurrencia trae su
+    horario y el campo `original_start`.
     """
     now = timezone.now()
     today = request.query_params.get('today', 'false').lower() == 'true'
@@ -193,37 +529,224 @@ def get_scheduled_events(request):
         StatusEvent.IN_COURSE     # 3
     ]
     
+    # Con el planificador de estados activo, el estado ya refleja el horario
+    statuses_current = scheduler_enabled()
+
     if today:
         # Filtrar solo eventos del día actual
         # Incluye: eventos que empiezan hoy, están en curso, o terminan hoy
         today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
+        if statuses_current:
+            in_course = Q(status=StatusEvent.IN_COURSE)
+        else:
+            in_course = Q(start_datetime__lte=now) & Q(end_datetime__gte=now)
+
+        # Las series se expanden sobre el día local
+        day_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+
         events = Event.objects.filter(
-            Q(status__in=allowed_statuses) &
-            (
-                Q(start_datetime__date=today_start.date()) |  # Empieza hoy
-                Q(end_datetime__date=today_start.date()) |    # Termina hoy
-                (Q(start_datetime__lte=now) & Q(end_datetime__gte=now))  # En curso
+            Q(status__in=allowed_statuses) & (
+                Q(recurrence__isnull=True) & (
+                    Q(start_datetime__date=today_start.date()) |  # Empieza hoy
+                    Q(end_datetime__date=today_start.date()) |    # Termina hoy
+                    in_course  # En curso
+                ) |
+                series_filter(day_start, day_end)
             )
         )
+    elif statuses_current:
+        # Los estados activos son exactamente los eventos futuros o en curso
+        events = Event.objects.filter(status__in=allowed_statuses)
     else:
         # Filtrar eventos futuros:
         # - AGENDED y CONFIRMED: cuya fecha de inicio sea mayor a hoy
         # - IN_COURSE: cuya fecha de término aún no haya pasado
         events = Event.objects.filter(
             Q(status__in=[StatusEvent.AGENDED, StatusEvent.CONFIRMED], start_datetime__gte=now) |
-            Q(status=StatusEvent.IN_COURSE, end_datetime__gte=now)
+            Q(status=StatusEvent.IN_COURSE, end_datetime__gte=now) |
+            # Series con ocurrencias pendientes
+            Q(status__in=allowed_statuses, recurrence__isnull=False, recurrence__last_end__isnull=True) |
+            Q(status__in=allowed_statuses, recurrence__last_end__gte=now)
         )
     
-    events = events.order_by('start_datetime')
+    # Una sola consulta: detalle, creador y regla vienen en el mismo JOIN (más
+    # una para las excepciones, sólo si hay series)
+    events = list(events.select_related('eventdetail', 'created_by', 'recurrence'))
+    series = load_exceptions(events)
+    if series:
+        series_ids = {event.id_event for event in series}
+        events = [event for event in events if event.id_event not in series_ids]
+        for event in series:
+            if today:
+                occurrences = expand_event(event, day_start, day_end)
+            else:
+                occurrence = next_occurrence(event, now)
+                occurrences = [occurrence] if occurrence is not None else []
+            events.extend(occurrence_event(event, occurrence) for occurrence in occurrences)
+    events.sort(key=lambda event: (event.start_datetime, event.id_event))
+
     events_data = EventSerializer(events, many=True).data
     
     # Enriquecer datos de cada evento
     for event_data, event_instance in zip(events_data, events):
         _enrich_event_data(event_data, event_instance)
+        if hasattr(event_instance, 'original_start'):
+            event_data['original_start'] = _format_datetime(event_instance.original_start)
 
     return Response({
         'events': events_data
     })
 
+
+AVAILABILITY_DEFAULT_MIN_DURATION = 30
+AVAILABILITY_MAX_DAYS = 186
+
+
+@api_view(['GET'])
+# @permission_classes([IsAuthenticated])
+def get_availability(request):
+    """
+    Obtiene los huecos libres de uno o varios espacios.
+
+    Parámetros:
+    - spaces (ids separados por coma): espacios a consultar. Por defecto, todos los habilitados.
+    - from / to (fecha o fecha-hora ISO): rango a consultar. Por defecto, desde ahora y 7 días
+      (máximo 186 días).
+    - min_duration (minutos): duración mínima de cada hueco (por defecto 30).
+    - open / close (HH:MM): horario de atención (por defecto `SCHEDULING_OPENING_HOURS`).
+    - weekdays (0-6 separados por coma, 0 = lunes): días de atención. Por defecto, todos.
+    """
+    params = request.query_params
+
+    range_start = timezone.now()
+    if params.get('from'):
+        range_start = _parse_datetime_param(params['from'])
+        if range_start is None:
+            return Response({"error": "El parámetro 'from' debe ser una fecha u hora ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    range_end = range_start + timedelta(days=FUTURE_ACTIVITY_DEFAULT_DAYS)
+    if params.get('to'):
+        range_end = _parse_datetime_param(params['to'])
+        if range_end is None:
+            return Response({"error": "El parámetro 'to' debe ser una fecha u hora ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    if range_end <= range_start:
+        return Response({"error": "El parámetro 'to' debe ser posterior a 'from'."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if range_end - range_start > timedelta(days=AVAILABILITY_MAX_DAYS):
+        return Response({"error": f"El rango no puede superar {AVAILABILITY_MAX_DAYS} días."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        min_duration = timedelta(minutes=int(params.get('min_duration', AVAILABILITY_DEFAULT_MIN_DURATION)))
+        if min_duration <= timedelta(0):
+            raise ValueError
+    except ValueError:
+        return Response({"error": "El parámetro 'min_duration' debe ser un entero positivo (minutos)."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        opening = time.fromisoformat(params['open']) if params.get('open') else None
+        closing = time.fromisoformat(params['close']) if params.get('close') else None
+    except ValueError:
+        return Response({"error": "Los parámetros 'open' y 'close' deben tener el formato HH:MM."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    default_opening, default_closing = get_opening_hours()
+    opening, closing = opening or default_opening, closing or default_closing
+    if opening >= closing:
+        return Response({"error": "La hora de apertura debe ser anterior a la de cierre."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    weekdays = None
+    if params.get('weekdays'):
+        try:
+            weekdays = set(_parse_space_ids(params['weekdays']))
+        except ValueError:
+            weekdays = None
+        if not weekdays or not weekdays <= set(range(7)):
+            return Response({"error": "El parámetro 'weekdays' debe contener días entre 0 (lunes) y 6 (domingo)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    workspaces = Workspace.objects.filter(enabled=True)
+    if params.get('spaces'):
+        try:
+            space_ids = _parse_space_ids(params['spaces'])
+        except ValueError:
+            return Response({"error": "El parámetro 'spaces' debe ser una lista de IDs separados por comas."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        workspaces = Workspace.objects.filter(id_workspace__in=space_ids)
+        missing = set(space_ids) - set(workspaces.values_list('id_workspace', flat=True))
+        if missing:
+            return Response({"error": "Algunos espacios no existen.", "missing_space_ids": sorted(missing)},
+                            status=status.HTTP_400_BAD_REQUEST)
+    workspace_ids = sorted(workspaces.values_list('id_workspace', flat=True))
+
+    availability = find_availability(workspace_ids, range_start, range_end, min_duration, opening, closing, weekdays)
+
+    return Response({
+        'from': _format_datetime(range_start),
+        'to': _format_datetime(range_end),
+        'min_duration': int(min_duration.total_seconds() // 60),
+        'spaces': [
+            {
+                'workspace': workspace_id,
+                'slots': [{'start': _format_datetime(start), 'end': _format_datetime(end)} for start, end in slots],
+            }
+            for workspace_id, slots in availability.items()
+        ],
+    })
+
+
+
+# Los feeds iCalendar son vistas de Django (no de DRF): los clientes de calendario
+# piden `text/calendar`, que la negociación de contenido de DRF rechazaría.
+
+@require_GET
+def workspace_calendar(request, workspace_id):
+    """Feed iCalendar de los eventos de un espacio (suscripción desde Outlook/Google Calendar)."""
+    workspace = get_object_or_404(Workspace, pk=workspace_id)
+    events = Event.objects.in_workspaces([workspace.pk])
+    return feed_response(request, workspace.name, events, f"espacio_{workspace.pk}.ics")
+
+
+@require_GET
+def user_calendar(request, user_id):
+    """Feed iCalendar de los eventos creados por un usuario."""
+    user = get_object_or_404(get_user_model(), pk=user_id)
+    events = Event.objects.filter(created_by=user)
+    name = f"Eventos de {user.get_full_name() or user.username}"
+    return feed_response(request, name, events, f"usuario_{user.pk}.ics")
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Stream SSE (`text/event-stream`) con los cambios de la agenda.
+
+    Parámetros:
+    - spaces (ids separados por coma): sólo cambios de eventos en esos espacios. Por defecto, todos.
+    - last_event_id: alternativa al header `Last-Event-ID` para retomar el stream.
+
+    Eventos: `created`, `updated`, `status`, `deleted` y `reset` (recargar la agenda
+    completa). Cada `HEARTBEAT` segundos se envía un comentario para mantener la conexión.
+    Requiere un servidor ASGI: bajo WSGI la respuesta nunca terminaría de armarse.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "El stream de eventos requiere un servidor ASGI."}, status=501)
+
+    try:
+        workspace_ids = _parse_space_ids(request.GET.get('spaces', ''))
+    except ValueError:
+        return JsonResponse({"error": "El parámetro spaces debe ser una lista de ids separados por coma."}, status=400)
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    config = get_stream_config()
+    response = StreamingHttpResponse(
+        stream_messages(get_broker(), workspace_ids, last_event_id, heartbeat=config['HEARTBEAT']),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el stream en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El stream de cambios de la agenda (`/api/stream/`, Server-Sent Events) es una
+vista asíncrona con conexiones de larga duración: el servicio debe ejecutarse
+con un servidor ASGI (p. ej. `uvicorn scheduling.asgi:application --port 8003`)
+para atenderlo; bajo WSGI (`runserver`, gunicorn sync) responde 501. Las
+pantallas deben conectarse directo al servicio (o a un proxy sin buffer), ya
+que el gateway arma cada respuesta completa antes de reenviarla.
 """
 
 import os
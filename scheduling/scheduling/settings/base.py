@@ -64,6 +64,7 @@ TEMPLATES = [
 WSGI_APPLICATION = 'scheduling.wsgi.application'
 
 GOOGLE_SCRIPT_URL = os.getenv('FORM_URL_SCRIPT')
+GOOGLE_SCRIPT_TIMEOUT = int(os.getenv('FORM_SCRIPT_TIMEOUT', 15))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,4 +109,53 @@ STATIC_URL =  "static/"
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# Horario de atención por defecto para el cálculo de disponibilidad
+# (ver events_service/services/availability.py)
+SCHEDULING_OPENING_HOURS = (
+    os.environ.get('SCHEDULING_OPENING_TIME', '08:00'),
+    os.environ.get('SCHEDULING_CLOSING_TIME', '22:00'),
+)
+
+# Índice en memoria de la ocupación de los espacios (ver
+# events_service/services/calendar_index.py). SYNC: segundos entre revisiones de
+# los eventos modificados por otros procesos (p. ej. el servicio de gestión).
+# TTL: segundos antes de recargarlo completo (cubre eliminaciones de otros procesos).
+SCHEDULING_CALENDAR_INDEX = {
+    'ENABLED': os.environ.get('SCHEDULING_CALENDAR_INDEX_ENABLED', 'True') == 'True',
+    'TTL': int(os.environ.get('SCHEDULING_CALENDAR_INDEX_TTL', 60)),
+    'SYNC': int(os.environ.get('SCHEDULING_CALENDAR_INDEX_SYNC', 2)),
+}
+
+# Feeds iCalendar (ver events_service/services/ics.py): días hacia atrás incluidos
+SCHEDULING_ICS_PAST_DAYS = int(os.environ.get('SCHEDULING_ICS_PAST_DAYS', 30))
+
+# Stream SSE de cambios de la agenda (ver events_service/services/stream.py).
+# HEARTBEAT y POLL en segundos; BUFFER: cambios recuperables con Last-Event-ID;
+# QUEUE: mensajes pendientes por cliente antes de cortarle la conexión con `reset`
+SCHEDULING_EVENT_STREAM = {
+    'BUFFER': int(os.environ.get('SCHEDULING_EVENT_STREAM_BUFFER', 1000)),
+    'HEARTBEAT': int(os.environ.get('SCHEDULING_EVENT_STREAM_HEARTBEAT', 15)),
+    'POLL': int(os.environ.get('SCHEDULING_EVENT_STREAM_POLL', 5)),
+    'QUEUE': int(os.environ.get('SCHEDULING_EVENT_STREAM_QUEUE', 100)),
+}
+
+# Outbox de llamadas externas (ver events_service/services/outbox.py), procesado
+# por el comando `process_outbox`
+SCHEDULING_OUTBOX = {
+    'BATCH_SIZE': int(os.environ.get('SCHEDULING_OUTBOX_BATCH_SIZE', 20)),
+    'MAX_ATTEMPTS': int(os.environ.get('SCHEDULING_OUTBOX_MAX_ATTEMPTS', 8)),
+    'BACKOFF_BASE': int(os.environ.get('SCHEDULING_OUTBOX_BACKOFF_BASE', 30)),
+    'BACKOFF_MAX': int(os.environ.get('SCHEDULING_OUTBOX_BACKOFF_MAX', 3600)),
+}
+
+# Transiciones automáticas de estado de los eventos (ver
+# events_service/services/status_scheduler.py), aplicadas por el comando
+# `run_status_scheduler`. ENABLED indica que el comando está corriendo: las
+# consultas confían entonces en el estado sin revisar el horario.
+EVENT_STATUS_SCHEDULER = {
+    'ENABLED': os.environ.get('EVENT_STATUS_SCHEDULER_ENABLED', 'False') == 'True',
+    'BATCH_SIZE': int(os.environ.get('EVENT_STATUS_SCHEDULER_BATCH_SIZE', 500)),
+    'LOOKAHEAD': int(os.environ.get('EVENT_STATUS_SCHEDULER_LOOKAHEAD', 3600)),
+    'RELOAD': int(os.environ.get('EVENT_STATUS_SCHEDULER_RELOAD', 60)),
+}